@@ -0,0 +1,95 @@
+"""Measures the indexing time of array-backed tabular datasets.
+
+A dataset of ``--rows`` rows is built by concatenating ``--datasets``
+array-backed datasets, each joining two columns, and is indexed with
+random index lists and slices through ``slice``, ``asdict`` and
+``__getitem__``.
+
+Usage::
+
+    python benchmarks/bench_tabular.py --rows 1000000 --datasets 8
+"""
+import argparse
+import time
+
+import numpy
+from pytorch_pfn_extras.dataset import tabular
+
+
+def _build(n_rows, n_datasets):
+    datasets = []
+    for rows in numpy.array_split(numpy.arange(n_rows), n_datasets):
+        datasets.append(
+            tabular.from_data(
+                {
+                    "x": rows.astype(numpy.float32),
+                    "y": rows % 10,
+                }
+            )
+        )
+    return datasets[0].concat(*datasets[1:])
+
+
+def _measure(name, fn, repeat):
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - begin) / repeat
+    print(f"{name:>40}: {elapsed * 1e3:10.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--datasets", type=int, default=8)
+    parser.add_argument("--indices", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    dataset = _build(args.rows, args.datasets)
+    rng = numpy.random.default_rng(0)
+    indices = rng.integers(0, args.rows, args.indices)
+    batch = rng.integers(0, args.rows, args.batch_size)
+    mask = rng.random(args.rows) < 0.1
+
+    _measure("fetch", lambda: dataset.fetch(), args.repeat)
+    _measure(
+        "get_examples(slice)",
+        lambda: dataset.get_examples(slice(None, None, 3), None),
+        args.repeat,
+    )
+    _measure(
+        f"get_examples({args.indices} indices)",
+        lambda: dataset.get_examples(indices.tolist(), None),
+        args.repeat,
+    )
+    _measure(
+        f"slice[{args.indices} indices].fetch()",
+        lambda: dataset.slice[indices].fetch(),
+        args.repeat,
+    )
+    _measure(
+        "slice[bools].fetch()",
+        lambda: dataset.slice[mask].fetch(),
+        args.repeat,
+    )
+    _measure(
+        "slice[::2, 'x'].slice[indices].fetch()",
+        lambda: dataset.slice[::2, "x"].slice[indices // 2].fetch(),
+        args.repeat,
+    )
+    _measure(
+        f"__getitem__({args.batch_size} indices)",
+        lambda: dataset[batch],
+        args.repeat,
+    )
+    _measure(
+        f"get_example x {args.batch_size}",
+        lambda: [dataset.get_example(int(i)) for i in batch],
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measures the loading time of a tabular dataset with a DataLoader.
+
+Compares the default DataLoader, which fetches the examples one by one
+with ``__getitem__`` and collates them, to the batched loader created by
+``tabular.create_batched_loader``, which fetches each batch with a
+single ``get_examples`` call.
+
+Usage::
+
+    python benchmarks/bench_tabular_loader.py --rows 100000 --workers 2
+"""
+import argparse
+import time
+
+import numpy
+import torch
+from pytorch_pfn_extras.dataset import tabular
+
+
+def _build(n_rows, n_columns):
+    rng = numpy.random.default_rng(0)
+    return tabular.from_data(
+        {
+            f"col_{i}": rng.random((n_rows, 8), dtype=numpy.float32)
+            for i in range(n_columns)
+        }
+    )
+
+
+def _run(loader):
+    begin = time.perf_counter()
+    n_batches = 0
+    for _ in loader:
+        n_batches += 1
+    return time.perf_counter() - begin, n_batches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = _build(args.rows, args.columns)
+    loaders = {
+        "per-index": torch.utils.data.DataLoader(
+            dataset,
+            batch_size=args.batch_size,
+            shuffle=True,
+            num_workers=args.workers,
+        ),
+        "batched": tabular.create_batched_loader(
+            dataset,
+            batch_size=args.batch_size,
+            shuffle=True,
+            num_workers=args.workers,
+        ),
+    }
+    results = {}
+    for name, loader in loaders.items():
+        elapsed, n_batches = _run(loader)
+        results[name] = elapsed
+        print(
+            f"{name:>10}: {elapsed:8.3f} s, "
+            f"{elapsed / n_batches * 1e3:8.3f} ms/batch"
+        )
+    ratio = results["per-index"] / results["batched"]
+    print(f"batched speedup over per-index: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Measures the number of times TimeSummary can record per second.
+
+Compares the per-thread accumulation with the queue-based one, from one
+and from several threads.
+
+Usage::
+
+    python benchmarks/bench_time_summary.py --records 200000 --threads 4
+"""
+import argparse
+import threading
+import time
+
+import pytorch_pfn_extras as ppe
+
+
+def _record(summary, n_records, tags):
+    for i in range(n_records):
+        with summary.report(tags[i % len(tags)]):
+            pass
+
+
+def _run(thread_local, n_records, n_threads, n_tags):
+    summary = ppe.profiler.TimeSummary(thread_local=thread_local)
+    tags = [f"tag{i}" for i in range(n_tags)]
+    threads = [
+        threading.Thread(target=_record, args=(summary, n_records, tags))
+        for _ in range(n_threads)
+    ]
+    begin = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    summary.synchronize()
+    with summary.summary(clear=True) as s:
+        s[0].make_statistics()
+    elapsed = time.perf_counter() - begin
+    summary.finalize()
+    return n_records * n_threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--tags", type=int, default=16)
+    args = parser.parse_args()
+
+    for n_threads in sorted({1, args.threads}):
+        results = {}
+        for name, thread_local in [("queue", False), ("thread_local", True)]:
+            results[name] = _run(
+                thread_local, args.records, n_threads, args.tags
+            )
+            print(
+                f"{n_threads} thread(s), {name:>12}: "
+                f"{results[name]:12.0f} records/s"
+            )
+        ratio = results["thread_local"] / results["queue"]
+        print(f"{n_threads} thread(s), speedup: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measures the loading time of a traced dataset with tiny items.
+
+Compares the default queue used by ``TraceableDataset`` to send the events
+of the DataLoader workers with the shared memory rings enabled by
+``max_workers``.
+
+Usage::
+
+    python benchmarks/bench_traceable_dataset.py --items 200000 --workers 8
+"""
+import argparse
+import tempfile
+import time
+
+import pytorch_pfn_extras as ppe
+import torch
+
+
+class _TinyDataset(torch.utils.data.Dataset):
+    def __init__(self, n_items):
+        self._n_items = n_items
+
+    def __len__(self):
+        return self._n_items
+
+    def __getitem__(self, idx):
+        return idx
+
+
+def _run(n_items, n_workers, max_workers, tmpdir):
+    writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+    tracer = ppe.profiler.ChromeTracer()
+    tracer.initialize_writer("trace.json", writer)
+    dataset = ppe.profiler.TraceableDataset(
+        _TinyDataset(n_items),
+        "getitem",
+        tracer,
+        max_workers=max_workers,
+        capacity=n_items,
+    )
+    loader = torch.utils.data.DataLoader(
+        dataset,
+        batch_size=64,
+        num_workers=n_workers,
+        multiprocessing_context="fork",
+    )
+    begin = time.perf_counter()
+    for _ in loader:
+        pass
+    tracer.flush("trace.json", writer)
+    elapsed = time.perf_counter() - begin
+    n_events = len(tracer.state_dict()["_event_list"])
+    tracer.finalize()
+    return elapsed, n_events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    ppe.profiler.enable_global_trace(True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = {}
+        for name, max_workers in (
+            ("queue", None),
+            ("shared memory", args.workers),
+        ):
+            elapsed, n_events = _run(
+                args.items, args.workers, max_workers, tmpdir
+            )
+            results[name] = elapsed
+            print(f"{name:>14}: {elapsed:.3f} s, {n_events} events")
+        ratio = results["queue"] / results["shared memory"]
+        print(f"Shared memory speedup over the queue: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
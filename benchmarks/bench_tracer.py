@@ -0,0 +1,61 @@
+"""Measures the per-event overhead of the tracers.
+
+Usage::
+
+    python benchmarks/bench_tracer.py --events 1000000
+"""
+import argparse
+import tempfile
+import time
+
+import pytorch_pfn_extras as ppe
+
+
+def _run(tracer, n_events):
+    begin = time.perf_counter()
+    for _ in range(n_events):
+        with tracer.add_event("bench"):
+            pass
+    return (time.perf_counter() - begin) / n_events * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--buffer-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracers = {
+            "DummyTracer": ppe.profiler._tracing.DummyTracer(),
+            "ChromeTracer": ppe.profiler.ChromeTracer(),
+            "RingBufferTracer": ppe.profiler.RingBufferTracer(
+                buffer_size=args.buffer_size
+            ),
+        }
+        filenames = {
+            "DummyTracer": "dummy",
+            "ChromeTracer": "trace.json",
+            "RingBufferTracer": "trace.bin",
+        }
+        results = {}
+        for name, tracer in tracers.items():
+            tracer.initialize_writer(filenames[name], writer)
+            results[name] = _run(tracer, args.events)
+            begin = time.perf_counter()
+            tracer.flush(filenames[name], writer)
+            flush_time = time.perf_counter() - begin
+            print(
+                f"{name:>20}: {results[name]:8.1f} ns/event, "
+                f"flush {flush_time:.3f} s"
+            )
+        for tracer in tracers.values():
+            if not isinstance(tracer, ppe.profiler._tracing.DummyTracer):
+                tracer.finalize()
+        ratio = results["ChromeTracer"] / results["RingBufferTracer"]
+        print(f"RingBufferTracer speedup over ChromeTracer: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measures the per-example overhead of tabular transforms.
+
+A dataset of 20 columns is transformed by 10 transformations, each taking
+two columns and producing two columns, and the transformed examples are
+fetched in bulk and one by one.
+
+Usage::
+
+    python benchmarks/bench_transform.py --rows 100000
+"""
+import argparse
+import time
+
+import numpy
+from pytorch_pfn_extras.dataset import tabular
+
+_N_COLUMNS = 20
+_N_TRANSFORMS = 10
+
+
+def _transform(*args, **kwargs):
+    # The columns are given as keyword arguments in the dict mode
+    x, y = args or kwargs.values()
+    return x + y, x - y
+
+
+def _build(n_rows, mode):
+    data = numpy.random.default_rng(0).random((_N_COLUMNS, n_rows))
+    dataset = tabular.from_data(
+        {f"in_{i}": column for i, column in enumerate(data)}
+    )
+    if mode is tuple:
+        dataset = dataset.astuple()
+    transforms = []
+    for i in range(_N_TRANSFORMS):
+        in_keys = (f"in_{2 * i}", f"in_{2 * i + 1}")
+        out_keys = (f"out_{2 * i}", f"out_{2 * i + 1}")
+        transforms.append(((in_keys, out_keys), _transform))
+    keys = tuple(f"out_{i}" for i in range(_N_COLUMNS))
+    return dataset.transform(keys, transforms)
+
+
+def _measure(name, fn, n_examples, repeat):
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - begin) / repeat
+    print(
+        f"{name:>40}: {elapsed * 1e3:10.3f} ms, "
+        f"{elapsed / n_examples * 1e6:8.3f} us/example"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--examples", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for mode in (tuple, dict):
+        dataset = _build(args.rows, mode)
+        print(f"mode: {mode.__name__}")
+        _measure(
+            "fetch",
+            lambda: dataset.fetch(),
+            args.rows,
+            args.repeat,
+        )
+        _measure(
+            "get_examples(all rows, 4 columns)",
+            lambda: dataset.get_examples(None, (0, 5, 10, 15)),
+            args.rows,
+            args.repeat,
+        )
+        _measure(
+            f"get_example x {args.examples}",
+            lambda: [dataset.get_example(i) for i in range(args.examples)],
+            args.examples,
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from pytorch_pfn_extras.dataset.shared_dataset import ArenaCache  # NOQA
+from pytorch_pfn_extras.dataset.shared_dataset import BoundedCache  # NOQA
+from pytorch_pfn_extras.dataset.shared_dataset import MemmapCache  # NOQA
 from pytorch_pfn_extras.dataset.shared_dataset import SharedDataset  # NOQA
 from pytorch_pfn_extras.dataset.shared_dataset import (  # NOQA
     ItemNotFoundException,
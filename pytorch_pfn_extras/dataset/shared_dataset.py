@@ -1,13 +1,33 @@
 # mypy: ignore-errors
 
 import ctypes
+import json
 import multiprocessing
+import os
+import tempfile
+import time
+import zlib
 
 import numpy
 import torch
+from pytorch_pfn_extras import reporting
+
+
+def _shared_array(ctype, shape):
+    size = 1
+    for x in shape:
+        size *= x
+    # Synchronization is done by the caches themselves
+    shared_memory = multiprocessing.RawArray(ctype, size)
+    return numpy.ctypeslib.as_array(shared_memory).reshape(shape)
 
 
 class Cache:
+    # Whether the cache is shared by the processes of a node that open it
+    # independently, e.g., the local ranks, and not only with the forked
+    # processes
+    node_shared = False
+
     def is_cached(self, idx):
         raise NotImplementedError
 
@@ -17,6 +37,9 @@ class Cache:
     def get_value(self, idx):
         raise NotImplementedError
 
+    def stats(self):
+        return {}
+
 
 class InfiniteCache(Cache):
     def __init__(self, sm_size):
@@ -47,6 +70,429 @@ class InfiniteCache(Cache):
         self.cached_ids[idx] = 1
 
 
+# Indices of the shared counters of ``BoundedCache``
+_HAND = 0
+_TICK = 1
+_USED_SLOTS = 2
+_HITS = 3
+_MISSES = 4
+_EVICTIONS = 5
+
+
+class BoundedCache(Cache):
+    """Cache holding a fixed number of samples in shared memory.
+
+    Samples are stored in ``n_slots`` slots, and when all the slots are
+    used, a slot is reclaimed with the CLOCK or the LRU eviction policy.
+    The slot of each sample and the sample of each slot are kept in shared
+    arrays, so that the cache can be used concurrently by the DataLoader
+    workers forked from the process that created it.
+
+    The lookups and the insertions take a lock shared by the processes,
+    and the LRU policy scans all the slots to find the one to evict, so
+    the CLOCK policy is cheaper when the cache has many slots. A sample is
+    not cached when all the slots are being written by other processes.
+
+    Args:
+        sm_size (tuple of ints): Shape of the whole dataset, the first
+            dimension being the number of samples.
+        n_slots (int): Maximum number of samples held by the cache.
+        policy (str): Eviction policy, ``'clock'`` or ``'lru'``.
+    """
+
+    def __init__(self, sm_size, n_slots, policy="clock"):
+        super().__init__()
+        if n_slots <= 0:
+            raise ValueError("n_slots must be positive")
+        if policy not in ("clock", "lru"):
+            raise ValueError("policy must be 'clock' or 'lru'")
+        self.sm_size = sm_size
+        self.n_slots = n_slots
+        self.policy = policy
+        self.storage = _shared_array(
+            ctypes.c_float, (n_slots, *sm_size[1:])
+        )
+        self.index_to_slot = _shared_array(ctypes.c_int64, (sm_size[0],))
+        self.index_to_slot[:] = -1
+        self.slot_to_index = _shared_array(ctypes.c_int64, (n_slots,))
+        self.slot_to_index[:] = -1
+        # Odd while the slot is being written
+        self.versions = _shared_array(ctypes.c_int64, (n_slots,))
+        # Reference bits for CLOCK, ticks of the last access for LRU
+        self.usage = _shared_array(ctypes.c_int64, (n_slots,))
+        self.counters = _shared_array(ctypes.c_int64, (6,))
+        self.lock = multiprocessing.Lock()
+
+    def _touch(self, slot):
+        if self.policy == "clock":
+            self.usage[slot] = 1
+        else:
+            self.counters[_TICK] += 1
+            self.usage[slot] = self.counters[_TICK]
+
+    def _find_slot(self):
+        counters = self.counters
+        if counters[_USED_SLOTS] < self.n_slots:
+            slot = counters[_USED_SLOTS]
+            counters[_USED_SLOTS] += 1
+            return slot
+        # Slots being written by other processes cannot be reclaimed
+        available = self.versions % 2 == 0
+        if not available.any():
+            return None
+        if self.policy == "lru":
+            unavailable = numpy.iinfo(numpy.int64).max
+            usage = numpy.where(available, self.usage, unavailable)
+            return int(numpy.argmin(usage))
+        while True:
+            slot = counters[_HAND]
+            counters[_HAND] = (slot + 1) % self.n_slots
+            if not available[slot]:
+                continue
+            if self.usage[slot]:
+                self.usage[slot] = 0
+            else:
+                return slot
+
+    def is_cached(self, idx):
+        slot = self.index_to_slot[idx]
+        return slot >= 0 and self.versions[slot] % 2 == 0
+
+    def get_value(self, idx):
+        with self.lock:
+            slot = self.index_to_slot[idx]
+            if slot < 0:
+                return None
+            version = self.versions[slot]
+            if version % 2 == 1:
+                return None
+            self._touch(slot)
+            self.counters[_HITS] += 1
+        x = self.storage[slot].copy()
+        # The slot was reclaimed while being copied
+        if self.versions[slot] != version:
+            return None
+        return x
+
+    def add_to_cache(self, idx, x):
+        with self.lock:
+            self.counters[_MISSES] += 1
+            if self.index_to_slot[idx] >= 0:
+                return
+            slot = self._find_slot()
+            if slot is None:
+                return
+            evicted = self.slot_to_index[slot]
+            if evicted >= 0:
+                self.index_to_slot[evicted] = -1
+                self.counters[_EVICTIONS] += 1
+            self.versions[slot] += 1
+            self.slot_to_index[slot] = idx
+            self.index_to_slot[idx] = slot
+            self._touch(slot)
+        # The slot cannot be reclaimed until its version is even again
+        self.storage[slot] = x
+        self.versions[slot] += 1
+
+    def stats(self):
+        """Returns the number of hits, misses and evictions so far.
+
+        Misses are counted when the missing samples are added.
+        """
+        return {
+            "hits": int(self.counters[_HITS]),
+            "misses": int(self.counters[_MISSES]),
+            "evictions": int(self.counters[_EVICTIONS]),
+        }
+
+
+# States of the samples of ``ArenaCache``
+_EMPTY = 0
+_WRITING = 1
+_FILLED = 2
+
+# Alignment in bytes of the samples in the arena
+_ALIGNMENT = 64
+_MAX_DTYPE_LEN = 16
+
+
+class ArenaCache(Cache):
+    """Cache storing samples of any dtype and shape in a shared arena.
+
+    Samples are copied into a shared memory arena of ``arena_size`` bytes,
+    allocated in order, and their offset, dtype and shape are kept in a
+    shared index table. Cached samples are returned as numpy arrays viewing
+    the arena without any copy, so they must not be modified. The space of
+    the arena is never reused, and the samples that do not fit in its
+    remaining space are not cached; they are counted as ``dropped`` in
+    :meth:`stats`, and :meth:`SharedDataset.__getitem__` returns them to
+    the process that added them.
+
+    Args:
+        sm_size (int or tuple of ints): Number of samples, or the shape of
+            the whole dataset, the first dimension being the number of
+            samples.
+        arena_size (int): Size in bytes of the arena.
+        max_ndim (int): Maximum number of dimensions of the samples.
+    """
+
+    def __init__(self, sm_size, arena_size, max_ndim=8):
+        super().__init__()
+        n_samples = sm_size if isinstance(sm_size, int) else sm_size[0]
+        self.arena_size = arena_size
+        self.max_ndim = max_ndim
+        self.arena = _shared_array(ctypes.c_uint8, (arena_size,))
+        self.states = _shared_array(ctypes.c_int8, (n_samples,))
+        self.offsets = _shared_array(ctypes.c_int64, (n_samples,))
+        self.ndims = _shared_array(ctypes.c_int64, (n_samples,))
+        self.shapes = _shared_array(ctypes.c_int64, (n_samples, max_ndim))
+        self.dtypes = _shared_array(
+            ctypes.c_uint8, (n_samples, _MAX_DTYPE_LEN)
+        )
+        # Bytes allocated so far
+        self.used = _shared_array(ctypes.c_int64, (1,))
+        # Number of samples that did not fit in the arena
+        self.dropped = _shared_array(ctypes.c_int64, (1,))
+        self.lock = multiprocessing.Lock()
+        # Views of the filled samples created by this process, as the
+        # samples are never moved
+        self._views = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_views"] = {}
+        return state
+
+    def is_cached(self, idx):
+        return self.states[idx] == _FILLED
+
+    def get_value(self, idx):
+        x = self._views.get(idx)
+        if x is not None:
+            return x
+        if self.states[idx] != _FILLED:
+            return None
+        dtype = numpy.dtype(bytes(self.dtypes[idx]).rstrip(b"\0").decode())
+        shape = tuple(self.shapes[idx, : self.ndims[idx]])
+        offset = self.offsets[idx]
+        nbytes = dtype.itemsize * int(numpy.prod(shape))
+        x = self.arena[offset : offset + nbytes].view(dtype).reshape(shape)
+        self._views[idx] = x
+        return x
+
+    def add_to_cache(self, idx, x):
+        if isinstance(x, torch.Tensor):
+            x = x.detach().cpu().numpy()
+        x = numpy.asarray(x)
+        dtype = x.dtype.str.encode()
+        if x.dtype.hasobject or len(dtype) > _MAX_DTYPE_LEN:
+            raise ValueError(f"Samples of dtype {x.dtype} cannot be cached")
+        if x.ndim > self.max_ndim:
+            raise ValueError(
+                f"Samples have more than {self.max_ndim} dimensions"
+            )
+        with self.lock:
+            if self.states[idx] != _EMPTY:
+                return
+            offset = -(-self.used[0] // _ALIGNMENT) * _ALIGNMENT
+            if offset + x.nbytes > self.arena_size:
+                self.dropped[0] += 1
+                return
+            self.used[0] = offset + x.nbytes
+            self.states[idx] = _WRITING
+        self.offsets[idx] = offset
+        self.ndims[idx] = x.ndim
+        self.shapes[idx, : x.ndim] = x.shape
+        self.dtypes[idx] = 0
+        self.dtypes[idx, : len(dtype)] = numpy.frombuffer(dtype, numpy.uint8)
+        data = numpy.ascontiguousarray(x).reshape(-1).view(numpy.uint8)
+        self.arena[offset : offset + x.nbytes] = data
+        # Published only once the sample and its metadata are written
+        self.states[idx] = _FILLED
+
+    def stats(self):
+        """Returns the bytes used in the arena and the dropped samples."""
+        return {
+            "used_bytes": int(self.used[0]),
+            "dropped": int(self.dropped[0]),
+        }
+
+
+def _open_file(path, nbytes):
+    # Extending a file to the same size is harmless, so that several
+    # processes can open the cache concurrently
+    with open(path, "ab") as f:
+        if os.path.getsize(path) < nbytes:
+            f.truncate(nbytes)
+
+
+class MemmapCache(Cache):
+    """Cache stored in files that persist across runs.
+
+    The samples are stored in a :class:`numpy.memmap` of the file at
+    ``path``, and the indices of the cached samples are marked in a
+    separate file. The cache files of a previous run with the same shape
+    and dtype are reused, so that the cache is warm when the training
+    restarts, and several processes (e.g., the ranks of a node) can share
+    the same cache files.
+
+    A sample is marked as cached only after it is completely written, with
+    a checksum of its data. When ``verify`` is ``True``, the checksum of a
+    sample is verified the first time it is read by a process, and the
+    samples whose checksum does not match (e.g., because the machine
+    crashed before they were written to the disk) are discarded, so that
+    opening the cache does not read it. :meth:`verify` checks all the
+    samples at once.
+
+    Args:
+        sm_size (tuple of ints): Shape of the whole dataset, the first
+            dimension being the number of samples.
+        path (str): Path of the data file. Other files are created with
+            this path as prefix.
+        dtype (numpy.dtype): Type of the samples.
+        verify (bool): Verifies the checksums of the cached samples when
+            they are first read.
+    """
+
+    node_shared = True
+
+    def __init__(self, sm_size, path, dtype=numpy.float32, verify=True):
+        super().__init__()
+        self.sm_size = tuple(sm_size)
+        self.path = path
+        self.dtype = numpy.dtype(dtype)
+        self.verify_on_read = verify
+        self._check_metadata()
+        self._open()
+
+    def _check_metadata(self):
+        metadata = {"shape": list(self.sm_size), "dtype": self.dtype.str}
+        meta_path = self.path + ".json"
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                existing = json.load(f)
+            if existing != metadata:
+                raise ValueError(
+                    f"The cache at {self.path} was created for samples "
+                    f"of {existing}, not {metadata}"
+                )
+            return
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=dirname, delete=False) as f:
+            json.dump(metadata, f)
+        os.replace(f.name, meta_path)
+
+    def _open(self):
+        n_samples = self.sm_size[0]
+        nbytes = self.dtype.itemsize * int(numpy.prod(self.sm_size))
+        _open_file(self.path, nbytes)
+        _open_file(self.path + ".crc", n_samples * 4)
+        _open_file(self.path + ".filled", n_samples)
+        self.storage = numpy.memmap(
+            self.path, dtype=self.dtype, mode="r+", shape=self.sm_size
+        )
+        self.checksums = numpy.memmap(
+            self.path + ".crc",
+            dtype=numpy.uint32,
+            mode="r+",
+            shape=(n_samples,),
+        )
+        self.filled = numpy.memmap(
+            self.path + ".filled",
+            dtype=numpy.uint8,
+            mode="r+",
+            shape=(n_samples,),
+        )
+        # Samples whose checksum was verified by this process
+        self._verified = numpy.zeros(n_samples, dtype=bool)
+
+    def __getstate__(self):
+        # Processes reopen the files instead of copying the whole memmap
+        return {
+            "sm_size": self.sm_size,
+            "path": self.path,
+            "dtype": self.dtype,
+            "verify_on_read": self.verify_on_read,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def verify(self):
+        """Discards the cached samples whose checksum does not match."""
+        for idx in numpy.flatnonzero(self.filled):
+            self._verify_sample(idx)
+
+    def _verify_sample(self, idx):
+        data = numpy.ascontiguousarray(self.storage[idx])
+        if zlib.crc32(data) != self.checksums[idx]:
+            self.filled[idx] = 0
+            return False
+        self._verified[idx] = True
+        return True
+
+    def flush(self):
+        """Writes the cached samples to the disk."""
+        self.storage.flush()
+        self.checksums.flush()
+        self.filled.flush()
+
+    def is_cached(self, idx):
+        return self.filled[idx] == 1
+
+    def get_value(self, idx):
+        if not self.is_cached(idx):
+            return None
+        if self.verify_on_read and not self._verified[idx]:
+            if not self._verify_sample(idx):
+                return None
+        return numpy.asarray(self.storage[idx])
+
+    def add_to_cache(self, idx, x):
+        if isinstance(x, torch.Tensor):
+            x = x.detach().cpu().numpy()
+        # A sample written again is not exposed until it is complete
+        self.filled[idx] = 0
+        self.storage[idx] = x
+        data = numpy.ascontiguousarray(self.storage[idx])
+        self.checksums[idx] = zlib.crc32(data)
+        self._verified[idx] = True
+        # Marked only once the sample is written, so that a process that
+        # crashes while writing never exposes a partial sample
+        self.filled[idx] = 1
+
+
+def _local_rank_and_size(local_rank, local_world_size):
+    e = os.environ
+    if local_rank is None:
+        local_rank = e.get("LOCAL_RANK", e.get("OMPI_COMM_WORLD_LOCAL_RANK", 0))
+    if local_world_size is None:
+        local_world_size = e.get(
+            "LOCAL_WORLD_SIZE", e.get("OMPI_COMM_WORLD_LOCAL_SIZE", 1)
+        )
+    return int(local_rank), int(local_world_size)
+
+
+def _warmup_chunk(dataset, loader_fn, indices):
+    for idx in indices:
+        if not dataset.is_cached(idx):
+            dataset.cache_item(idx, loader_fn(idx))
+
+
+# Dataset and loading function of the warm-up run by a process of the pool
+_worker_target = None
+
+
+def _init_warmup_worker(dataset, loader_fn):
+    global _worker_target
+    _worker_target = (dataset, loader_fn)
+
+
+def _run_warmup_chunk(indices):
+    _warmup_chunk(*_worker_target, indices)
+
+
 class ItemNotFoundException(Exception):
     pass
 
@@ -54,16 +500,36 @@ class ItemNotFoundException(Exception):
 class SharedDataset(torch.utils.data.Dataset):
     """Dataset that caches the load samples in shared memory
 
-    Args
+    Args:
+        sm_size (tuple of ints): Shape of the whole dataset, the first
+            dimension being the number of samples.
+        cache_type (type): Class of the cache. Defaults to a cache holding
+            the whole dataset.
+        cache_kwargs: Additional arguments of the cache, e.g., ``n_slots``
+            for :class:`BoundedCache`.
     """
 
-    def __init__(self, sm_size, cache_type=InfiniteCache):
+    def __init__(self, sm_size, cache_type=InfiniteCache, **cache_kwargs):
         super().__init__()
-        self.cache = cache_type(sm_size)
+        self.cache = cache_type(sm_size, **cache_kwargs)
+        self._n_samples = sm_size if isinstance(sm_size, int) else sm_size[0]
+        self._last_item = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The pool of a background warm-up cannot be sent to the workers
+        state.pop("_warmup_pool", None)
+        state["_last_item"] = None
+        return state
 
     def __getitem__(self, idx):
         x = self.cache.get_value(idx)
         if x is None:
+            # The bounded caches may reject or evict a sample before it is
+            # read by the process that added it
+            last_item = self._last_item
+            if last_item is not None and last_item[0] == idx:
+                return last_item[1]
             raise ItemNotFoundException(
                 "Item {} is not in the cache".format(idx)
             )
@@ -73,4 +539,138 @@ class SharedDataset(torch.utils.data.Dataset):
         return self.cache.is_cached(idx)
 
     def cache_item(self, idx, x):
+        """Adds a sample to the cache.
+
+        The last sample added by the process is returned by
+        :meth:`__getitem__` even if the cache did not keep it.
+        """
         self.cache.add_to_cache(idx, x)
+        self._last_item = (idx, x)
+
+    def warmup(
+        self,
+        loader_fn,
+        indices=None,
+        num_workers=None,
+        *,
+        background=False,
+        chunk_size=64,
+        local_rank=None,
+        local_world_size=None,
+        timeout=None,
+    ):
+        """Fills the cache in parallel before the samples are used.
+
+        The samples are loaded with ``loader_fn`` in a pool of forked
+        processes, so the cache must be shared with forked processes, as
+        the caches of this module are. Samples that are already cached are
+        skipped.
+
+        When the cache is shared by the node (e.g., :class:`MemmapCache`),
+        the indices are partitioned across the local ranks of the node, so
+        that each rank only loads its part of the samples, and then waits
+        for the other ranks to load theirs. Other caches are owned by the
+        process that creates them, so all the samples are loaded by each
+        rank.
+
+        Args:
+            loader_fn (callable): Function loading the sample of an index.
+            indices (iterable of ints): Indices of the samples to load.
+                Defaults to all the samples of the cache.
+            num_workers (int): Number of processes of the pool. Defaults to
+                the number of CPUs. If ``0``, the samples are loaded in the
+                current process.
+            background (bool): If ``True``, returns without waiting for the
+                samples to be loaded, so that the training can start while
+                the cache is filled. The returned result only waits for
+                the part of the samples of this rank, see
+                :meth:`wait_cached` to wait for the other ranks.
+            chunk_size (int): Number of samples loaded by each task.
+            local_rank (int): Rank of the process in the node. Defaults to
+                the ``LOCAL_RANK`` environment variable, or ``0``.
+            local_world_size (int): Number of processes in the node.
+                Defaults to the ``LOCAL_WORLD_SIZE`` environment variable,
+                or ``1``.
+            timeout (float): Maximum time in seconds to wait for the other
+                ranks. Defaults to no limit.
+
+        Returns:
+            A :class:`multiprocessing.pool.AsyncResult` to wait for the
+            samples to be loaded if ``background`` is ``True``, otherwise
+            ``None``.
+        """
+        if indices is None:
+            indices = range(self._n_samples)
+        indices = list(indices)
+        if self.cache.node_shared:
+            rank, size = _local_rank_and_size(local_rank, local_world_size)
+        elif local_rank is not None or local_world_size is not None:
+            raise ValueError(
+                "local_rank and local_world_size require a cache shared "
+                "by the node"
+            )
+        else:
+            rank, size = 0, 1
+        own = [i for i in indices[rank::size] if not self.is_cached(i)]
+        chunks = [
+            own[i : i + chunk_size] for i in range(0, len(own), chunk_size)
+        ]
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        if num_workers == 0:
+            if background:
+                raise ValueError("background requires num_workers > 0")
+            for chunk in chunks:
+                _warmup_chunk(self, loader_fn, chunk)
+        else:
+            # The target is inherited by the forked processes, so that the
+            # loading function does not need to be picklable
+            pool = multiprocessing.get_context("fork").Pool(
+                num_workers,
+                initializer=_init_warmup_worker,
+                initargs=(self, loader_fn),
+            )
+            result = pool.map_async(_run_warmup_chunk, chunks)
+            pool.close()
+            if background:
+                # The pool is terminated if it is garbage collected
+                self._warmup_pool = pool
+                return result
+            result.get()
+            pool.join()
+        if size > 1:
+            self.wait_cached(indices, timeout)
+        return None
+
+    def wait_cached(self, indices=None, timeout=None, interval=0.1):
+        """Waits for samples to be cached, e.g., by the other local ranks.
+
+        Args:
+            indices (iterable of ints): Indices of the samples to wait for.
+                Defaults to all the samples of the cache.
+            timeout (float): Maximum time in seconds to wait. Defaults to no
+                limit.
+            interval (float): Interval in seconds between two checks.
+
+        Raises:
+            TimeoutError: If the samples are not cached after ``timeout``
+                seconds.
+        """
+        if indices is None:
+            indices = range(self._n_samples)
+        pending = [i for i in indices if not self.is_cached(i)]
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while pending:
+            if timeout is not None and time.monotonic() >= deadline:
+                raise TimeoutError(
+                    "{} samples are not cached".format(len(pending))
+                )
+            time.sleep(interval)
+            pending = [i for i in pending if not self.is_cached(i)]
+
+    def report_cache_stats(self, prefix="shared_dataset/"):
+        """Reports the statistics of the cache, e.g., its number of hits."""
+        reporting.report(
+            {prefix + key: value for key, value in self.cache.stats().items()}
+        )
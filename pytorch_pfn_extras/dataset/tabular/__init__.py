@@ -1,10 +1,18 @@
 from pytorch_pfn_extras.dataset.tabular import _asmode  # NOQA
 from pytorch_pfn_extras.dataset.tabular import _concat  # NOQA
 from pytorch_pfn_extras.dataset.tabular import _join  # NOQA
+from pytorch_pfn_extras.dataset.tabular import _materialize  # NOQA
 from pytorch_pfn_extras.dataset.tabular import _slice  # NOQA
 from pytorch_pfn_extras.dataset.tabular import _transform  # NOQA
 from pytorch_pfn_extras.dataset.tabular import _with_converter  # NOQA
+from pytorch_pfn_extras.dataset.tabular.batched_dataset import (  # NOQA
+    BatchedDataset,
+    create_batched_loader,
+)
 from pytorch_pfn_extras.dataset.tabular.delegate_dataset import (  # NOQA
     DelegateDataset,
 )
 from pytorch_pfn_extras.dataset.tabular.from_data import from_data  # NOQA
+from pytorch_pfn_extras.dataset.tabular.from_directory import (  # NOQA
+    from_directory,
+)
@@ -1,5 +1,9 @@
 # mypy: ignore-errors
 
+import bisect
+import itertools
+
+import numpy
 from pytorch_pfn_extras.dataset.tabular import tabular_dataset
 
 
@@ -34,11 +38,9 @@ class _Concat(tabular_dataset.TabularDataset):
                 for dataset in self._datasets
             ]
             return tuple(
-                [
-                    data
-                    for sub_examples in examples
-                    for data in sub_examples[col_index]
-                ]
+                _concat_columns(
+                    [sub_examples[col_index] for sub_examples in examples]
+                )
                 for col_index in range(n_cols)
             )
 
@@ -56,8 +58,11 @@ class _Concat(tabular_dataset.TabularDataset):
                     sub_stop = min(sub_stop, len(dataset))
                 else:
                     if sub_start >= len(dataset):
+                        # Last index of the dataset reached by the step
                         sub_start = (
-                            len(dataset) + (sub_start - len(dataset)) % step
+                            len(dataset)
+                            - 1
+                            + (sub_start - len(dataset) + 1) % step
                         )
                     sub_stop = max(sub_stop, -1)
 
@@ -82,45 +87,87 @@ class _Concat(tabular_dataset.TabularDataset):
                 if step < 0:
                     examples.reverse()
                 return tuple(
-                    [
-                        data
-                        for sub_examples in examples
-                        for data in sub_examples[col_index]
-                    ]
+                    _concat_columns(
+                        [sub_examples[col_index] for sub_examples in examples]
+                    )
                     for col_index in range(n_cols)
                 )
 
         else:
-            examples = {}
-            example_indices = [None] * len(indices)
-            offset = 0
-            for dataset_index, dataset in enumerate(self._datasets):
-                sub_indices = []
-                for p, index in enumerate(indices):
-                    if index < offset or offset + len(dataset) <= index:
-                        continue
-                    sub_indices.append(index - offset)
-                    example_indices[p] = (dataset_index, len(sub_indices) - 1)
-
-                if len(sub_indices) > 0:
-                    examples[dataset_index] = dataset.get_examples(
-                        sub_indices, key_indices
+            if len(indices) == 0:
+                return tuple([] for _ in range(n_cols))
+
+            offsets = self._offsets()
+            if len(indices) == 1:
+                # Fast path of get_example, avoiding the array operations
+                index = int(indices[0])
+                if 0 <= index < offsets[-1]:
+                    dataset_index = bisect.bisect_right(offsets, index) - 1
+                    return self._datasets[dataset_index].get_examples(
+                        [index - offsets[dataset_index]], key_indices
                     )
 
-                offset += len(dataset)
+            indices = numpy.asarray(indices, dtype=numpy.int64)
+            if indices.min() < 0 or offsets[-1] <= indices.max():
+                raise IndexError(
+                    "indices are out of bounds for dataset with size {}".format(
+                        offsets[-1]
+                    )
+                )
+            dataset_indices = (
+                numpy.searchsorted(offsets, indices, side="right") - 1
+            )
+            # Groups the positions by dataset, keeping the requested order
+            # within each dataset
+            order = numpy.argsort(dataset_indices, kind="stable")
+            counts = numpy.bincount(
+                dataset_indices, minlength=len(self._datasets)
+            )
+            ends = numpy.cumsum(counts)
 
-            if len(examples) == 0:
-                return tuple([] for _ in range(n_cols))
-            elif len(examples) == 1:
-                return list(examples.values())[0]
+            examples = []
+            for dataset_index, dataset in enumerate(self._datasets):
+                if counts[dataset_index] == 0:
+                    continue
+                end = ends[dataset_index]
+                positions = order[end - counts[dataset_index] : end]
+                sub_indices = indices[positions] - offsets[dataset_index]
+                examples.append(
+                    dataset.get_examples(sub_indices.tolist(), key_indices)
+                )
+
+            if len(examples) == 1:
+                return examples[0]
             else:
+                # Position of each requested example in the concatenation
+                inverse = numpy.empty_like(order)
+                inverse[order] = numpy.arange(len(order))
                 return tuple(
-                    [
-                        examples[dataset_index][col_index][p]
-                        for dataset_index, p in example_indices
-                    ]
+                    _concat_columns(
+                        [sub_examples[col_index] for sub_examples in examples],
+                        inverse,
+                    )
                     for col_index in range(n_cols)
                 )
 
+    def _offsets(self):
+        lengths = [len(dataset) for dataset in self._datasets]
+        return [0] + list(itertools.accumulate(lengths))
+
     def convert(self, data):
         return self._datasets[0].convert(data)
+
+
+def _concat_columns(columns, order=None):
+    if all(isinstance(column, numpy.ndarray) for column in columns) and (
+        len({column.shape[1:] for column in columns}) == 1
+    ):
+        data = numpy.concatenate(columns)
+        if order is not None:
+            data = data[order]
+        return data
+
+    data = [value for column in columns for value in column]
+    if order is not None:
+        data = [data[index] for index in order.tolist()]
+    return data
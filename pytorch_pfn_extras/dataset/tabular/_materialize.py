@@ -0,0 +1,71 @@
+# mypy: ignore-errors
+
+from pytorch_pfn_extras.dataset.tabular import _utils, tabular_dataset
+from pytorch_pfn_extras.dataset.tabular.from_data import _make_dataset
+from pytorch_pfn_extras.dataset.tabular.from_directory import (
+    _Directory,
+    _iter_chunks,
+    _load_meta,
+    _save_columns,
+)
+
+
+class _Materialized(tabular_dataset.TabularDataset):
+    def __init__(self, dataset, path, keys, version):
+        if keys is None:
+            keys = dataset.keys
+        elif not isinstance(keys, tuple):
+            keys = (keys,)
+        key_indices = _utils._as_key_indices(keys, dataset.keys)
+        keys = tuple(dataset.keys[key_index] for key_index in key_indices)
+
+        if path is None:
+            columns = dataset.get_examples(None, key_indices)
+            cached = [
+                _make_dataset(key, column, None)
+                for key, column in zip(keys, columns)
+            ]
+        else:
+            meta = _load_meta(path)
+            if meta is None or (
+                meta["version"] != version
+                or meta["length"] != len(dataset)
+                or tuple(meta["keys"]) != keys
+            ):
+                _save_columns(
+                    path,
+                    keys,
+                    _iter_chunks(dataset, key_indices),
+                    len(dataset),
+                    tuple,
+                    version,
+                )
+            cached = [_Directory(path)] if len(keys) > 0 else []
+        rest = tuple(key for key in dataset.keys if key not in keys)
+        if len(rest) > 0:
+            cached.append(dataset.slice[:, rest])
+        if len(cached) == 0:
+            view = dataset
+        else:
+            # Reorders the columns as in the original dataset
+            view = cached[0].join(*cached[1:]).slice[:, dataset.keys]
+
+        self._dataset = view
+        self._source = dataset
+
+    def __len__(self):
+        return len(self._source)
+
+    @property
+    def keys(self):
+        return self._source.keys
+
+    @property
+    def mode(self):
+        return self._source.mode
+
+    def get_examples(self, indices, key_indices):
+        return self._dataset.get_examples(indices, key_indices)
+
+    def convert(self, data):
+        return self._source.convert(data)
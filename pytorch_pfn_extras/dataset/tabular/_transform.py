@@ -1,5 +1,9 @@
 # mypy: ignore-errors
 
+import concurrent.futures
+import multiprocessing.util
+import os
+
 from pytorch_pfn_extras.dataset.tabular import _utils, tabular_dataset
 
 
@@ -22,6 +26,8 @@ class _TransformBase(tabular_dataset.TabularDataset):
             )
 
         self._keys = keys
+        # Execution plans cached by the requested key indices
+        self._plans = {}
 
     def __len__(self):
         return len(self._dataset)
@@ -36,115 +42,212 @@ class _TransformBase(tabular_dataset.TabularDataset):
             self.get_examples([0], None)
         return self._mode
 
-    def _find_candidate_transforms(self, key_indices):
-        # TODO: memoize
+    def _get_plan(self, key_indices):
+        key_indices = tuple(key_indices)  # sometimes we get ranges
+        plan = self._plans.get(key_indices)
+        if plan is None:
+            plan = self._compile_plan(key_indices)
+            self._plans[key_indices] = plan
+        return plan
 
+    def _compile_plan(self, key_indices):
         # Assume that all the registered transformations are
         # disjoint on the outputs
-        key_indices = list(key_indices)  # sometimes we get ranges
-        transforms = []
-        operands = set()
+        # Positions of the requested columns, a column can be requested
+        # more than once
+        positions = {}
+        for position, key_index in enumerate(key_indices):
+            positions.setdefault(key_index, []).append(position)
+
         # Look for the transforms that produce the
         # columns specified in the result
         # to avoid calculating uneeded columns
-        for s, t in self._transforms:
-            ops_idx, res_idx = s
-            # We only allow to execute transformations that will generate
-            # the exact requested columns
-            # We look for transformations that produces the requested keys
-            # we allow key_indices select a given key for transformations
-            # producting multiple keys since we have ensured all are disjoint
-            # contained holds the transf. indexes that belong to key_indices
-            # An element that is not required by key_indices,
-            # its index is replaced with None.
-            contained = [r if r in key_indices else None for r in res_idx]
-            if any(r is not None for r in contained):
+        candidates = []
+        operands = set()
+        for (ops_idx, res_idx), t in self._transforms:
+            # An output that is not required by key_indices is skipped,
+            # the others are stored as (index in the output of the
+            # transformation, key, position in the result)
+            outputs = [
+                (col_index, self._keys[key_index], position)
+                for col_index, key_index in enumerate(res_idx)
+                for position in positions.get(key_index, ())
+            ]
+            if len(outputs) > 0:
                 # Now look the indices of the keys we need to fetch
                 # from the original dataset to apply this transformation
                 operands.update(ops_idx)
-                transforms.append((ops_idx, t, contained))
-        return list(operands), transforms
+                candidates.append((ops_idx, t, outputs))
+
+        # The operands are fetched at once, so the inputs of each
+        # transformation are located in the fetched columns beforehand
+        ops_idx = tuple(sorted(operands))
+        ops_positions = {key_index: p for p, key_index in enumerate(ops_idx)}
+        steps = []
+        for t_ops_idx, t, outputs in candidates:
+            steps.append(
+                (
+                    t,
+                    tuple(ops_positions[i] for i in t_ops_idx),
+                    tuple(self._dataset.keys[i] for i in t_ops_idx),
+                    outputs,
+                )
+            )
+        return ops_idx, steps
 
     def convert(self, data):
         return self._dataset.convert(data)
 
 
+# Compared by equality, as it is also sent to other processes
+_unset = "unset"
+
+
+def _call(transform, inputs, input_keys, mode):
+    if mode is dict:
+        return transform(**dict(zip(input_keys, inputs)))
+    else:
+        return transform(*inputs)
+
+
+def _mode_of(example):
+    if isinstance(example, tuple):
+        return tuple
+    elif isinstance(example, dict):
+        return dict
+    else:
+        return None
+
+
 class _Transform(_TransformBase):
+    def __init__(
+        self, dataset, keys, transforms, num_workers=0, executor="thread"
+    ):
+        super().__init__(dataset, keys, transforms)
+        if num_workers < 0:
+            raise ValueError("num_workers must be non-negative")
+        if executor not in ("thread", "process"):
+            raise ValueError(
+                "executor must be either 'thread' or 'process', "
+                "got {!r}".format(executor)
+            )
+        self._num_workers = num_workers
+        self._executor_type = executor
+        self._executor = None
+        self._executor_pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The pool is created again in each process
+        state["_executor"] = None
+        return state
+
+    def _get_executor(self):
+        # A forked process (e.g. a worker of a DataLoader) inherits the
+        # pool, but not its threads nor its processes
+        if self._executor is None or self._executor_pid != os.getpid():
+            if self._executor_type == "thread":
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self._num_workers
+                )
+            else:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    self._num_workers
+                )
+            self._executor_pid = os.getpid()
+            # Processes started by multiprocessing (e.g. the workers of a
+            # DataLoader) exit without running the atexit handlers
+            multiprocessing.util.Finalize(
+                self, self._executor.shutdown, exitpriority=100
+            )
+        return self._executor
+
     def get_examples(self, indices, key_indices):
         if key_indices is None:
             key_indices = range(len(self._keys))
-        ops_idx, transforms = self._find_candidate_transforms(key_indices)
+        ops_idx, steps = self._get_plan(key_indices)
         in_examples = self._dataset.get_examples(indices, ops_idx)
-        out_examples = tuple([] for _ in key_indices)
+        in_mode = self._dataset.mode
+        mode = getattr(self, "_mode", _unset)
 
-        for in_example in zip(*in_examples):
-            for t_op_idx, transform, t_res_idx in transforms:
-                # The size of in_example might not be the same
-                # for the transformations.
-                # Suppose we have 5 dimensions, a, b, c, d, e
-                # Trans 1 uses a, d and Trans 2 uses only c
-                # the selection returns a 3 element array of (a,c,d)
-                # where trans 1 needs elems 0 and 2 and trans 2 needs 1
-                # So we need to select the inputs accordingly
-                # Recalculate the ops indexes to reflect this
-                inputs = [in_example[ops_idx.index(i)] for i in t_op_idx]
-                if self._dataset.mode is tuple:
-                    # Should be always be a tuple with the correct value
-                    out_example = transform(*inputs)
-                elif self._dataset.mode is dict:
-                    keys = [self._dataset.keys[i] for i in ops_idx]
-                    out_example = transform(**dict(zip(keys, inputs)))
-                elif self._dataset.mode is None:
-                    out_example = transform(*inputs)
-                if isinstance(out_example, tuple):
-                    if hasattr(self, "_mode") and self._mode is not tuple:
-                        raise ValueError(
-                            "transform must not change its return type"
-                        )
-                    self._mode = tuple
-                    for col_index, key_index in enumerate(t_res_idx):
-                        if key_index is None:
-                            continue
-                        # t_res_idx should directly map the output, when
-                        # all the outputs are covered this works but when
-                        # we are slicing the outputs using key_indices
-                        # the result key index needs to be recalculated
-                        out_examples[key_indices.index(key_index)].append(
-                            out_example[col_index]
-                        )
-                elif isinstance(out_example, dict):
-                    if hasattr(self, "_mode") and self._mode is not dict:
-                        raise ValueError(
-                            "transform must not change its return type"
-                        )
-                    self._mode = dict
-                    for _, key_index in enumerate(t_res_idx):
-                        if key_index is None:
-                            continue
-                        key = self._keys[key_index]
-                        out_examples[key_indices.index(key_index)].append(
-                            out_example[key]
-                        )
-                else:
-                    if hasattr(self, "_mode") and self._mode is not None:
-                        raise ValueError(
-                            "transform must not change its return type"
-                        )
-                    self._mode = None
-                    out_example = (out_example,)
-                    for col_index, key_index in enumerate(t_res_idx):
-                        if key_index is None:
-                            continue
-                        out_examples[key_indices.index(key_index)].append(
-                            out_example[col_index]
-                        )
+        in_examples = list(zip(*in_examples))
+        if self._num_workers == 0 or len(in_examples) < 2:
+            chunks = [in_examples]
+        else:
+            # Several chunks per worker to balance the load
+            chunk_size = -(-len(in_examples) // (self._num_workers * 4))
+            chunks = [
+                in_examples[i : i + chunk_size]
+                for i in range(0, len(in_examples), chunk_size)
+            ]
+
+        if len(chunks) == 1:
+            results = [
+                _apply_transforms(
+                    steps, in_mode, len(key_indices), chunks[0], mode
+                )
+            ]
+        else:
+            # The chunks are checked against each other when gathering
+            # the results, for the case where the mode is not known yet
+            executor = self._get_executor()
+            futures = [
+                executor.submit(
+                    _apply_transforms,
+                    steps,
+                    in_mode,
+                    len(key_indices),
+                    chunk,
+                    mode,
+                )
+                for chunk in chunks
+            ]
+            results = [future.result() for future in futures]
 
+        out_examples = tuple([] for _ in key_indices)
+        for out_mode, chunk_examples in results:
+            if out_mode == _unset:
+                continue
+            if out_mode is not mode:
+                if mode != _unset:
+                    raise ValueError(
+                        "transform must not change its return type"
+                    )
+                mode = self._mode = out_mode
+            for column, chunk_column in zip(out_examples, chunk_examples):
+                column.extend(chunk_column)
         return out_examples
 
     def convert(self, data):
         return self._dataset.convert(data)
 
 
+def _apply_transforms(steps, in_mode, n_cols, in_examples, mode):
+    out_examples = tuple([] for _ in range(n_cols))
+
+    for in_example in in_examples:
+        for transform, in_positions, in_keys, outputs in steps:
+            inputs = [in_example[p] for p in in_positions]
+            out_example = _call(transform, inputs, in_keys, in_mode)
+            out_mode = _mode_of(out_example)
+            if out_mode is not mode:
+                if mode != _unset:
+                    raise ValueError(
+                        "transform must not change its return type"
+                    )
+                mode = out_mode
+            if out_mode is dict:
+                for _, key, position in outputs:
+                    out_examples[position].append(out_example[key])
+            else:
+                if out_mode is None:
+                    out_example = (out_example,)
+                for col_index, _, position in outputs:
+                    out_examples[position].append(out_example[col_index])
+
+    return mode, out_examples
+
+
 class _TransformBatch(_TransformBase):
     def get_examples(self, indices, key_indices):
         if indices is None:
@@ -158,71 +261,35 @@ class _TransformBatch(_TransformBase):
         if key_indices is None:
             key_indices = range(len(self._keys))
 
-        ops_idx, transforms = self._find_candidate_transforms(key_indices)
+        ops_idx, steps = self._get_plan(key_indices)
         in_examples = self._dataset.get_examples(indices, ops_idx)
         out_examples = [None for _ in key_indices]
-        for t_op_idx, transform, t_res_idx in transforms:
-            inputs = [in_examples[ops_idx.index(i)] for i in t_op_idx]
-            if self._dataset.mode is tuple:
-                out_example = transform(*inputs)
-            elif self._dataset.mode is dict:
-                keys = [self._dataset.keys[i] for i in ops_idx]
-                out_example = transform(**dict(zip(keys, inputs)))
-            elif self._dataset.mode is None:
-                out_example = transform(*inputs)
-
-            if isinstance(out_example, tuple):
-                if hasattr(self, "_mode") and self._mode is not tuple:
-                    raise ValueError(
-                        "transform_batch must not change its return type"
-                    )
-                self._mode = tuple
-                if not all(len(col) == len_ for col in out_example):
-                    raise ValueError(
-                        "transform_batch must not change the length of data"
-                    )
-                for col_index, key_index in enumerate(t_res_idx):
-                    if key_index is None:
-                        continue
-                    # t_res_idx should directly map the output, when
-                    # all the outputs are covered this works but when
-                    # we are slicing the outputs using key_indices
-                    # the result key index needs to be recalculated
-                    out_examples[key_indices.index(key_index)] = out_example[
-                        col_index
-                    ]
-            elif isinstance(out_example, dict):
-                if hasattr(self, "_mode") and self._mode is not dict:
-                    raise ValueError(
-                        "transform must not change its return type"
+        in_mode = self._dataset.mode
+        for transform, in_positions, in_keys, outputs in steps:
+            inputs = [in_examples[p] for p in in_positions]
+            out_example = _call(transform, inputs, in_keys, in_mode)
+            out_mode = _mode_of(out_example)
+            if hasattr(self, "_mode") and self._mode is not out_mode:
+                raise ValueError(
+                    "{} must not change its return type".format(
+                        "transform_batch" if out_mode is tuple else "transform"
                     )
-                self._mode = dict
-                if not all(len(col) == len_ for col in out_example.values()):
-                    raise ValueError(
-                        "transform_batch must not change the length of data"
-                    )
-                for _, key_index in enumerate(t_res_idx):
-                    if key_index is None:
-                        continue
-                    key = self._keys[key_index]
-                    out_examples[key_indices.index(key_index)] = out_example[
-                        key
-                    ]
+                )
+            self._mode = out_mode
+
+            if out_mode is dict:
+                columns = out_example.values()
+            elif out_mode is tuple:
+                columns = out_example
             else:
-                if hasattr(self, "_mode") and self._mode is not None:
-                    raise ValueError(
-                        "transform must not change its return type"
-                    )
-                self._mode = None
-                out_example = (out_example,)
-                if not all(len(col) == len_ for col in out_example):
-                    raise ValueError(
-                        "transform_batch must not change the length of data"
-                    )
-                for col_index, key_index in enumerate(t_res_idx):
-                    if key_index is None:
-                        continue
-                    out_examples[key_indices.index(key_index)] = out_example[
-                        col_index
-                    ]
+                columns = out_example = (out_example,)
+            if not all(len(col) == len_ for col in columns):
+                raise ValueError(
+                    "transform_batch must not change the length of data"
+                )
+            for col_index, key, position in outputs:
+                if out_mode is dict:
+                    out_examples[position] = out_example[key]
+                else:
+                    out_examples[position] = out_example[col_index]
         return tuple(out_examples)
@@ -9,27 +9,30 @@ def _as_indices(indices, len_):
     if isinstance(indices, slice) or len(indices) == 0:
         return indices
 
-    if all(isinstance(index, (bool, np.bool_)) for index in indices):
-        if not len(indices) == len_:
+    array = np.asarray(indices)
+    if array.ndim != 1 or array.dtype.kind not in "biu":
+        array = np.array([int(index) for index in indices], dtype=np.int64)
+
+    if array.dtype.kind == "b":
+        if not len(array) == len_:
             raise ValueError(
                 "The number of booleans is "
                 "different from the length of dataset"
             )
-        return [i for i, index in enumerate(indices) if index]
+        return np.flatnonzero(array).tolist()
     else:
-        checked_indices = []
-        for index in indices:
-            index = int(index)
+        array = array.astype(np.int64)
+        out_of_bounds = (array < -len_) | (len_ <= array)
+        if out_of_bounds.any():
+            index = int(array[np.argmax(out_of_bounds)])
             if index < 0:
                 index += len_
-            if index < 0 or len_ <= index:
-                raise IndexError(
-                    "index {} is out of bounds for dataset with size {}".format(
-                        index, len_
-                    )
+            raise IndexError(
+                "index {} is out of bounds for dataset with size {}".format(
+                    index, len_
                 )
-            checked_indices.append(index)
-        return checked_indices
+            )
+        return np.where(array < 0, array + len_, array).tolist()
 
 
 def _as_key_indices(keys, key_names):
@@ -80,7 +83,7 @@ def _merge_indices(a, b, len_a, len_b):
         return slice(start, stop, step)
     elif isinstance(a, slice):
         a_start, _, a_step = a.indices(len_a)
-        return [a_start + a_step * index for index in b]
+        return (a_start + a_step * np.asarray(b, dtype=np.int64)).tolist()
     elif isinstance(b, slice):
         return a[b]
     else:
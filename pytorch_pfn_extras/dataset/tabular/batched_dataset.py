@@ -0,0 +1,98 @@
+# mypy: ignore-errors
+
+import torch
+
+
+class BatchedDataset(torch.utils.data.Dataset):
+    """An adapter to load batches of a TabularDataset at once.
+
+    The index of this dataset is a list of indices of the examples of a
+    batch, such as those yielded by
+    :class:`torch.utils.data.BatchSampler`. A batch is fetched with a
+    single call of :meth:`~pytorch_pfn_extras.dataset.TabularDataset.\
+get_examples`, and converted by
+    :meth:`~pytorch_pfn_extras.dataset.TabularDataset.convert`, so that
+    the DataLoader does not need to fetch and collate the examples one by
+    one. The adapter must be used with ``batch_size=None`` in the
+    DataLoader, as done by :func:`create_batched_loader`.
+
+    >>> import numpy as np
+    >>> import torch
+    >>>
+    >>> from pytorch_pfn_extras.dataset import tabular
+    >>>
+    >>> dataset = tabular.from_data({'a': np.arange(5), 'b': np.ones(5)})
+    >>> batched = tabular.BatchedDataset(dataset)
+    >>> batch = batched[[4, 0, 2]]
+    >>> batch['a']
+    array([4, 0, 2])
+    >>> loader = tabular.create_batched_loader(dataset, batch_size=2)
+    >>> [batch['a'].tolist() for batch in loader]
+    [[0, 1], [2, 3], [4]]
+
+    Args:
+        dataset (pytorch_pfn_extras.dataset.TabularDataset):
+            An underlying dataset.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, indices):
+        if isinstance(indices, torch.Tensor):
+            indices = indices.tolist()
+        else:
+            indices = list(indices)
+        examples = self.dataset.get_examples(indices, None)
+        return self.dataset.convert(self.dataset._to_mode(examples))
+
+
+def create_batched_loader(
+    dataset,
+    batch_size,
+    shuffle=False,
+    drop_last=False,
+    sampler=None,
+    **kwargs,
+):
+    """Create a DataLoader loading batches of a TabularDataset at once.
+
+    Args:
+        dataset (pytorch_pfn_extras.dataset.TabularDataset):
+            Dataset to load.
+        batch_size (int): Number of examples in a batch.
+        shuffle (bool): If ``True``, the examples are shuffled at every
+            epoch. It cannot be used with ``sampler``.
+        drop_last (bool): If ``True``, the last incomplete batch is
+            dropped.
+        sampler (torch.utils.data.Sampler): Sampler of the indices of
+            the examples, optional (e.g.
+            :class:`torch.utils.data.distributed.DistributedSampler`).
+        kwargs: Other arguments of :class:`torch.utils.data.DataLoader`,
+            such as ``num_workers`` and ``pin_memory``.
+
+    Returns:
+        A :class:`torch.utils.data.DataLoader` yielding the batches
+        converted by
+        :meth:`~pytorch_pfn_extras.dataset.TabularDataset.convert`,
+        with the arrays converted to tensors.
+    """
+    if sampler is None:
+        if shuffle:
+            sampler = torch.utils.data.RandomSampler(dataset)
+        else:
+            sampler = torch.utils.data.SequentialSampler(dataset)
+    elif shuffle:
+        raise ValueError("sampler option is mutually exclusive with shuffle")
+    batch_sampler = torch.utils.data.BatchSampler(
+        sampler, batch_size, drop_last
+    )
+    return torch.utils.data.DataLoader(
+        BatchedDataset(dataset),
+        sampler=batch_sampler,
+        batch_size=None,
+        **kwargs,
+    )
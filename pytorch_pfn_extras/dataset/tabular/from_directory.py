@@ -0,0 +1,398 @@
+# mypy: ignore-errors
+
+import functools
+import io
+import json
+import os
+import struct
+
+import numpy
+from pytorch_pfn_extras.dataset.tabular import tabular_dataset
+
+_META_FILENAME = "meta.json"
+_MODES = {"tuple": tuple, "dict": dict, None: None}
+# Number of examples fetched at once when writing a dataset
+_CHUNK_SIZE = 4096
+
+
+def from_directory(path):
+    """Create a TabularDataset from a directory written by :meth:`save`.
+
+    The columns are memory-mapped, so that the dataset can be sliced,
+    joined and concatenated without loading it, and the processes
+    reading it (e.g. the workers of a DataLoader) share the page cache.
+    An example of a ragged column is returned as a view of the stored
+    array.
+
+    >>> import tempfile
+    >>>
+    >>> from pytorch_pfn_extras.dataset import tabular
+    >>>
+    >>> dataset = tabular.from_data(
+    ...     {'a': [0, 1, 2], 'b': [[3], [4, 5], []]}
+    ... )
+    >>> with tempfile.TemporaryDirectory() as path:
+    ...     dataset.save(path)
+    ...     loaded = tabular.from_directory(path)
+    ...     print(loaded.keys, len(loaded), int(loaded[1]['a']))
+    ...     print(loaded[1]['b'].tolist())
+    ('a', 'b') 3 1
+    [4, 5]
+
+    Args:
+        path (str): Directory written by :meth:`save`.
+
+    Return:
+        A :class:`~pytorch_pfn_extras.dataset.TabularDataset`.
+    """
+    return _Directory(path)
+
+
+class _Directory(tabular_dataset.TabularDataset):
+    def __init__(self, path):
+        self._path = path
+        self._open()
+
+    def _open(self):
+        meta = _load_meta(self._path)
+        if meta is None:
+            raise FileNotFoundError(
+                "{} is not a saved dataset".format(self._path)
+            )
+        self._len = meta["length"]
+        self._keys = tuple(meta["keys"])
+        self._mode = _MODES[meta["mode"]]
+        self._columns = [
+            _open_column(self._path, i, ragged)
+            for i, ragged in enumerate(meta["ragged"])
+        ]
+
+    def __getstate__(self):
+        # The files are mapped again instead of copying the data
+        return {"_path": self._path}
+
+    def __setstate__(self, state):
+        self._path = state["_path"]
+        self._open()
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def get_examples(self, indices, key_indices):
+        if key_indices is None:
+            key_indices = range(len(self._keys))
+        return tuple(
+            _get_column(*self._columns[key_index], indices)
+            for key_index in key_indices
+        )
+
+
+def _column_filename(index, suffix=""):
+    return "column_{}{}.npy".format(index, suffix)
+
+
+def _open_column(path, index, ragged):
+    data = numpy.load(
+        os.path.join(path, _column_filename(index)), mmap_mode="r"
+    )
+    if ragged:
+        offsets = numpy.load(
+            os.path.join(path, _column_filename(index, ".offsets")),
+            mmap_mode="r",
+        )
+    else:
+        offsets = None
+    return data, offsets
+
+
+def _get_column(data, offsets, indices):
+    if offsets is None:
+        if indices is None:
+            return data
+        return data[indices]
+
+    if indices is None:
+        indices = slice(None)
+    starts = offsets[:-1][indices].tolist()
+    stops = offsets[1:][indices].tolist()
+    return [data[start:stop] for start, stop in zip(starts, stops)]
+
+
+def _load_meta(path):
+    try:
+        with open(os.path.join(path, _META_FILENAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _as_uniform(column):
+    # Returns the column as an array if its examples have the same shape
+    try:
+        array = numpy.asarray(column)
+    except ValueError:
+        return None
+    if array.dtype == object:
+        return None
+    return array
+
+
+def _as_items(key, column):
+    # Returns the examples of a ragged column as arrays of items
+    try:
+        items = [numpy.asarray(value) for value in column]
+    except ValueError:
+        items = None
+    if items is None or not all(
+        item.ndim > 0 and item.dtype != object for item in items
+    ):
+        raise ValueError("column {} cannot be stored as an array".format(key))
+    return items
+
+
+def _array_header(dtype, shape, size=None):
+    # Returns the .npy header of an array. It is padded with spaces to
+    # ``size`` bytes, so that it can be rewritten in place once the length
+    # of the array is known
+    buf = io.BytesIO()
+    numpy.lib.format.write_array_header_1_0(
+        buf,
+        {
+            "descr": numpy.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": shape,
+        },
+    )
+    header = buf.getvalue()
+    if size is None:
+        return header
+    # Magic string, version and length of the header text, then the text
+    # which ends with a newline
+    text = header[10:-1] + b" " * (size - len(header)) + b"\n"
+    return header[:8] + struct.pack("<H", len(text)) + text
+
+
+class _ColumnWriter:
+    """Writes a column given by chunks of examples.
+
+    The chunks are written to a file preallocated for the whole column, as
+    long as the examples have the same shape. Otherwise, the column is
+    stored as a ragged column: the items of the examples are appended to
+    the data file, whose header is completed once their number is known,
+    and their offsets to a file preallocated for the whole column.
+    """
+
+    def __init__(self, path, index, key, length):
+        self._path = path
+        self._index = index
+        self._key = key
+        self._length = length
+        self._filename = os.path.join(path, _column_filename(index))
+        self._array = None
+        self._n = 0
+        # Set once the column is stored as a ragged column
+        self._offsets_filename = None
+        self._offsets = None
+        self._data_file = None
+        self._dtype = None
+        self._item_shape = None
+        self._header_size = 0
+        self._n_items = 0
+
+    def write(self, column):
+        if self._offsets is None:
+            data = _as_uniform(column)
+            if (
+                data is not None
+                and self._array is not None
+                and data.shape[1:] != self._array.shape[1:]
+            ):
+                data = None
+            if data is not None:
+                self._reserve(data.dtype, data.shape[1:])
+                self._array[self._n : self._n + len(data)] = data
+                self._n += len(data)
+                return
+            self._start_ragged()
+        self._append_items(_as_items(self._key, column))
+
+    def _reserve(self, dtype, shape):
+        if self._array is not None:
+            dtype = numpy.promote_types(self._array.dtype, dtype)
+            if dtype == self._array.dtype:
+                return
+        array = numpy.lib.format.open_memmap(
+            self._filename + ".part",
+            mode="w+",
+            dtype=dtype,
+            shape=(self._length,) + shape,
+        )
+        if self._array is not None:
+            # The examples written so far are converted to the new dtype
+            array[: self._n] = self._array[: self._n]
+        os.replace(self._filename + ".part", self._filename + ".tmp")
+        self._array = array
+
+    def _start_ragged(self):
+        offsets_filename = os.path.join(
+            self._path, _column_filename(self._index, ".offsets")
+        )
+        self._offsets_filename = offsets_filename
+        self._offsets = numpy.lib.format.open_memmap(
+            offsets_filename + ".tmp",
+            mode="w+",
+            dtype=numpy.int64,
+            shape=(self._length + 1,),
+        )
+        array, n = self._array, self._n
+        self._array = None
+        self._n = 0
+        if array is not None:
+            # The examples written so far are moved to the ragged column
+            for start in range(0, n, _CHUNK_SIZE):
+                chunk = array[start : start + _CHUNK_SIZE]
+                self._append_items(_as_items(self._key, chunk))
+            del array
+            os.remove(self._filename + ".tmp")
+
+    def _append_items(self, items):
+        non_empty = [item for item in items if len(item) > 0]
+        if non_empty:
+            if self._item_shape is None:
+                self._item_shape = non_empty[0].shape[1:]
+            if any(item.shape[1:] != self._item_shape for item in non_empty):
+                raise ValueError(
+                    "column {} cannot be stored as an array".format(self._key)
+                )
+            self._reserve_items(
+                functools.reduce(
+                    numpy.promote_types, {item.dtype for item in non_empty}
+                )
+            )
+            data = numpy.concatenate(
+                [item.astype(self._dtype, copy=False) for item in non_empty]
+            )
+            self._data_file.write(data.tobytes())
+        lengths = numpy.cumsum([len(item) for item in items], dtype=numpy.int64)
+        stop = self._n + len(items)
+        self._offsets[self._n + 1 : stop + 1] = self._n_items + lengths
+        self._n = stop
+        if len(items) > 0:
+            self._n_items += int(lengths[-1])
+
+    def _reserve_items(self, dtype):
+        if self._dtype is not None:
+            dtype = numpy.promote_types(self._dtype, dtype)
+            if dtype == self._dtype:
+                return
+        # Room for the header of the longest possible column
+        header_size = len(
+            _array_header(
+                dtype, (numpy.iinfo(numpy.int64).max,) + self._item_shape
+            )
+        )
+        with open(self._filename + ".part", "wb") as f:
+            f.write(b"\0" * header_size)
+            if self._data_file is not None:
+                # The items written so far are converted to the new dtype
+                self._data_file.close()
+                items = numpy.memmap(
+                    self._filename + ".tmp.ragged",
+                    dtype=self._dtype,
+                    mode="r",
+                    offset=self._header_size,
+                    shape=(self._n_items,) + self._item_shape,
+                )
+                for start in range(0, self._n_items, _CHUNK_SIZE):
+                    chunk = items[start : start + _CHUNK_SIZE]
+                    f.write(chunk.astype(dtype).tobytes())
+                del items
+        os.replace(self._filename + ".part", self._filename + ".tmp.ragged")
+        # Not in append mode, as the header is rewritten by ``close``
+        self._data_file = open(self._filename + ".tmp.ragged", "r+b")
+        self._data_file.seek(0, os.SEEK_END)
+        self._dtype = dtype
+        self._header_size = header_size
+
+    def close(self):
+        """Completes the files of the column.
+
+        Returns:
+            ``True`` if the column is stored as a ragged column.
+        """
+        if self._offsets is None:
+            self._array.flush()
+            self._array = None
+            os.replace(self._filename + ".tmp", self._filename)
+            return False
+
+        if self._dtype is None:
+            # The empty examples do not tell the dtype and the shape of an
+            # item
+            raise ValueError(
+                "column {} cannot be stored as an array".format(self._key)
+            )
+        self._offsets.flush()
+        self._offsets = None
+        os.replace(self._offsets_filename + ".tmp", self._offsets_filename)
+        header = _array_header(
+            self._dtype,
+            (self._n_items,) + self._item_shape,
+            self._header_size,
+        )
+        self._data_file.seek(0)
+        self._data_file.write(header)
+        self._data_file.close()
+        self._data_file = None
+        os.replace(self._filename + ".tmp.ragged", self._filename)
+        return True
+
+
+def _iter_chunks(dataset, key_indices):
+    # Fetches the columns by chunks of examples to bound the memory usage,
+    # while each example is still computed once for all the columns
+    for start in range(0, max(len(dataset), 1), _CHUNK_SIZE):
+        yield dataset.get_examples(
+            slice(start, start + _CHUNK_SIZE), key_indices
+        )
+
+
+def _save_columns(path, keys, chunks, length, mode, version=None):
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, _META_FILENAME)
+    # The columns are only valid once the metadata is written
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    writers = [
+        _ColumnWriter(path, i, key, length) for i, key in enumerate(keys)
+    ]
+    for chunk in chunks:
+        for writer, column in zip(writers, chunk):
+            writer.write(column)
+    ragged = [writer.close() for writer in writers]
+
+    meta = {
+        "version": version,
+        "length": length,
+        "keys": list(keys),
+        "mode": {tuple: "tuple", dict: "dict", None: None}[mode],
+        "ragged": ragged,
+    }
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def _save_array(filename, array):
+    with open(filename + ".tmp", "wb") as f:
+        numpy.save(f, array)
+    os.replace(filename + ".tmp", filename)
@@ -141,13 +141,7 @@ class TabularDataset(Dataset):
             If :attr:`mode` is :class:`dict`,
             this method returns a dict of lists/arrays.
         """
-        examples = self.get_examples(None, None)
-        if self.mode is tuple:
-            return examples
-        elif self.mode is dict:
-            return dict(zip(self.keys, examples))
-        elif self.mode is None:
-            return examples[0]
+        return self._to_mode(self.get_examples(None, None))
 
     def convert(self, data):
         """Convert fetched data.
@@ -214,7 +208,7 @@ class TabularDataset(Dataset):
         """
         return ppe.dataset.tabular._join._Join(self, *datasets)
 
-    def transform(self, keys, transform):
+    def transform(self, keys, transform, num_workers=0, executor="thread"):
         """Apply a transform to each example.
 
         The transformations are a list where each element
@@ -237,11 +231,21 @@ class TabularDataset(Dataset):
                 and returns transformed example. :attr:`mode` of
                 transformed dataset is determined by the transformed
                 examples.
+            num_workers (int): Number of workers applying the
+                transformations. If it is positive, the requested examples
+                are split into chunks transformed in a pool of workers, and
+                gathered in the original order. Defaults to ``0``, which
+                transforms the examples in the calling thread.
+            executor (str): Kind of the pool of workers, either
+                ``'thread'`` or ``'process'``. With ``'process'``, the
+                transformations and the examples must be picklable.
 
         Returns:
             A transfromed dataset.
         """
-        return ppe.dataset.tabular._transform._Transform(self, keys, transform)
+        return ppe.dataset.tabular._transform._Transform(
+            self, keys, transform, num_workers, executor
+        )
 
     def transform_batch(self, keys, transform_batch):
         """Apply a transform to examples.
@@ -274,6 +278,62 @@ class TabularDataset(Dataset):
             self, keys, transform_batch
         )
 
+    def materialize(self, path=None, keys=None, version=None):
+        """Compute columns once and return a dataset reading them.
+
+        This method is useful to avoid recomputing expensive
+        deterministic transformations at every epoch.
+        The columns specified by ``keys`` are fetched at once, and stored
+        in memory or in a directory in the format of :meth:`save`, which
+        is memory-mapped when read.
+        The other columns are still read from this dataset.
+
+        When ``path`` already holds columns stored with the same
+        ``version``, keys and length, they are read without computing
+        them again. Changing ``version`` invalidates the stored columns.
+
+        Args:
+            path (str): Directory to store the columns, optional.
+                If this argument is :obj:`None`, the columns are stored in
+                memory.
+            keys (tuple of ints/strs or int or str): Columns to compute.
+                If this argument is :obj:`None`, all columns are computed.
+            version (str or int): Tag identifying the content of the
+                columns, for example the version of the preprocessing.
+
+        Returns:
+            A dataset with the same :attr:`keys` and :attr:`mode`.
+        """
+        return ppe.dataset.tabular._materialize._Materialized(
+            self, path, keys, version
+        )
+
+    def save(self, path):
+        """Write the dataset to a directory.
+
+        Each column is written to a ``.npy`` file.
+        The examples of a ragged column (e.g. sequences of different
+        lengths) are concatenated along the first axis, and their
+        offsets are written to another ``.npy`` file.
+        The examples are fetched and written by chunks to limit the memory
+        usage, except those of the ragged columns, which are gathered in
+        memory before being written.
+        The dataset can be read with
+        :func:`~pytorch_pfn_extras.dataset.tabular.from_directory`.
+
+        Args:
+            path (str): Directory to write the dataset to.
+                It is created if it does not exist.
+        """
+        from pytorch_pfn_extras.dataset.tabular.from_directory import (
+            _iter_chunks,
+            _save_columns,
+        )
+
+        _save_columns(
+            path, self.keys, _iter_chunks(self, None), len(self), self.mode
+        )
+
     def with_converter(self, converter):
         """Override the behaviour of :meth:`convert`.
 
@@ -292,13 +352,23 @@ class TabularDataset(Dataset):
 
     def get_example(self, i):
         example = self.get_examples([i], None)
-        example = tuple(col[0] for col in example)
+        return self._to_mode(tuple(col[0] for col in example))
+
+    def _to_mode(self, values):
+        # Represents an example or columns with the mode of the dataset
         if self.mode is tuple:
-            return example
+            return values
         elif self.mode is dict:
-            return dict(zip(self.keys, example))
+            return dict(zip(self.keys, values))
         elif self.mode is None:
-            return example[0]
+            return values[0]
+
+    def _get_example_list(self, indices, n_examples):
+        # Fetches all the examples with a single call of get_examples
+        examples = self.get_examples(indices, None)
+        if len(examples) == 0:
+            return [self._to_mode(()) for _ in range(n_examples)]
+        return [self._to_mode(example) for example in zip(*examples)]
 
     def __iter__(self):
         return (self.get_example(i) for i in range(len(self)))
@@ -306,22 +376,28 @@ class TabularDataset(Dataset):
     def __getitem__(self, index):
         """Returns an example or a sequence of examples.
         It implements the standard Python indexing and one-dimensional integer
-        array indexing. It uses the :meth:`get_example` method by default, but
-        it may be overridden by the implementation to, for example, improve the
-        slicing performance.
+        array indexing. An example is created by :meth:`get_example`, and a
+        sequence of examples is fetched with a single call of
+        :meth:`get_examples`.
         Args:
             index (int, slice, list or numpy.ndarray): An index of an example
                 or indexes of examples.
         Returns:
             If index is int, returns an example created by `get_example`.
             If index is either slice or one-dimensional list or numpy.ndarray,
-            returns a list of examples created by `get_example`.
+            returns a list of examples.
         """
         if isinstance(index, slice):
-            current, stop, step = index.indices(len(self))
-            return [self.get_example(i) for i in range(current, stop, step)]
-        elif isinstance(index, list) or isinstance(index, numpy.ndarray):
-            return [self.get_example(i) for i in index]
+            start, stop, step = index.indices(len(self))
+            return self._get_example_list(
+                index, len(range(start, stop, step))
+            )
+        elif isinstance(index, numpy.ndarray):
+            return self._get_example_list(
+                index.astype(numpy.int64).tolist(), len(index)
+            )
+        elif isinstance(index, list):
+            return self._get_example_list(index, len(index))
         else:
             return self.get_example(index)
 
@@ -1,10 +1,34 @@
+from pytorch_pfn_extras.profiler._call_tree import (  # NOQA
+    CallTree,
+    disable_call_tree,
+    enable_call_tree,
+    get_call_tree,
+)
+from pytorch_pfn_extras.profiler._memory import (  # NOQA
+    disable_memory_profiling,
+    enable_memory_profiling,
+    memory_usage,
+)
 from pytorch_pfn_extras.profiler._record import record  # NOQA
 from pytorch_pfn_extras.profiler._record import record_function  # NOQA
 from pytorch_pfn_extras.profiler._record import record_iterable  # NOQA
+from pytorch_pfn_extras.profiler._ring_tracing import (  # NOQA
+    RingBufferTracer,
+    load_binary_trace_as_json,
+)
+from pytorch_pfn_extras.profiler._sampling import (  # NOQA
+    disable_sampling,
+    enable_sampling,
+    is_sampled,
+    sampling_step,
+)
+from pytorch_pfn_extras.profiler._sketch import QuantileSketch  # NOQA
 from pytorch_pfn_extras.profiler._time_summary import TimeSummary  # NOQA
 from pytorch_pfn_extras.profiler._time_summary import get_time_summary  # NOQA
 from pytorch_pfn_extras.profiler._tracing import (  # NOQA
     ChromeTracer,
+    CUDAEventBackend,
+    DeviceEventBackend,
     TraceableDataset,
     Tracer,
     clear_tracer,
@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pytorch_pfn_extras.writing import Writer
+
+_Path = Tuple[str, ...]
+
+
+class _Frame:
+    __slots__ = ("path", "begin", "child_ns")
+
+    def __init__(self, path: _Path) -> None:
+        self.path = path
+        self.child_ns = 0
+        self.begin = time.perf_counter_ns()
+
+
+class _ThreadCallTree:
+    def __init__(self) -> None:
+        self.thread = threading.current_thread()
+        self.stack: List[_Frame] = []
+        # Only written by the owner thread: odd while it updates ``stats``
+        self.epoch = 0
+        # Call path -> (count, inclusive time, time spent in child scopes)
+        self.stats: Dict[_Path, Tuple[int, int, int]] = {}
+
+    def swap(self) -> Dict[_Path, Tuple[int, int, int]]:
+        # Called by other threads, as ``TimeSummary`` hands over the
+        # statistics of each thread: only an update in flight may still
+        # use the old dict, and it is waited for
+        stats, self.stats = self.stats, {}
+        epoch = self.epoch
+        if epoch % 2:
+            while self.epoch == epoch and self.thread.is_alive():
+                time.sleep(0)
+        return stats
+
+
+def _save_collapsed(target: List[str], file_o: Any) -> None:
+    file_o.write("".join(f"{line}\n" for line in target).encode("utf-8"))
+
+
+class CallTree:
+    """Aggregates the times of nested profiled scopes per call path.
+
+    While the call tree is enabled with :func:`enable_call_tree`, each
+    scope of :func:`pytorch_pfn_extras.profiler.record` is pushed to a
+    per-thread stack, and its time is accumulated under its call path, the
+    tags of the enclosing scopes followed by its own tag. For each path,
+    both the inclusive time and the self time (the inclusive time minus
+    the time spent in nested scopes) are kept.
+
+    The aggregated times can be exported in the collapsed stack format
+    understood by flame graph tools with :meth:`flush`, which
+    :class:`pytorch_pfn_extras.training.extensions.ProfileReport` calls
+    when given a ``call_tree_filename``.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads: List[_ThreadCallTree] = []
+
+    def _get_thread(self) -> _ThreadCallTree:
+        try:
+            return self._local.tree  # type: ignore[no-any-return]
+        except AttributeError:
+            tree = _ThreadCallTree()
+            with self._lock:
+                self._threads.append(tree)
+            self._local.tree = tree
+            return tree
+
+    def push(self, tag: str) -> None:
+        """Starts a scope nested in the current one of the thread."""
+        stack = self._get_thread().stack
+        parent = stack[-1].path if stack else ()
+        stack.append(_Frame(parent + (tag,)))
+
+    def pop(self) -> None:
+        """Ends the current scope of the thread."""
+        tree = self._get_thread()
+        frame = tree.stack.pop()
+        elapsed = time.perf_counter_ns() - frame.begin
+        if tree.stack:
+            tree.stack[-1].child_ns += elapsed
+        tree.epoch += 1
+        stats = tree.stats
+        count, total, child = stats.get(frame.path, (0, 0, 0))
+        stats[frame.path] = (
+            count + 1,
+            total + elapsed,
+            child + frame.child_ns,
+        )
+        tree.epoch += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns the aggregated times of each call path.
+
+        Returns:
+            A dictionary mapping each call path, with its tags joined by
+            ``/``, to its number of calls (``count``), its inclusive time
+            (``total``) and its self time (``self``) in seconds.
+        """
+        result: Dict[str, Dict[str, float]] = {}
+        for path, (count, total, child) in self._merged().items():
+            result["/".join(path)] = {
+                "count": count,
+                "total": total / 1e9,
+                "self": (total - child) / 1e9,
+            }
+        return result
+
+    def _merged(self) -> Dict[_Path, Tuple[int, int, int]]:
+        with self._lock:
+            threads = list(self._threads)
+        merged: Dict[_Path, Tuple[int, int, int]] = {}
+        for tree in threads:
+            for path, (count, total, child) in tree.stats.copy().items():
+                c, t, ch = merged.get(path, (0, 0, 0))
+                merged[path] = (c + count, t + total, ch + child)
+        return merged
+
+    def collapsed_stacks(self) -> List[str]:
+        """Returns the self times in the collapsed stack format.
+
+        Each line holds a call path, with its tags joined by ``;``, and its
+        self time in microseconds.
+        """
+        lines = []
+        for path, (_, total, child) in sorted(self._merged().items()):
+            self_us = (total - child) // 1000
+            if self_us > 0:
+                tags = [tag.replace(";", ":") for tag in path]
+                lines.append(f"{';'.join(tags)} {self_us}")
+        return lines
+
+    def flush(self, filename: str, writer: Writer) -> None:
+        """Writes the collapsed stacks to ``filename`` with ``writer``."""
+        writer(
+            filename,
+            "",
+            self.collapsed_stacks(),  # type: ignore[arg-type]
+            savefun=_save_collapsed,
+            append=False,
+        )
+
+    def clear(self) -> None:
+        """Discards the times aggregated so far."""
+        with self._lock:
+            threads = list(self._threads)
+        for tree in threads:
+            tree.swap()
+
+
+_call_tree: Optional[CallTree] = None
+
+
+def enable_call_tree(call_tree: Optional[CallTree] = None) -> CallTree:
+    """Starts aggregating the profiled scopes per call path.
+
+    Args:
+        call_tree (CallTree): Call tree to aggregate the scopes into.
+            Optional, a new one is created by default.
+
+    Returns:
+        The enabled call tree.
+    """
+    global _call_tree
+    if call_tree is None:
+        call_tree = CallTree()
+    _call_tree = call_tree
+    return call_tree
+
+
+def disable_call_tree() -> None:
+    """Stops aggregating the profiled scopes per call path."""
+    global _call_tree
+    _call_tree = None
+
+
+def get_call_tree() -> Optional[CallTree]:
+    """Returns the enabled call tree, or ``None`` if it is disabled."""
+    return _call_tree
@@ -0,0 +1,190 @@
+import os
+import struct
+import sys
+import threading
+import warnings
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy
+from pytorch_pfn_extras.profiler._ring_tracing import (
+    _EVENT_STRUCT,
+    EVENT_DTYPE,
+    _to_chrome_events,
+)
+
+# Each worker owns a slot made of a header and a ring of event records.
+# The header holds the number of records written and dropped, updated only
+# by the worker, and the number of records read, updated only by the main
+# process.
+_U64 = struct.Struct("<Q")
+_WRITTEN = 0
+_READ = 8
+_DROPPED = 16
+_HEADER_SIZE = 24
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Attaching must not register the segment with the resource tracker,
+    # which would remove it when a worker with its own tracker exits
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Unregistering after attaching would also drop the registration of
+    # the main process when the tracker is shared with it, as in workers
+    # started by ``spawn``, so the registration is skipped instead. Workers
+    # attach while unpickling the dataset, before running other threads.
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _release(
+    shm: shared_memory.SharedMemory, owner_pid: Optional[int]
+) -> None:
+    shm.close()
+    # Forked processes inherit the channel but must not remove the segment
+    if os.getpid() == owner_pid:
+        shm.unlink()
+
+
+class SharedMemoryEventChannel:
+    """Channel to send trace events from DataLoader workers.
+
+    The channel is a shared memory segment holding a ring buffer of fixed
+    size event records for each worker. Workers append the events of
+    their process to their ring without any locking or serialization, and
+    the main process drains the rings when the tracer is flushed. When a
+    ring is full, new events are dropped and counted in
+    :attr:`dropped_count`.
+
+    The channel must be created in the main process, before the workers
+    are started.
+
+    Args:
+        max_workers (int): Number of workers that can send events. Events
+            of workers with a larger id are not recorded.
+        capacity (int): Number of events held by the ring of each worker.
+    """
+
+    def __init__(self, max_workers: int = 16, capacity: int = 65536) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.max_workers = max_workers
+        self._capacity = capacity
+        self._slot_size = _HEADER_SIZE + capacity * _EVENT_STRUCT.size
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max_workers * self._slot_size
+        )
+        self._names: List[str] = []
+        self._reported_drops = 0
+        self._finalizer = weakref.finalize(
+            self, _release, self._shm, os.getpid()
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Workers started with ``spawn`` attach to the segment by name
+        return {
+            "max_workers": self.max_workers,
+            "capacity": self._capacity,
+            "name": self._shm.name,
+            "names": self._names,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.max_workers = state["max_workers"]
+        self._capacity = state["capacity"]
+        self._slot_size = _HEADER_SIZE + self._capacity * _EVENT_STRUCT.size
+        self._shm = _attach(state["name"])
+        self._names = state["names"]
+        self._reported_drops = 0
+        # Only the channel that created the segment removes it
+        self._finalizer = weakref.finalize(self, _release, self._shm, None)
+
+    def register_name(self, name: str) -> int:
+        """Registers an event name and returns its id.
+
+        Names must be registered in the main process before the workers
+        are started.
+        """
+        if name not in self._names:
+            self._names.append(name)
+        return self._names.index(name)
+
+    def put(
+        self, worker_id: int, name_id: int, begin_ns: int, duration_ns: int
+    ) -> None:
+        """Appends an event to the ring of a worker."""
+        buf = self._shm.buf
+        base = worker_id * self._slot_size
+        (written,) = _U64.unpack_from(buf, base + _WRITTEN)
+        (read,) = _U64.unpack_from(buf, base + _READ)
+        if written - read >= self._capacity:
+            (dropped,) = _U64.unpack_from(buf, base + _DROPPED)
+            _U64.pack_into(buf, base + _DROPPED, dropped + 1)
+            return
+        index = written % self._capacity
+        offset = base + _HEADER_SIZE + index * _EVENT_STRUCT.size
+        _EVENT_STRUCT.pack_into(
+            buf,
+            offset,
+            name_id,
+            os.getpid(),
+            threading.get_native_id(),
+            begin_ns,
+            duration_ns,
+        )
+        # Publish the record only once it has been written
+        _U64.pack_into(buf, base + _WRITTEN, written + 1)
+
+    @property
+    def dropped_count(self) -> int:
+        """Number of events dropped because a ring was full."""
+        buf = self._shm.buf
+        return sum(
+            _U64.unpack_from(buf, i * self._slot_size + _DROPPED)[0]
+            for i in range(self.max_workers)
+        )
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Removes the events from the rings and returns them.
+
+        The events are returned in the Chrome trace format. A warning is
+        emitted if events have been dropped since the previous call.
+        """
+        buf = self._shm.buf
+        events: List[Dict[str, Any]] = []
+        for i in range(self.max_workers):
+            base = i * self._slot_size
+            (written,) = _U64.unpack_from(buf, base + _WRITTEN)
+            (read,) = _U64.unpack_from(buf, base + _READ)
+            if written == read:
+                continue
+            ring = numpy.frombuffer(
+                buf,
+                dtype=EVENT_DTYPE,
+                count=self._capacity,
+                offset=base + _HEADER_SIZE,
+            )
+            records = ring[numpy.arange(read, written) % self._capacity]
+            del ring
+            events.extend(_to_chrome_events(records, self._names))
+            _U64.pack_into(buf, base + _READ, written)
+        dropped = self.dropped_count
+        if dropped > self._reported_drops:
+            warnings.warn(
+                f"{dropped - self._reported_drops} trace events were dropped "
+                "because the shared memory ring of a worker was full. "
+                "Consider increasing its capacity."
+            )
+            self._reported_drops = dropped
+        return events
+
+    def close(self) -> None:
+        """Releases the shared memory segment."""
+        self._finalizer()
@@ -0,0 +1,117 @@
+import os
+import threading
+import tracemalloc
+from typing import Dict, Optional
+
+import torch
+
+# Process that opened ``_statm_fd``; "/proc/self" is resolved when the file
+# is opened, so forked processes need to open it again
+_statm_pid: Optional[int] = None
+_statm_fd = -1
+_statm_lock = threading.Lock()
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _open_statm() -> None:
+    global _statm_pid, _statm_fd
+    with _statm_lock:
+        pid = os.getpid()
+        if _statm_pid == pid:
+            return
+        if _statm_fd >= 0:
+            os.close(_statm_fd)
+        try:
+            _statm_fd = os.open("/proc/self/statm", os.O_RDONLY)
+        except OSError:
+            _statm_fd = -1
+        _statm_pid = pid
+
+
+def _rss_bytes() -> Optional[int]:
+    if _statm_pid != os.getpid():
+        _open_statm()
+    if _statm_fd < 0:
+        return None
+    # Reusing the descriptor avoids opening the file on every snapshot
+    data = os.pread(_statm_fd, 128, 0)
+    return int(data.split()[1]) * _page_size
+
+
+def memory_usage() -> Dict[str, int]:
+    """Returns the current memory usage of the process in bytes.
+
+    The returned dictionary holds the following entries when available:
+
+    * ``rss``: Resident set size of the process (Linux only).
+    * ``python``: Size of the memory blocks allocated by Python, if
+      :mod:`tracemalloc` is tracing.
+    * ``cuda``: Memory allocated by the CUDA caching allocator of PyTorch
+      on the current device, if CUDA has been initialized.
+    """
+    usage: Dict[str, int] = {}
+    rss = _rss_bytes()
+    if rss is not None:
+        usage["rss"] = rss
+    if tracemalloc.is_tracing():
+        usage["python"] = tracemalloc.get_traced_memory()[0]
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        usage["cuda"] = torch.cuda.memory_allocated()
+    return usage
+
+
+class _MemoryProfiler:
+    def __init__(self, sample_every: int, started_tracemalloc: bool) -> None:
+        self.sample_every = sample_every
+        self.started_tracemalloc = started_tracemalloc
+        self._count = 0
+
+    def sample(self) -> bool:
+        # Racy between threads, which only affects the sampling rate
+        self._count += 1
+        return self._count % self.sample_every == 0
+
+
+_memory_profiler: Optional[_MemoryProfiler] = None
+
+
+def enable_memory_profiling(
+    sample_every: int = 1,
+    trace_python: bool = False,
+) -> None:
+    """Captures the memory usage in the scopes of ``record``.
+
+    When enabled, the memory usage reported by :func:`memory_usage` is
+    captured at the beginning and at the end of the scopes of
+    :func:`pytorch_pfn_extras.profiler.record`. Traced scopes emit a
+    ``memory`` counter event with the usage at the end of the scope, and
+    the scopes reported to :class:`pytorch_pfn_extras.profiler.TimeSummary`
+    add the change of usage during the scope to the counters
+    ``<tag>.mem.rss``, ``<tag>.mem.python`` and ``<tag>.mem.cuda``, which
+    report the sum, minimum and maximum of the changes as ``.sum``,
+    ``.min`` and ``.max``.
+
+    Args:
+        sample_every (int): Captures the memory in one scope out of
+            ``sample_every`` scopes to lower the overhead.
+        trace_python (bool): Starts :mod:`tracemalloc` to capture the memory
+            allocated by Python. This slows down allocations noticeably.
+    """
+    global _memory_profiler
+    if sample_every <= 0:
+        raise ValueError("sample_every must be positive")
+    disable_memory_profiling()
+    started = trace_python and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    _memory_profiler = _MemoryProfiler(sample_every, started)
+
+
+def disable_memory_profiling() -> None:
+    """Stops capturing the memory usage in the scopes of ``record``."""
+    global _memory_profiler
+    if _memory_profiler is None:
+        return
+    if _memory_profiler.started_tracemalloc:
+        tracemalloc.stop()
+    _memory_profiler = None
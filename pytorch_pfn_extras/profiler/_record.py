@@ -13,7 +13,13 @@ from typing import (
 )
 
 import torch
-from pytorch_pfn_extras.profiler import _time_summary, _tracing
+from pytorch_pfn_extras.profiler import (
+    _call_tree,
+    _memory,
+    _sampling,
+    _time_summary,
+    _tracing,
+)
 from pytorch_pfn_extras.runtime import runtime_registry
 
 if TYPE_CHECKING:
@@ -49,6 +55,17 @@ def dummy_tracer(name: str) -> Generator[None, None, None]:
     yield None
 
 
+def _get_user_tracer(trace: Union[_tracing.Tracer, bool]) -> _tracing.Tracer:
+    user_tracer: _tracing.Tracer
+    if isinstance(trace, bool) and not trace:
+        user_tracer = _tracing.DummyTracer()
+    elif isinstance(trace, bool):
+        user_tracer = _tracing.get_tracer()
+    elif isinstance(trace, _tracing.Tracer):
+        user_tracer = trace
+    return user_tracer
+
+
 @contextmanager
 def tracer(
     tag: str,
@@ -59,18 +76,40 @@ def tracer(
     runtime_cls = runtime_registry.get_runtime_class_for_device_spec(device)
     runtime_tracer = runtime_cls.trace
 
-    user_tracer: _tracing.Tracer
-    if isinstance(trace, bool) and not trace:
-        user_tracer = _tracing.DummyTracer()
-    elif isinstance(trace, bool):
-        user_tracer = _tracing.get_tracer()
-    elif isinstance(trace, _tracing.Tracer):
-        user_tracer = trace
+    user_tracer = _get_user_tracer(trace)
 
     with runtime_tracer(tag, None), user_tracer.add_event(tag):
         yield
 
 
+@contextmanager
+def _record_memory(
+    metric: str,
+    trace: Union[_tracing.Tracer, bool],
+    summarize: bool,
+) -> Generator[None, None, None]:
+    profiler = _memory._memory_profiler
+    if profiler is None or not profiler.sample():
+        yield
+        return
+    begin = _memory.memory_usage()
+    try:
+        yield
+    finally:
+        end = _memory.memory_usage()
+        if not isinstance(trace, bool) or trace:
+            _get_user_tracer(trace).add_counter(
+                "memory", {k: float(v) for k, v in end.items()}
+            )
+        if summarize:
+            time_summary = _time_summary.get_time_summary()
+            for key, value in end.items():
+                if key in begin:
+                    time_summary.add_counter(
+                        f"{metric}.mem.{key}", value - begin[key]
+                    )
+
+
 @contextmanager
 def record(
     tag: Optional[str],
@@ -80,7 +119,10 @@ def record(
     device: "DeviceLike" = "cpu",
     trace: Union[_tracing.Tracer, bool] = False,
 ) -> Generator[_time_summary._ReportNotification, None, None]:
-    if not enable and not trace:
+    call_tree = _call_tree._call_tree
+    if not _sampling._sampled or (
+        not enable and not trace and call_tree is None
+    ):
         yield _DummyReportNotification()
         return
 
@@ -90,19 +132,30 @@ def record(
     if metric is None:
         metric = tag
 
-    if use_cuda:
-        torch.cuda.nvtx.range_push(tag)  # type: ignore[no-untyped-call]
+    if call_tree is not None:
+        call_tree.push(tag)
     try:
-        with tracer(tag, device, trace):
-            if not enable:
-                time_summary = _time_summary.get_time_summary()
-                with time_summary.report(metric, use_cuda) as ntf:
-                    yield ntf
-            else:
-                yield _DummyReportNotification()
-    finally:
+        if not enable and not trace:
+            yield _DummyReportNotification()
+            return
         if use_cuda:
-            torch.cuda.nvtx.range_pop()  # type: ignore[no-untyped-call]
+            torch.cuda.nvtx.range_push(tag)  # type: ignore[no-untyped-call]
+        try:
+            with tracer(tag, device, trace), _record_memory(
+                metric, trace, not enable
+            ):
+                if not enable:
+                    time_summary = _time_summary.get_time_summary()
+                    with time_summary.report(metric, use_cuda) as ntf:
+                        yield ntf
+                else:
+                    yield _DummyReportNotification()
+        finally:
+            if use_cuda:
+                torch.cuda.nvtx.range_pop()  # type: ignore[no-untyped-call]
+    finally:
+        if call_tree is not None:
+            call_tree.pop()
 
 
 _T = TypeVar("_T")
@@ -0,0 +1,505 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import numpy
+from pytorch_pfn_extras.profiler import _tracing, _util
+from pytorch_pfn_extras.writing import Writer
+
+EVENT_DTYPE = numpy.dtype(
+    [
+        ("name", "<i4"),
+        ("pid", "<i4"),
+        ("tid", "<i8"),
+        ("ts", "<i8"),  # nano sec
+        ("dur", "<i8"),  # nano sec
+    ]
+)
+_EVENT_STRUCT = struct.Struct("<iiqqq")
+assert _EVENT_STRUCT.size == EVENT_DTYPE.itemsize
+
+# The binary trace file starts with ``_MAGIC`` followed by blocks, each made
+# of a ``_BLOCK_HEADER`` (kind and payload length) and the payload.
+# ``NAME`` blocks hold a JSON list of the names interned since the previous
+# block, ``EVNT`` blocks hold raw records of ``EVENT_DTYPE``.
+_MAGIC = b"PPETRC01"
+_BLOCK_HEADER = struct.Struct("<4sQ")
+_NAME_BLOCK = b"NAME"
+_EVENT_BLOCK = b"EVNT"
+
+# Names and records to write, and the thread to give the buffer back to
+_Task = Optional[Tuple[List[str], numpy.ndarray, Optional["_ThreadBuffer"]]]
+
+
+def _to_chrome_events(
+    records: numpy.ndarray, names: List[str]
+) -> List[Dict[str, Any]]:
+    return [
+        dict(
+            name=names[name],
+            cat="",
+            ph="X",
+            ts=ts / 1000,  # nano sec -> micro sec
+            dur=dur / 1000,  # ditto
+            pid=pid,
+            tid=tid,
+        )
+        for name, pid, tid, ts, dur in records.tolist()
+    ]
+
+
+def load_binary_trace_as_json(filename: str) -> List[Dict[str, Any]]:
+    """Loads a trace written by :class:`RingBufferTracer`.
+
+    Args:
+        filename (str): Path of the binary trace file.
+
+    Returns:
+        The list of events in Chrome trace format.
+    """
+    names: List[str] = []
+    events: List[Dict[str, Any]] = []
+    with open(filename, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{filename} is not a binary trace file")
+        while True:
+            header = f.read(_BLOCK_HEADER.size)
+            if len(header) < _BLOCK_HEADER.size:
+                break
+            kind, length = _BLOCK_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                # Truncated block written by an interrupted process
+                break
+            if kind == _NAME_BLOCK:
+                names.extend(json.loads(payload))
+            elif kind == _EVENT_BLOCK:
+                records = numpy.frombuffer(payload, dtype=EVENT_DTYPE)
+                events.extend(_to_chrome_events(records, names))
+            else:
+                raise ValueError(f"unknown block in {filename}: {kind!r}")
+    return events
+
+
+class _ThreadBuffer:
+    """Events recorded by a thread, used as the scope of its events.
+
+    Only the thread owning the buffer writes the records and ``pos``, so
+    that recording an event takes no lock. The other threads read the
+    records up to ``pos`` with ``lock`` held, and the owner takes it to
+    replace or wrap around its buffer.
+    """
+
+    __slots__ = (
+        "tracer",
+        "thread",
+        "tid",
+        "lock",
+        "free",
+        "n_buffers",
+        "buffer",
+        "view",
+        "pos",
+        "start",
+        "wrapped",
+        "dropped",
+        "pending",
+        "name_ids",
+        "begins",
+    )
+
+    def __init__(self, tracer: "RingBufferTracer") -> None:
+        self.tracer = tracer
+        self.thread = threading.current_thread()
+        self.tid = threading.get_native_id()
+        self.lock = threading.Lock()
+        # Buffers written to the file, to be reused by the thread
+        self.free: "queue.Queue[numpy.ndarray]" = queue.Queue()
+        self.n_buffers = 1
+        self.set_buffer(numpy.zeros(tracer._buffer_size, dtype=EVENT_DTYPE))
+        # Records before ``start`` are already written or cleared
+        self.start = 0
+        # Whether the buffer wrapped around while the tracer had no writer
+        self.wrapped = False
+        # Number of records overwritten before the last wrap around
+        self.dropped = 0
+        self.pending = 0
+        # Names and begin times of the open scopes of the thread
+        self.name_ids: List[int] = []
+        self.begins: List[int] = []
+
+    def set_buffer(self, buffer: numpy.ndarray) -> None:
+        self.buffer = buffer
+        self.view = memoryview(buffer.view(numpy.uint8))
+        self.pos = 0
+
+    def __enter__(self) -> None:
+        self.name_ids.append(self.pending)
+        self.begins.append(time.perf_counter_ns())
+
+    def __exit__(self, *args: Any) -> None:
+        end = time.perf_counter_ns()
+        begin = self.begins.pop()
+        name_id = self.name_ids.pop()
+        tracer = self.tracer
+        if not tracer._enable or tracer._event_count >= tracer._max_event_count:
+            return
+        # Not atomic, like ChromeTracer, so threads may exceed the limit
+        tracer._event_count += 1
+        pos = self.pos
+        if pos == tracer._buffer_size:
+            pos = tracer._rotate(self)
+        _EVENT_STRUCT.pack_into(
+            self.view,
+            pos * _EVENT_STRUCT.size,
+            name_id,
+            _tracing._main_pid,
+            self.tid,
+            begin,
+            end - begin,
+        )
+        self.pos = pos + 1
+
+    def older_records(self, pos: int) -> numpy.ndarray:
+        # Called with the lock held when the buffer wrapped around, with
+        # ``pos`` read before. The owner thread may overwrite the oldest
+        # records while they are copied, so the ones it may have reached
+        # are skipped.
+        records = self.buffer[max(pos, self.start) :].copy()
+        if self.thread is not threading.current_thread():
+            records = records[self.pos + 1 - pos :]
+        return records
+
+
+class _NullScope:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+_null_scope = _NullScope()
+
+
+class RingBufferTracer(_tracing.Tracer):
+    """Low overhead tracer that records events into a ring buffer.
+
+    Events are packed into preallocated numpy arrays of ``EVENT_DTYPE``
+    records and event names are interned, so recording an event does not
+    allocate any Python object. Each thread records its events into its
+    own buffers without taking any lock. Once the tracer is attached to a
+    writer (by :meth:`initialize_writer` or :meth:`flush`), full buffers
+    are handed to a background thread that appends them to a compact
+    binary file; until then, the oldest events of each thread are
+    overwritten when its buffer is full.
+
+    The binary file can be converted to the Chrome trace format with
+    :func:`pytorch_pfn_extras.profiler.load_binary_trace_as_json`, and the
+    events still held in memory with :meth:`get_events`.
+
+    Events recorded in forked processes (e.g., DataLoader workers) are
+    ignored. The context manager returned by :meth:`add_event` must be
+    entered right away, as in ``with tracer.add_event(name):``.
+
+    Once the tracer is attached to a writer, :meth:`state_dict` writes the
+    pending events and records a cursor to the binary file (file name,
+    number of bytes and names written). :meth:`load_state_dict` resumes
+    from that cursor when the writer is initialized again: the events
+    written after the state was saved are truncated and the new ones are
+    appended.
+
+    Args:
+        buffer_size (int): Number of events held by each buffer.
+        num_buffers (int): Number of buffers of each thread. Recording
+            blocks when all the buffers of the thread are waiting to be
+            written.
+        max_event_count (int): Limit the amount of events that can be traced,
+            optional.
+        enable (bool): Sets the tracer in active state. Optional,
+            defaults to ``True``.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = 65536,
+        num_buffers: int = 2,
+        max_event_count: Optional[int] = None,
+        enable: bool = True,
+    ) -> None:
+        if buffer_size <= 0:
+            raise ValueError("buffer_size must be positive")
+        if num_buffers <= 0:
+            raise ValueError("num_buffers must be positive")
+        self._enable = enable
+        self._max_event_count = max_event_count or float("inf")
+        self._event_count = 0
+        self._buffer_size = buffer_size
+        self._num_buffers = num_buffers
+        self._lock = threading.Lock()
+        self._names: Dict[str, int] = {}
+        self._name_list: List[str] = []
+        # Names that have not been written to the file yet start here
+        self._names_written = 0
+        self._local = threading.local()
+        self._thread_buffers: List[_ThreadBuffer] = []
+        self._filename: Optional[str] = None
+        self._writer: Optional[Writer] = None
+        # Number of bytes written to the file by the worker thread
+        self._offset = 0
+        self._cursor: Optional[Dict[str, Any]] = None
+        self._queue: Optional["queue.Queue[_Task]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._file: Optional[IO[Any]] = None
+
+    @property
+    def dropped_count(self) -> int:
+        """Number of events overwritten while the tracer had no writer."""
+        count = 0
+        for state in self._thread_buffers:
+            count += state.dropped
+            if state.wrapped:
+                count += max(0, state.pos - state.start)
+        return count
+
+    def _intern(self, name: str) -> int:
+        name_id = self._names.get(name)
+        if name_id is None:
+            with self._lock:
+                name_id = self._names.get(name)
+                if name_id is None:
+                    name_id = len(self._name_list)
+                    self._name_list.append(name)
+                    self._names[name] = name_id
+        return name_id
+
+    def _thread_buffer(self) -> _ThreadBuffer:
+        state = _ThreadBuffer(self)
+        with self._lock:
+            self._thread_buffers.append(state)
+        self._local.state = state
+        return state
+
+    def add_event(self, name: str) -> Any:  # type: ignore[override]
+        if (
+            not self._enable
+            or not _tracing._enabled
+            or not _tracing._thread_local.enable
+            or os.getpid() != _tracing._main_pid
+        ):
+            return _null_scope
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._thread_buffer()
+        state.pending = self._intern(name)
+        return state
+
+    def _rotate(self, state: _ThreadBuffer) -> int:
+        # Called by the owner thread when its buffer is full
+        with state.lock:
+            if self._queue is None:
+                if state.wrapped:
+                    state.dropped += self._buffer_size - state.start
+                    state.start = 0
+                state.wrapped = True
+                state.pos = 0
+                return 0
+            self._submit(state.buffer[state.start : state.pos], state)
+            if state.n_buffers < self._num_buffers:
+                state.n_buffers += 1
+                buffer = numpy.zeros(self._buffer_size, dtype=EVENT_DTYPE)
+            else:
+                buffer = state.free.get()
+            state.set_buffer(buffer)
+            state.start = 0
+            return 0
+
+    def _submit(
+        self, records: numpy.ndarray, state: Optional[_ThreadBuffer]
+    ) -> None:
+        # The buffer of the records is given back to ``state`` once written
+        assert self._queue is not None
+        with self._lock:
+            names = self._name_list[self._names_written :]
+            self._names_written = len(self._name_list)
+            self._queue.put((names, records, state))
+
+    def _worker(self, f: IO[Any]) -> None:
+        assert self._queue is not None
+        while True:
+            task = self._queue.get()
+            if task is None:
+                self._queue.task_done()
+                break
+            names, records, state = task
+            if names:
+                payload = json.dumps(names).encode("utf-8")
+                f.write(_BLOCK_HEADER.pack(_NAME_BLOCK, len(payload)))
+                f.write(payload)
+                self._offset += _BLOCK_HEADER.size + len(payload)
+            if len(records) > 0:
+                data = memoryview(records.view(numpy.uint8))
+                f.write(_BLOCK_HEADER.pack(_EVENT_BLOCK, len(data)))
+                f.write(data)
+                self._offset += _BLOCK_HEADER.size + len(data)
+            f.flush()
+            if state is not None:
+                state.free.put(records.base)
+            self._queue.task_done()
+
+    def initialize_writer(self, filename: str, writer: Writer) -> None:
+        if self._queue is not None:
+            return
+        path = os.path.join(writer.out_dir, filename)
+        writer.fs.makedirs(os.path.dirname(path), exist_ok=True)
+        cursor = self._cursor
+        self._cursor = None
+        if cursor is not None and cursor["filename"] == filename:
+            size = _util.get_file_size(writer, filename)
+            if size is None or size < cursor["offset"]:
+                cursor = None
+        else:
+            cursor = None
+        if cursor is not None:
+            # Drop the events written after the state was saved
+            _util.truncate_file(writer, filename, cursor["offset"])
+            f = writer.fs.open(path, "ab")
+            self._offset = cursor["offset"]
+            self._names_written = cursor["names_written"]
+        else:
+            f = writer.fs.open(path, "wb")
+            f.write(_MAGIC)
+            self._offset = len(_MAGIC)
+            self._names_written = 0
+        self._filename = filename
+        self._writer = writer
+        self._file = f
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._worker, args=(f,), daemon=True
+        )
+        self._thread.start()
+        for state in self._thread_buffers[:]:
+            with state.lock:
+                if state.wrapped:
+                    # Keep the events in the order they were recorded
+                    self._submit(state.older_records(state.pos), None)
+                    state.dropped += max(0, state.pos - state.start)
+                    state.start = 0
+                state.wrapped = False
+
+    def _drain(self) -> None:
+        # Submits the records that are not written yet, and forgets the
+        # buffers of the threads that ended
+        assert self._queue is not None
+        for state in self._thread_buffers[:]:
+            with state.lock:
+                pos = state.pos
+                self._submit(state.buffer[state.start : pos].copy(), None)
+                state.start = pos
+            if not state.thread.is_alive():
+                with self._lock:
+                    self._thread_buffers.remove(state)
+        # Names interned after the last records are written too
+        self._submit(numpy.zeros(0, dtype=EVENT_DTYPE), None)
+
+    def flush(self, filename: str, writer: Writer) -> None:
+        """Writes the events recorded so far to the binary file.
+
+        The first call attaches the tracer to ``writer`` if
+        :meth:`initialize_writer` has not been called.
+        """
+        self.initialize_writer(filename, writer)
+        assert self._queue is not None
+        self._drain()
+        self._queue.join()
+
+    def get_events(self) -> List[Dict[str, Any]]:
+        """Returns the events held in memory in Chrome trace format."""
+        parts = [numpy.zeros(0, dtype=EVENT_DTYPE)]
+        for state in self._thread_buffers[:]:
+            with state.lock:
+                pos = state.pos
+                if state.wrapped:
+                    parts.append(state.older_records(pos))
+                    parts.append(state.buffer[:pos].copy())
+                else:
+                    parts.append(state.buffer[state.start : pos].copy())
+        with self._lock:
+            names = self._name_list[:]
+        return _to_chrome_events(numpy.concatenate(parts), names)
+
+    def enable(self, enable_flag: bool) -> None:
+        self._enable = enable_flag
+
+    def state_dict(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        state["_enable"] = self._enable
+        state["_max_event_count"] = self._max_event_count
+        state["_event_count"] = self._event_count
+        cursor = self._make_cursor()
+        if cursor is not None:
+            state["_cursor"] = cursor
+            state["_names"] = json.dumps(
+                self._name_list[: cursor["names_written"]]
+            )
+        return state
+
+    def _make_cursor(self) -> Optional[Dict[str, Any]]:
+        if self._cursor is not None:
+            # Not resumed yet, keep the loaded cursor as is
+            return self._cursor
+        if self._queue is None or self._filename is None:
+            return None
+        # The cursor must cover the events recorded so far
+        self._drain()
+        self._queue.join()
+        return {
+            "filename": self._filename,
+            "offset": self._offset,
+            "names_written": self._names_written,
+        }
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        self._enable = to_load["_enable"]
+        self._max_event_count = to_load["_max_event_count"]
+        self._event_count = to_load["_event_count"]
+        self._cursor = to_load.get("_cursor", None)
+        if self._cursor is not None:
+            # The names keep the ids used by the records in the file, so
+            # the events held in memory are dropped as they may use others
+            self._drop_events()
+            name_list = json.loads(to_load["_names"])
+            with self._lock:
+                self._name_list = name_list
+                self._names = {name: i for i, name in enumerate(name_list)}
+                self._names_written = 0
+
+    def _drop_events(self) -> None:
+        for state in self._thread_buffers[:]:
+            with state.lock:
+                state.start = state.pos
+                state.wrapped = False
+                state.dropped = 0
+
+    def clear(self) -> None:
+        self._drop_events()
+        self._event_count = 0
+        self._cursor = None
+
+    def finalize(self) -> None:
+        if self._queue is None:
+            return
+        assert self._thread is not None
+        assert self._file is not None
+        self._drain()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._queue = None
+        self._thread = None
+        self._file = None
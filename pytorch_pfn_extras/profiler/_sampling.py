@@ -0,0 +1,90 @@
+import time
+from typing import Optional
+
+# Whether the scopes of the current iteration are recorded. This is the only
+# state checked by ``record`` so that unsampled scopes are almost free.
+_sampled: bool = True
+
+_every: Optional[int] = None
+_window: Optional[float] = None
+_interval: Optional[float] = None
+_window_end: float = 0.0
+_next_window: float = 0.0
+
+
+def enable_sampling(
+    every: Optional[int] = None,
+    *,
+    window: Optional[float] = None,
+    interval: Optional[float] = None,
+) -> None:
+    """Records the profiled scopes only on sampled iterations.
+
+    Either ``every`` or both ``window`` and ``interval`` must be given. With
+    ``every``, only the iterations whose number is a multiple of ``every``
+    are sampled, so that all the scopes of a sampled iteration (including
+    nested ones) are recorded together. With ``window`` and ``interval``,
+    all the iterations starting in the first ``window`` seconds of every
+    ``interval`` seconds are sampled.
+
+    The sampling decision is taken at the start of each iteration by
+    :func:`sampling_step`, which is called by
+    :class:`pytorch_pfn_extras.training.ExtensionsManager` and
+    :class:`pytorch_pfn_extras.training.IgniteExtensionsManager`; scopes
+    outside of sampled iterations are not recorded by
+    :func:`pytorch_pfn_extras.profiler.record`.
+
+    Args:
+        every (int): Samples one iteration out of ``every`` iterations.
+        window (float): Length in seconds of the sampling windows.
+        interval (float): Interval in seconds between the start of two
+            sampling windows.
+    """
+    global _every, _window, _interval, _window_end, _next_window
+    if every is not None:
+        if window is not None or interval is not None:
+            raise ValueError("every cannot be used with window and interval")
+        if every <= 0:
+            raise ValueError("every must be positive")
+    elif window is None or interval is None:
+        raise ValueError("either every or window and interval must be given")
+    elif not 0 < window <= interval:
+        raise ValueError("window must be positive and at most interval")
+    _every = every
+    _window = window
+    _interval = interval
+    _window_end = 0.0
+    _next_window = 0.0
+    sampling_step(0)
+
+
+def disable_sampling() -> None:
+    """Records the profiled scopes on all iterations."""
+    global _sampled, _every, _window, _interval
+    _every = None
+    _window = None
+    _interval = None
+    _sampled = True
+
+
+def sampling_step(iteration: int) -> None:
+    """Decides whether the scopes of the next iteration are recorded.
+
+    Args:
+        iteration (int): Number of the next iteration.
+    """
+    global _sampled, _window_end, _next_window
+    if _every is not None:
+        _sampled = iteration % _every == 0
+    elif _window is not None:
+        assert _interval is not None
+        now = time.monotonic()
+        if now >= _next_window:
+            _window_end = now + _window
+            _next_window = now + _interval
+        _sampled = now < _window_end
+
+
+def is_sampled() -> bool:
+    """Returns whether the scopes of the current iteration are recorded."""
+    return _sampled
@@ -0,0 +1,117 @@
+import math
+from typing import Any, Dict
+
+
+class QuantileSketch:
+    """Mergeable streaming quantile sketch with a fixed memory bound.
+
+    Values are counted in logarithmically sized bins, as in DDSketch, so
+    that any quantile is estimated within ``relative_accuracy`` of a value
+    that was actually added. Sketches built with the same parameters can be
+    merged (e.g., sketches of several threads or processes) and the error
+    bound still holds for the merged sketch.
+
+    When more than ``max_bins`` bins are used, the lowest bins are collapsed
+    into one, so that only the accuracy of the lowest quantiles degrades.
+
+    Args:
+        relative_accuracy (float): Relative error bound of the quantiles.
+        max_bins (int): Maximum number of bins held by the sketch.
+    """
+
+    # Values below this one (including zero and negative values) are
+    # counted separately
+    _MIN_VALUE = 1e-9
+
+    def __init__(
+        self, relative_accuracy: float = 0.01, max_bins: int = 2048
+    ) -> None:
+        if max_bins <= 0:
+            raise ValueError("max_bins must be positive")
+        self._set_relative_accuracy(relative_accuracy)
+        self._max_bins = max_bins
+        self._bins: Dict[int, int] = {}
+        self._zero_count = 0
+
+    def _set_relative_accuracy(self, relative_accuracy: float) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self._relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+    @property
+    def count(self) -> int:
+        """Number of values added to the sketch."""
+        return self._zero_count + sum(self._bins.values())
+
+    def add(self, value: float) -> None:
+        """Adds a value to the sketch."""
+        if value < self._MIN_VALUE:
+            self._zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        bins = self._bins
+        bins[key] = bins.get(key, 0) + 1
+        if len(bins) > self._max_bins:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        keys = sorted(self._bins)
+        excess = len(keys) - self._max_bins
+        lowest = keys[excess]
+        for key in keys[:excess]:
+            self._bins[lowest] += self._bins.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Adds the values counted by ``other`` to this sketch."""
+        if other._relative_accuracy != self._relative_accuracy:
+            raise ValueError(
+                "Cannot merge sketches with different relative accuracies"
+            )
+        # Copying the bins first allows to merge a sketch that is still
+        # being updated by another thread
+        bins = other._bins.copy()
+        for key, n in bins.items():
+            self._bins[key] = self._bins.get(key, 0) + n
+        self._zero_count += other._zero_count
+        if len(self._bins) > self._max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> float:
+        """Estimates the ``q``-quantile of the values added so far.
+
+        Args:
+            q (float): Quantile in ``[0, 1]``.
+
+        Returns:
+            The estimated quantile, or ``nan`` if the sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be in [0, 1]")
+        count = self.count
+        if count == 0:
+            return math.nan
+        rank = q * (count - 1)
+        total = self._zero_count
+        if rank < total:
+            return 0.0
+        for key in sorted(self._bins):
+            total += self._bins[key]
+            if total > rank:
+                break
+        return 2 * self._gamma**key / (self._gamma + 1)
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self._relative_accuracy,
+            "max_bins": self._max_bins,
+            "bins": sorted(self._bins.items()),
+            "zero_count": self._zero_count,
+        }
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        self._set_relative_accuracy(to_load["relative_accuracy"])
+        self._max_bins = to_load["max_bins"]
+        self._bins = {int(key): int(n) for key, n in to_load["bins"]}
+        self._zero_count = to_load["zero_count"]
@@ -5,11 +5,20 @@ import threading
 import time
 import weakref
 from contextlib import contextmanager
-from typing import Callable, Dict, Generator, Optional, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import torch
 from pytorch_pfn_extras.profiler import _util
-from pytorch_pfn_extras.reporting import DictSummary
+from pytorch_pfn_extras.profiler._sketch import QuantileSketch
+from pytorch_pfn_extras.reporting import DictSummary, Summary
 
 Events = Tuple[torch.cuda.Event, torch.cuda.Event]
 
@@ -130,6 +139,30 @@ class _CUDAWorker:
             return self._events.get()
 
 
+# Count, sum, sum of squares, min, max and quantile sketch of the values
+# reported for a tag
+_Stats = Tuple[int, float, float, float, float, Optional[QuantileSketch]]
+
+
+class _ThreadStats:
+    def __init__(self) -> None:
+        self.thread = threading.current_thread()
+        # Only written by the owner thread: odd while it updates ``values``
+        self.epoch = 0
+        self.values: Dict[str, _Stats] = {}
+
+    def swap(self) -> Dict[str, _Stats]:
+        # Called by the thread merging the statistics. New updates go to
+        # the new dict, so only an update in flight may still use the old
+        # one and it is waited for
+        values, self.values = self.values, {}
+        epoch = self.epoch
+        if epoch % 2:
+            while self.epoch == epoch and self.thread.is_alive():
+                time.sleep(0)
+        return values
+
+
 class _Finalizer:
     def __init__(self, ts: "TimeSummary") -> None:
         self._ts = weakref.ref(ts)
@@ -146,28 +179,58 @@ class TimeSummary:
     `TimeSummary` computes the average and standard deviation of exeuction
     times in both cpu and gpu devices.
 
+    By default, each thread accumulates the times it reports into its own
+    statistics without taking any lock, and the statistics of all the
+    threads are handed over and merged when :meth:`summary` is called.
+    Times reported from other processes are sent through a queue.
+
+    The quantiles of the times of each tag are estimated with a
+    :class:`pytorch_pfn_extras.profiler.QuantileSketch`, and are added to
+    the additional statistics as ``<tag>.p50``, ``<tag>.p90``, etc.
+
+    Signed values that are not times, such as changes of memory usage, are
+    accumulated apart with :meth:`add_counter`.
+
     Args:
         max_queue_size (int): Length limit of the internal queues that keep
             reported time info until they are summarized.
         auto_init (bool): Whether to automatically call `initialize()`
             when the instance is created.
+        thread_local (bool): Whether to accumulate the times in per-thread
+            statistics. If ``False``, every reported time is sent to a
+            worker thread that updates the shared summary.
+        quantiles (sequence of floats): Quantiles to estimate, in
+            ``[0, 1]``. If empty, quantiles are not estimated.
+        relative_accuracy (float): Relative error bound of the estimated
+            quantiles.
     """
 
     def __init__(
-        self, *, max_queue_size: int = 1000, auto_init: bool = True
+        self,
+        *,
+        max_queue_size: int = 1000,
+        auto_init: bool = True,
+        thread_local: bool = True,
+        quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+        relative_accuracy: float = 0.01,
     ) -> None:
         self._summary_lock = threading.Lock()
         self._summary = DictSummary()
         self._additional_stats: Dict[str, float] = {}
-
-        self._cpu_worker = _util.QueueWorker(
-            self._add_from_worker, max_queue_size
-        )
+        self._quantiles = list(quantiles)
+        self._relative_accuracy = relative_accuracy
+        self._sketches: Dict[str, QuantileSketch] = {}
+        # Sum, min and max of the values given to ``add_counter``
+        self._counters: Dict[str, Tuple[float, float, float]] = {}
+        self._thread_local = thread_local
+        self._local = threading.local()
+        self._thread_stats: List[_ThreadStats] = []
+        self._thread_stats_lock = threading.Lock()
+
+        self._cpu_worker = _util.QueueWorker(self.add, max_queue_size)
         self._cuda_worker: Optional[_CUDAWorker] = None
         if torch.cuda.is_available():
-            self._cuda_worker = _CUDAWorker(
-                self._add_from_worker, max_queue_size
-            )
+            self._cuda_worker = _CUDAWorker(self.add, max_queue_size)
 
         self._initialized = False
         self._master_pid = os.getpid()
@@ -221,9 +284,118 @@ class TimeSummary:
             self._additional_stats[f"{name}.min"] = min(value, min_value)
             max_value = self._additional_stats.get(f"{name}.max", value)
             self._additional_stats[f"{name}.max"] = max(value, max_value)
+            if self._quantiles:
+                self._get_sketch(name).add(value)
+
+    def _new_sketch(self) -> QuantileSketch:
+        return QuantileSketch(self._relative_accuracy)
+
+    def _get_sketch(self, name: str) -> QuantileSketch:
+        sketch = self._sketches.get(name)
+        if sketch is None:
+            sketch = self._sketches[name] = self._new_sketch()
+        return sketch
+
+    def _accumulate(self, name: str, value: float) -> None:
+        try:
+            stats = self._local.stats
+        except AttributeError:
+            stats = _ThreadStats()
+            with self._thread_stats_lock:
+                self._thread_stats.append(stats)
+            self._local.stats = stats
+        stats.epoch += 1
+        values = stats.values
+        s = values.get(name)
+        if s is None:
+            sketch = self._new_sketch() if self._quantiles else None
+            s = (0, 0.0, 0.0, value, value, sketch)
+        n, x, x2, min_value, max_value, sketch = s
+        values[name] = (
+            n + 1,
+            x + value,
+            x2 + value * value,
+            value if value < min_value else min_value,
+            value if value > max_value else max_value,
+            sketch,
+        )
+        if sketch is not None:
+            sketch.add(value)
+        stats.epoch += 1
+
+    def _merge_thread_stats(self) -> None:
+        # Called with the summary lock held
+        with self._thread_stats_lock:
+            thread_stats = list(self._thread_stats)
+        for stats in thread_stats:
+            # The owner thread does not touch the swapped out values and
+            # sketches anymore
+            values = stats.swap()
+            for name, s in values.items():
+                n, x, x2, min_value, max_value, sketch = s
+                part = Summary()
+                part.load_state_dict({"_x": x, "_x2": x2, "_n": n})
+                self._summary._summaries[name] += part
+                min_value = min(
+                    min_value,
+                    self._additional_stats.get(f"{name}.min", min_value),
+                )
+                max_value = max(
+                    max_value,
+                    self._additional_stats.get(f"{name}.max", max_value),
+                )
+                self._additional_stats[f"{name}.min"] = min_value
+                self._additional_stats[f"{name}.max"] = max_value
+                if sketch is not None:
+                    self._get_sketch(name).merge(sketch)
+        with self._thread_stats_lock:
+            self._thread_stats = [
+                stats
+                for stats in self._thread_stats
+                if stats.values or stats.thread.is_alive()
+            ]
+
+    def _update_quantiles(self) -> None:
+        # Called with the summary lock held
+        for name, sketch in self._sketches.items():
+            for q in self._quantiles:
+                value = sketch.quantile(q)
+                self._additional_stats[f"{name}.p{q * 100:g}"] = value
 
     def add(self, name: str, value: float) -> None:
-        self._add_from_worker(name, value)
+        if self._thread_local:
+            self._accumulate(name, value)
+        else:
+            self._add_from_worker(name, value)
+
+    def add_counter(self, name: str, value: float) -> None:
+        """Accumulates a signed value that is not a time.
+
+        Unlike times, counters are not summarized by their mean, deviation
+        and quantiles: ``<name>.sum``, ``<name>.min`` and ``<name>.max``
+        are added to the additional statistics.
+
+        Args:
+            name (str): Name of the counter.
+            value (float): Value to accumulate, which may be negative.
+        """
+        with self._summary_lock:
+            s = self._counters.get(name)
+            if s is None:
+                s = (0.0, value, value)
+            total, min_value, max_value = s
+            self._counters[name] = (
+                total + value,
+                value if value < min_value else min_value,
+                value if value > max_value else max_value,
+            )
+
+    def _update_counters(self) -> None:
+        # Called with the summary lock held
+        for name, (total, min_value, max_value) in self._counters.items():
+            self._additional_stats[f"{name}.sum"] = total
+            self._additional_stats[f"{name}.min"] = min_value
+            self._additional_stats[f"{name}.max"] = max_value
 
     @contextmanager
     def summary(
@@ -233,11 +405,16 @@ class TimeSummary:
         self.initialize()
         try:
             with self._summary_lock:
+                self._merge_thread_stats()
+                self._update_quantiles()
+                self._update_counters()
                 yield self._summary, self._additional_stats
         finally:
             if clear:
                 self._summary = DictSummary()
                 self._additional_stats = {}
+                self._sketches = {}
+                self._counters = {}
 
     def complete_report(
         self,
@@ -247,8 +424,11 @@ class TimeSummary:
         begin: float,
     ) -> None:
         end = time.time()
-        assert self._cpu_worker._queue is not None
-        self._cpu_worker._queue.put((tag, end - begin))
+        if self._thread_local and os.getpid() == self._master_pid:
+            self._accumulate(tag, end - begin)
+        else:
+            assert self._cpu_worker._queue is not None
+            self._cpu_worker._queue.put((tag, end - begin))
         if use_cuda:
             assert self._cuda_worker is not None
             assert self._cuda_worker._queue is not None
@@ -1,15 +1,35 @@
 import contextlib
 import json
 import os
+import queue
 import threading
 import time
-from typing import Any, Dict, Generator, List, Optional, Type, Union, cast
+import warnings
+import weakref
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
 import torch.cuda
 import torch.utils.data
 from pytorch_pfn_extras.profiler import _util
 from pytorch_pfn_extras.writing import Writer
 
+if TYPE_CHECKING:
+    from pytorch_pfn_extras.profiler._event_channel import (
+        SharedMemoryEventChannel,
+    )
+
 
 class Tracer:
     def initialize_writer(self, filename: str, writer: Writer) -> None:
@@ -22,6 +42,13 @@ class Tracer:
     def add_remote_event(self, name: str, value: Any) -> None:
         raise NotImplementedError("Tracers must implement add_remote_event")
 
+    def add_counter(self, name: str, values: Dict[str, float]) -> None:
+        """Records the current values of a set of counters.
+
+        Tracers that do not support counters ignore them.
+        """
+        pass
+
     def clear(self) -> None:
         raise NotImplementedError("Tracers must implement clear")
 
@@ -81,6 +108,112 @@ class ChromeTracingSaveFunc:
         file_o.write(log.encode("ascii"))
 
 
+class DeviceEventBackend:
+    """Interface to time traced scopes with device events.
+
+    :class:`ChromeTracer` records an event when a traced scope begins and
+    ends, and resolves the elapsed time between them in a background
+    thread, so that the host never waits for the device.
+    """
+
+    def record(self) -> Any:
+        """Records an event on the device and returns it."""
+        raise NotImplementedError
+
+    def elapsed_ns(self, begin: Any, end: Any) -> int:
+        """Waits for ``end`` and returns the time elapsed from ``begin``."""
+        raise NotImplementedError
+
+    def release(self, event: Any) -> None:
+        """Releases an event that is no longer used."""
+        pass
+
+
+class CUDAEventBackend(DeviceEventBackend):
+    """Device event backend using ``torch.cuda.Event``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._events: List[torch.cuda.Event] = []
+
+    def record(self) -> torch.cuda.Event:
+        with self._lock:
+            if self._events:
+                event = self._events.pop()
+            else:
+                event = torch.cuda.Event(  # type: ignore[no-untyped-call]
+                    enable_timing=True
+                )
+        event.record()  # type: ignore[no-untyped-call]
+        return event
+
+    def elapsed_ns(self, begin: torch.cuda.Event, end: torch.cuda.Event) -> int:
+        end.synchronize()  # type: ignore[no-untyped-call]
+        t_ms = begin.elapsed_time(end)  # type: ignore[no-untyped-call]
+        return int(t_ms * 1e6)
+
+    def release(self, event: torch.cuda.Event) -> None:
+        with self._lock:
+            self._events.append(event)
+
+
+_Event = Dict[str, Any]
+_PendingEvent = Optional[Tuple[_Event, Any, Any]]
+
+
+class _DeviceEventResolver:
+    def __init__(
+        self,
+        backend: DeviceEventBackend,
+        add: Callable[[str, _Event], None],
+    ) -> None:
+        self._backend = backend
+        self._add = add
+        self._queue: "queue.Queue[_PendingEvent]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(self, event: _Event, begin: Any, end: Any) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+        self._queue.put((event, begin, end))
+
+    def synchronize(self) -> None:
+        self._queue.join()
+
+    def finalize(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _worker(self) -> None:
+        while True:
+            v = self._queue.get()
+            if v is None:
+                self._queue.task_done()
+                break
+            event, begin, end = v
+            try:
+                duration_ns = self._backend.elapsed_ns(begin, end)
+            except Exception as e:
+                # The event is dropped, and its device events are not
+                # reused as they may be invalid
+                warnings.warn(
+                    "Failed to time the event {}: {}".format(event["name"], e)
+                )
+                self._queue.task_done()
+                continue
+            try:
+                event["dur"] = duration_ns / 1000  # nano sec -> micro sec
+                self._add(event["name"], event)
+            finally:
+                self._backend.release(begin)
+                self._backend.release(end)
+                self._queue.task_done()
+
+
 def load_chrome_trace_as_json(filename: str) -> List[Dict[str, Any]]:
     with open(filename) as f:
         s = f.read()
@@ -92,11 +225,30 @@ def load_chrome_trace_as_json(filename: str) -> List[Dict[str, Any]]:
 class ChromeTracer(Tracer):
     """Tracer object that outputs a timeline in Chrome format.
 
+    Once the tracer has been flushed through a writer, its
+    :meth:`state_dict` only records a cursor to the trace file (file name,
+    size and number of events written) together with the events that are
+    not flushed yet, instead of embedding the whole event list. The size
+    is the number of bytes written by the tracer, so that the cursor does
+    not depend on when an asynchronous writer completes the writes.
+    :meth:`load_state_dict` resumes from that cursor when the writer is
+    initialized again.
+
+    When CUDA is available, the duration of each event is measured with
+    CUDA events recorded at the beginning and at the end of the traced
+    scope. The elapsed time is resolved in a background thread instead of
+    synchronizing the device, and the host-side duration is kept in the
+    ``host_dur`` argument of the event. On CPU-only machines, host
+    timestamps are used.
+
     Args:
         max_event_count (int): Limit the amount of events that can be traced,
             optional.
         enable (bool): Sets the tracer in active state. Optional,
             defaults to ``True``.
+        event_backend (DeviceEventBackend): Backend used to time the events
+            on the device. Optional, defaults to :class:`CUDAEventBackend`
+            if CUDA is available and to host timestamps otherwise.
     """
 
     def __init__(
@@ -104,6 +256,7 @@ class ChromeTracer(Tracer):
         max_event_count: Optional[int] = None,
         enable: bool = True,
         append: bool = True,
+        event_backend: Optional[DeviceEventBackend] = None,
     ) -> None:
         self._enable = enable
         self._event_list: List[Dict[str, Union[str, int, float]]] = []
@@ -111,35 +264,79 @@ class ChromeTracer(Tracer):
         self._event_count = 0
         # Detect if i am a forked process, in such case I send the event to
         # The parent process
-        self._is_cuda_available = torch.cuda.is_available()
+        if event_backend is None and torch.cuda.is_available():
+            event_backend = CUDAEventBackend()
+        self._event_backend = event_backend
+        self._resolver: Optional[_DeviceEventResolver] = None
+        if event_backend is not None:
+            self._resolver = _DeviceEventResolver(
+                event_backend, self.add_remote_event
+            )
         self._tracer_queue: _util.QueueWorker = _util.QueueWorker(
             self.add_remote_event, 1000
         )
         self._tracer_queue.initialize()
         self._append = append
         self._savefun = ChromeTracingSaveFunc()
+        self._filename: Optional[str] = None
+        self._writer: Optional[Writer] = None
+        # Number of events and bytes already written to the trace file
+        self._flushed_count = 0
+        self._offset = 0
+        self._cursor: Optional[Dict[str, Any]] = None
+        # Channels are forgotten once their dataset is garbage collected
+        self._event_channels: "weakref.WeakSet[SharedMemoryEventChannel]" = (
+            weakref.WeakSet()
+        )
+
+    def register_event_channel(
+        self, channel: "SharedMemoryEventChannel"
+    ) -> None:
+        """Collects the events sent through ``channel`` on every flush."""
+        self._event_channels.add(channel)
+
+    def unregister_event_channel(
+        self, channel: "SharedMemoryEventChannel"
+    ) -> None:
+        """Stops collecting the events sent through ``channel``.
+
+        The events sent so far are added to the tracer.
+        """
+        if channel not in self._event_channels:
+            return
+        self._event_channels.discard(channel)
+        if os.getpid() == _main_pid:
+            self._event_list.extend(channel.drain())
+
+    def _is_tracing(self) -> bool:
+        return (
+            self._enable
+            and _enabled
+            and bool(_thread_local.enable)
+        )
+
+    def _count_event(self) -> bool:
+        # Whether an event completed now is within the limit of events
+        if self._enable and self._event_count < self._max_event_count:
+            self._event_count += 1
+            return True
+        return False
 
     @contextlib.contextmanager
     def add_event(self, name: str) -> Generator[None, None, None]:
-        if (
-            not self._enable
-            or not _enabled
-            or not getattr(_thread_local, "enable", True)
-        ):
+        if not self._is_tracing():
             yield
             return
 
         pid = os.getpid()
         is_forked = pid != _main_pid
-        is_cuda_available = self._is_cuda_available and not is_forked
+        backend = None if is_forked else self._event_backend
         begin_ns = time.perf_counter_ns()
+        begin_event = None if backend is None else backend.record()
         try:
             yield
         finally:
-            if self._enable and self._event_count < self._max_event_count:
-                if is_cuda_available:
-                    torch.cuda.synchronize()  # Wait for process to complete
-                self._event_count += 1
+            if self._count_event():
                 duration_ns = time.perf_counter_ns() - begin_ns
                 tid = threading.get_native_id()
                 # Append is thread safe so this should be fine to execute
@@ -156,44 +353,122 @@ class ChromeTracer(Tracer):
                 )
                 if is_forked:
                     self._tracer_queue.put(name, event)
+                elif backend is not None:
+                    assert self._resolver is not None
+                    event["args"] = {"host_dur": event["dur"]}
+                    # The duration is replaced with the one measured on the
+                    # device once the end event completes
+                    self._resolver.put(event, begin_event, backend.record())
                 else:
                     self._event_list.append(
                         cast(Dict[str, Union[str, int, float]], event)
                     )
+            elif backend is not None:
+                backend.release(begin_event)
 
     def add_remote_event(
         self, name: str, event: Dict[str, Union[str, int, float]]
     ) -> None:
         self._event_list.append(event)
 
+    def add_counter(self, name: str, values: Dict[str, float]) -> None:
+        if not self._is_tracing():
+            return
+        pid = os.getpid()
+        event = dict(
+            name=name,
+            ph="C",
+            ts=time.perf_counter_ns() / 1000,  # nano sec -> micro sec
+            pid=pid,
+            args=values,
+        )
+        if pid != _main_pid:
+            self._tracer_queue.put(name, event)
+        else:
+            self._event_list.append(
+                cast(Dict[str, Union[str, int, float]], event)
+            )
+
+    def _synchronize(self) -> None:
+        self._tracer_queue.synchronize()
+        if self._resolver is not None:
+            self._resolver.synchronize()
+        if os.getpid() == _main_pid:
+            for channel in self._event_channels:
+                self._event_list.extend(channel.drain())
+
     def initialize_writer(self, filename: str, writer: Writer) -> None:
         if not self._enable:
             return
+        if self._restore_from_cursor(filename, writer):
+            return
         if self._append:
+            data = _util.serialize(self._savefun.init, [])
             writer(
                 filename,
                 "",
-                {},
-                savefun=self._savefun.init,
+                data,
+                savefun=_util.save_bytes,
                 append=False,
             )
+            self._offset = len(data)
+            self._filename = filename
+            self._writer = writer
+
+    def _restore_from_cursor(self, filename: str, writer: Writer) -> bool:
+        cursor = self._cursor
+        if cursor is None:
+            return False
+        self._cursor = None
+        if cursor["filename"] != filename:
+            return False
+        if self._append:
+            if _util.get_file_size(writer, filename) is None:
+                return False
+            # Drop the events written after the state was saved
+            _util.truncate_file(writer, filename, cursor["offset"])
+            self._offset = cursor["offset"]
+        else:
+            data = _util.read_file(writer, filename)
+            if data is None:
+                return False
+            events = json.loads(data)[: cursor["flushed_count"]]
+            self._event_list = events + self._event_list
+        self._flushed_count = cursor["flushed_count"]
+        self._filename = filename
+        self._writer = writer
+        return True
 
     def flush(self, filename: str, writer: Writer) -> None:
         if not self._enable:
             return
-        self._tracer_queue.synchronize()
+        self._restore_from_cursor(filename, writer)
+        self._synchronize()
+        data = _util.serialize(
+            self._savefun, self._event_list, append_mode=self._append
+        )
+        if self._append:
+            if filename != self._filename:
+                self._offset = _util.get_file_size(writer, filename) or 0
+            # Keep track of the file size without querying the writer,
+            # which may write asynchronously
+            self._offset += len(data)
         # TODO(ecastill): try to work on some append mode manipulating the
         # file pointer and with json.dumps?
         writer.save(
             filename,
             "",  # out_dir arg is ignored in the writer, uses the writer attr
-            self._event_list,
-            savefun=self._savefun,
+            data,
+            savefun=_util.save_bytes,
             append=self._append,
-            append_mode=self._append,
         )
+        self._filename = filename
+        self._writer = writer
         if self._append:
+            self._flushed_count += len(self._event_list)
             self._event_list.clear()
+        else:
+            self._flushed_count = len(self._event_list)
 
     def enable(self, enable_flag: bool) -> None:
         self._enable = enable_flag
@@ -201,30 +476,68 @@ class ChromeTracer(Tracer):
     def state_dict(self) -> Dict[str, Any]:
         state: Dict[str, Any] = {}
         state["_enable"] = self._enable
-        state["_event_list"] = json.dumps(self._event_list)
         state["_max_event_count"] = self._max_event_count
         state["_event_count"] = self._event_count
+        self._synchronize()
+        cursor = self._make_cursor()
+        if cursor is None:
+            state["_event_list"] = json.dumps(self._event_list)
+        else:
+            state["_cursor"] = cursor
+            state["_event_list"] = json.dumps(
+                self._event_list[self._pending_start() :]
+            )
         return state
 
+    def _pending_start(self) -> int:
+        return 0 if self._append else self._flushed_count
+
+    def _make_cursor(self) -> Optional[Dict[str, Any]]:
+        if self._cursor is not None:
+            # Not resumed yet, keep the loaded cursor as is
+            return self._cursor
+        if self._filename is None or self._writer is None:
+            return None
+        return {
+            "filename": self._filename,
+            "offset": self._offset,
+            "flushed_count": self._flushed_count,
+        }
+
     def load_state_dict(self, to_load: Dict[str, Any]) -> None:
         self._enable = to_load["_enable"]
         self._event_list = json.loads(to_load["_event_list"])
         self._max_event_count = to_load["_max_event_count"]
         self._event_count = to_load["_event_count"]
+        self._cursor = to_load.get("_cursor", None)
+        self._flushed_count = 0
 
     def clear(self) -> None:
-        self._tracer_queue.synchronize()
+        self._synchronize()
         self._event_list = []
         self._event_count = 0
+        self._flushed_count = 0
+        self._cursor = None
 
     def finalize(self) -> None:
-        self._tracer_queue.synchronize()
+        self._synchronize()
+        if self._resolver is not None:
+            self._resolver.finalize()
 
 
 _tracer: Optional[Tracer] = None
 _main_pid = os.getpid()
 _enabled: bool = True
-_thread_local = threading.local()
+
+
+class _ThreadLocal(threading.local):
+    # Class-level default so that the per-event lookup in threads that
+    # never called ``enable_thread_trace`` does not raise and catch an
+    # ``AttributeError``
+    enable: bool = True
+
+
+_thread_local = _ThreadLocal()
 
 
 def get_tracer(tracer_cls: Type[Tracer] = ChromeTracer, *params: Any) -> Tracer:
@@ -269,12 +582,27 @@ def enable_thread_trace(enable: bool) -> None:
 class TraceableDataset(torch.utils.data.Dataset):
     """Utility class to trace a Dataset inside the DataLoader worker threads.
 
+    By default, the events of the workers are sent to the main process
+    through a queue. When ``max_workers`` is given, each worker instead
+    writes its events into its own ring buffer in shared memory, which is
+    drained when the tracer is flushed; this is much cheaper for datasets
+    with many small items. Events are dropped, with a warning, if a ring
+    fills up between two flushes. :meth:`close` releases the shared memory
+    and keeps the events that are not flushed yet; otherwise, the shared
+    memory is released and the channel is unregistered from the tracer
+    when the dataset is garbage collected.
+
     Args:
         dataset (torch.utils.data.Dataset): dataset where __getitem__ will
            be traced.
         tag (str): Tag will be used to name the events.
         tracer (Tracer): Tracer object, optional. If ``None`` it defaults to
            `ppe.profile.get_tracer()`.
+        max_workers (int): Number of DataLoader workers that send events
+           through shared memory, optional. Requires a
+           :class:`ChromeTracer`.
+        capacity (int): Number of events held by the ring buffer of each
+           worker.
     """
 
     def __init__(
@@ -282,15 +610,69 @@ class TraceableDataset(torch.utils.data.Dataset):
         dataset: torch.utils.data.Dataset,
         tag: str,
         tracer: Optional[Tracer] = None,
+        *,
+        max_workers: Optional[int] = None,
+        capacity: int = 65536,
     ) -> None:
         super().__init__()
         self._dataset = dataset
         self._tag = tag
         self._tracer = tracer if tracer is not None else get_tracer()
+        self._channel: Optional["SharedMemoryEventChannel"] = None
+        self._name_id = 0
+        if max_workers is not None:
+            from pytorch_pfn_extras.profiler._event_channel import (
+                SharedMemoryEventChannel,
+            )
+
+            if not isinstance(self._tracer, ChromeTracer):
+                raise ValueError("max_workers requires a ChromeTracer")
+            self._channel = SharedMemoryEventChannel(max_workers, capacity)
+            self._name_id = self._channel.register_name(tag)
+            self._tracer.register_event_channel(self._channel)
+
+    def close(self) -> None:
+        """Stops sending the events of the workers through shared memory.
+
+        The events sent by the workers so far are added to the tracer, and
+        the shared memory is released. It must be called once the workers
+        using the dataset have exited.
+        """
+        channel = self._channel
+        if channel is None:
+            return
+        self._channel = None
+        tracer = cast(ChromeTracer, self._tracer)
+        tracer.unregister_event_channel(channel)
+        channel.close()
 
     def __len__(self) -> Any:
         return len(self._dataset)  # type: ignore[arg-type]
 
     def __getitem__(self, idx: Any) -> Any:
+        channel = self._channel
+        if channel is not None and os.getpid() != _main_pid:
+            worker_info = torch.utils.data.get_worker_info()
+            if worker_info is not None and worker_info.id < channel.max_workers:
+                return self._get_item_to_channel(channel, worker_info.id, idx)
         with self._tracer.add_event(self._tag):
             return self._dataset.__getitem__(idx)
+
+    def _get_item_to_channel(
+        self, channel: "SharedMemoryEventChannel", worker_id: int, idx: Any
+    ) -> Any:
+        tracer = cast(ChromeTracer, self._tracer)
+        if not tracer._is_tracing():
+            return self._dataset.__getitem__(idx)
+        begin_ns = time.perf_counter_ns()
+        try:
+            return self._dataset.__getitem__(idx)
+        finally:
+            # The same limits as the events added with add_event apply
+            if tracer._count_event():
+                channel.put(
+                    worker_id,
+                    self._name_id,
+                    begin_ns,
+                    time.perf_counter_ns() - begin_ns,
+                )
@@ -1,4 +1,6 @@
+import io
 import multiprocessing as mp
+import os
 import threading
 from typing import Any, Callable, Optional
 
@@ -65,3 +67,60 @@ class QueueWorker:
             name, value = v
             self._add(name, value)
             self._queue.task_done()
+
+
+def _writer_path(writer: Any, filename: str) -> Optional[str]:
+    # Only writers based on ``writing.Writer`` expose their filesystem
+    if getattr(writer, "fs", None) is None:
+        return None
+    return os.path.join(writer.out_dir, filename)
+
+
+def get_file_size(writer: Any, filename: str) -> Optional[int]:
+    """Returns the size of a file written by ``writer``.
+
+    ``None`` is returned if the file does not exist or the writer does not
+    expose its filesystem.
+    """
+    path = _writer_path(writer, filename)
+    if path is None or not writer.fs.exists(path):
+        return None
+    return int(writer.fs.stat(path).size)
+
+
+def truncate_file(writer: Any, filename: str, size: int) -> None:
+    """Truncates a file written by ``writer`` to ``size`` bytes."""
+    current = get_file_size(writer, filename)
+    if current is None or current <= size:
+        return
+    path = _writer_path(writer, filename)
+    with writer.fs.open(path, "rb+") as f:
+        f.truncate(size)
+
+
+def read_file(writer: Any, filename: str) -> Optional[bytes]:
+    """Reads the contents of a file written by ``writer``."""
+    path = _writer_path(writer, filename)
+    if path is None or not writer.fs.exists(path):
+        return None
+    with writer.fs.open(path, "rb") as f:
+        return f.read()  # type: ignore[no-any-return]
+
+
+def serialize(
+    savefun: Callable[..., None], target: Any, **kwargs: Any
+) -> bytes:
+    """Returns the bytes that ``savefun`` writes for ``target``.
+
+    The bytes are written by passing :func:`save_bytes` as the ``savefun``
+    of the writer, so that their size is known without serializing the
+    target twice.
+    """
+    buf = io.BytesIO()
+    savefun(target, buf, **kwargs)
+    return buf.getvalue()
+
+
+def save_bytes(target: bytes, file_o: Any) -> None:
+    """Writes the bytes returned by :func:`serialize`."""
+    file_o.write(target)
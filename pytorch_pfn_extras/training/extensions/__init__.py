@@ -15,6 +15,9 @@ from pytorch_pfn_extras.training.extensions.accumulate import (  # NOQA
 from pytorch_pfn_extras.training.extensions.best_value import BestValue  # NOQA
 from pytorch_pfn_extras.training.extensions.best_value import MaxValue  # NOQA
 from pytorch_pfn_extras.training.extensions.best_value import MinValue  # NOQA
+from pytorch_pfn_extras.training.extensions.dataloader_tuner import (  # NOQA
+    DataLoaderTuner,
+)
 from pytorch_pfn_extras.training.extensions.evaluator import (  # NOQA
     DistributedEvaluator,
     Evaluator,
@@ -49,6 +52,12 @@ from pytorch_pfn_extras.training.extensions.slack import (  # NOQA
     Slack,
     SlackWebhook,
 )
+from pytorch_pfn_extras.training.extensions.stack_sampler import (  # NOQA
+    StackSampler,
+)
+from pytorch_pfn_extras.training.extensions.throughput_report import (  # NOQA
+    ThroughputReport,
+)
 from pytorch_pfn_extras.training.extensions.timeline_trace import (  # NOQA
     TimelineTrace,
 )
@@ -0,0 +1,332 @@
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import torch
+from pytorch_pfn_extras import reporting
+from pytorch_pfn_extras.profiler._time_summary import (
+    TimeSummary,
+    get_time_summary,
+)
+from pytorch_pfn_extras.training import extension
+from pytorch_pfn_extras.training._manager_protocol import (
+    ExtensionsManagerProtocol,
+)
+
+# (num_workers, prefetch_factor, pin_memory)
+_Config = Tuple[int, int, bool]
+
+
+def _get_config(loader: torch.utils.data.DataLoader) -> _Config:
+    prefetch_factor = loader.prefetch_factor
+    return (
+        loader.num_workers,
+        2 if prefetch_factor is None else prefetch_factor,
+        loader.pin_memory,
+    )
+
+
+def _to_config(value: Any) -> _Config:
+    return (int(value[0]), int(value[1]), bool(value[2]))
+
+
+def _recreate_loader(
+    loader: torch.utils.data.DataLoader, config: _Config
+) -> torch.utils.data.DataLoader:
+    num_workers, prefetch_factor, pin_memory = config
+    kwargs: Dict[str, Any] = dict(
+        num_workers=num_workers,
+        collate_fn=loader.collate_fn,
+        pin_memory=pin_memory,
+        timeout=loader.timeout,
+        worker_init_fn=loader.worker_init_fn,
+        generator=loader.generator,
+    )
+    if num_workers > 0:
+        kwargs["prefetch_factor"] = prefetch_factor
+        kwargs["persistent_workers"] = loader.persistent_workers
+        kwargs["multiprocessing_context"] = loader.multiprocessing_context
+    if hasattr(loader, "pin_memory_device"):
+        kwargs["pin_memory_device"] = loader.pin_memory_device
+    dataset = loader.dataset
+    if isinstance(dataset, torch.utils.data.IterableDataset):
+        return torch.utils.data.DataLoader(
+            dataset,
+            batch_size=loader.batch_size,
+            drop_last=loader.drop_last,
+            **kwargs,
+        )
+    if loader.batch_sampler is not None:
+        # Reusing the sampler keeps the order of the samples and the
+        # ``set_epoch`` calls of distributed samplers
+        return torch.utils.data.DataLoader(
+            dataset, batch_sampler=loader.batch_sampler, **kwargs
+        )
+    return torch.utils.data.DataLoader(
+        dataset, batch_size=None, sampler=loader.sampler, **kwargs
+    )
+
+
+class _TimedIterator:
+    def __init__(self, iterator: Iterator[Any], tuner: "DataLoaderTuner"):
+        self._iterator = iterator
+        self._tuner = tuner
+
+    def __iter__(self) -> "_TimedIterator":
+        return self
+
+    def __next__(self) -> Any:
+        begin = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self._tuner._wait_time += time.perf_counter() - begin
+
+
+class _TunedLoader:
+    def __init__(self, tuner: "DataLoaderTuner") -> None:
+        self._tuner = tuner
+
+    def __iter__(self) -> _TimedIterator:
+        return _TimedIterator(iter(self._tuner.dataloader), self._tuner)
+
+    def __len__(self) -> int:
+        return len(self._tuner.dataloader)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_tuner":
+            raise AttributeError(name)
+        # Gives access to ``sampler``, ``dataset``, etc.
+        return getattr(self._tuner.dataloader, name)
+
+
+class DataLoaderTuner(extension.Extension):
+    """An extension to detect and reduce data loading bottlenecks.
+
+    At every iteration, this extension reports the time spent waiting for
+    data as ``dataloader/wait_time``, and its ratio to the whole iteration
+    time as ``dataloader/input_bound_ratio``.
+
+    The time spent waiting for data is read from the entries of
+    ``wait_tag`` in the time summary of the training thread
+    (:func:`pytorch_pfn_extras.profiler.get_time_summary`), which
+    :class:`pytorch_pfn_extras.training.Trainer` reports by default around
+    each ``next`` call on the loader. When no time is reported for that
+    tag, as in plain :class:`pytorch_pfn_extras.training.ExtensionsManager`
+    loops, the training loop must iterate over :attr:`loader` instead of
+    the original DataLoader, which then measures the waits. If another
+    extension such as
+    :class:`pytorch_pfn_extras.training.extensions.ProfileReport` clears
+    the time summary, the waits reported since the last call of this
+    extension are lost for that iteration.
+
+    When ``tune`` is ``True``, the ``num_workers``, ``prefetch_factor``
+    and ``pin_memory`` options of the DataLoader are searched by hill
+    climbing while the training is input bound. One configuration is
+    measured per epoch: at the end of each epoch, the DataLoader is
+    re-created with a neighbour of the fastest configuration found so far,
+    until no neighbour is faster by ``min_improvement``, or the fastest
+    configuration is no longer input bound. The chosen configuration is
+    kept in the state dict, so that resumed runs start with it.
+
+    Args:
+        loader (torch.utils.data.DataLoader): DataLoader used for training.
+        tune (bool): If ``True``, the DataLoader options are tuned.
+        threshold (float): The training is considered input bound when
+            the ``input_bound_ratio`` over an epoch is above this value.
+        min_improvement (float): Minimum relative decrease of the mean
+            iteration time for a configuration to be chosen.
+        max_num_workers (int): Maximum number of workers, optional.
+            Defaults to the number of CPUs.
+        max_prefetch_factor (int): Maximum number of batches loaded in
+            advance by each worker.
+        wait_tag (str): Tag of the times spent waiting for data in the
+            time summary.
+
+    .. note::
+        The DataLoader can only be re-created while tuning if the
+        training loop iterates over :attr:`loader`, e.g., by passing it to
+        :meth:`pytorch_pfn_extras.training.Trainer.run`.
+    """
+
+    trigger = 1, "iteration"
+    priority = extension.PRIORITY_WRITER
+    default_name = "dataloader_tuner"
+
+    def __init__(
+        self,
+        loader: torch.utils.data.DataLoader,
+        tune: bool = False,
+        threshold: float = 0.1,
+        min_improvement: float = 0.05,
+        max_num_workers: Optional[int] = None,
+        max_prefetch_factor: int = 8,
+        wait_tag: str = "ppe.training.Trainer:get_data",
+    ):
+        if not isinstance(loader, torch.utils.data.DataLoader):
+            raise TypeError("loader must be a torch.utils.data.DataLoader")
+        self.dataloader = loader
+        self._loader = _TunedLoader(self)
+        self._tune = tune
+        self._threshold = threshold
+        self._min_improvement = min_improvement
+        if max_num_workers is None:
+            max_num_workers = os.cpu_count() or 1
+        self._max_num_workers = max_num_workers
+        self._max_prefetch_factor = max_prefetch_factor
+        self._wait_tag = wait_tag
+        self._time_summary: Optional[TimeSummary] = None
+        # Total and count of the waits in the time summary at the last call
+        self._summary_wait: Tuple[float, int] = (0.0, 0)
+
+        self._wait_time = 0.0
+        self._last_time: Optional[float] = None
+        self._epoch: Optional[int] = None
+        self._epoch_wait = 0.0
+        self._epoch_time = 0.0
+        self._epoch_iterations = 0
+
+        self._config = _get_config(loader)
+        self._best_config = self._config
+        self._best_time: Optional[float] = None
+        self._candidates: List[_Config] = []
+        self._tried = {self._config}
+
+    @property
+    def loader(self) -> Any:
+        """Iterable to use in the training loop instead of the DataLoader.
+
+        Each iteration over it uses the current DataLoader.
+        """
+        return self._loader
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Current options of the DataLoader."""
+        num_workers, prefetch_factor, pin_memory = self._config
+        return {
+            "num_workers": num_workers,
+            "prefetch_factor": prefetch_factor,
+            "pin_memory": pin_memory,
+        }
+
+    def _neighbours(self, config: _Config) -> List[_Config]:
+        num_workers, prefetch_factor, pin_memory = config
+        candidates = [
+            (
+                min(max(1, num_workers * 2), self._max_num_workers),
+                prefetch_factor,
+                pin_memory,
+            ),
+        ]
+        # prefetch_factor has no effect without workers
+        if num_workers > 0:
+            candidates.append(
+                (
+                    num_workers,
+                    min(prefetch_factor * 2, self._max_prefetch_factor),
+                    pin_memory,
+                )
+            )
+            candidates.append((num_workers // 2, prefetch_factor, pin_memory))
+        if torch.cuda.is_available():
+            candidates.append((num_workers, prefetch_factor, not pin_memory))
+        return [c for c in dict.fromkeys(candidates) if c not in self._tried]
+
+    def _apply(self, config: _Config) -> None:
+        if config != self._config:
+            self.dataloader = _recreate_loader(self.dataloader, config)
+            self._config = config
+
+    def _step_search(self, iteration_time: float, ratio: float) -> None:
+        if self._config == self._best_config or (
+            self._best_time is not None
+            and iteration_time < self._best_time * (1 - self._min_improvement)
+        ):
+            self._best_config = self._config
+            self._best_time = iteration_time
+            self._candidates = []
+            if ratio > self._threshold:
+                self._candidates = self._neighbours(self._config)
+        if self._candidates:
+            config = self._candidates.pop(0)
+            self._tried.add(config)
+        else:
+            config = self._best_config
+        self._apply(config)
+
+    def _read_summary_wait(self) -> Optional[float]:
+        # Time reported for ``wait_tag`` since the last call, or ``None``
+        # if nothing was reported
+        assert self._time_summary is not None
+        with self._time_summary.summary() as s:
+            state = s[0].state_dict().get(self._wait_tag)
+        if state is None:
+            self._summary_wait = (0.0, 0)
+            return None
+        total, count = float(state["_x"]), int(state["_n"])
+        last_total, last_count = self._summary_wait
+        self._summary_wait = (total, count)
+        if count < last_count:
+            # The summary was cleared since the last call
+            return total
+        if count == last_count:
+            return None
+        return total - last_total
+
+    def initialize(self, manager: ExtensionsManagerProtocol) -> None:
+        self._time_summary = get_time_summary()
+        self._read_summary_wait()
+        self._last_time = time.perf_counter()
+        self._epoch = manager.epoch
+
+    def __call__(self, manager: ExtensionsManagerProtocol) -> None:
+        now = time.perf_counter()
+        assert self._last_time is not None
+        elapsed = now - self._last_time
+        wait = self._read_summary_wait()
+        if wait is None:
+            wait = self._wait_time
+        wait = min(wait, elapsed)
+        self._last_time = now
+        self._wait_time = 0.0
+        reporting.report(
+            {
+                "dataloader/wait_time": wait,
+                "dataloader/input_bound_ratio": (
+                    wait / elapsed if elapsed > 0 else 0.0
+                ),
+            }
+        )
+        self._epoch_wait += wait
+        self._epoch_time += elapsed
+        self._epoch_iterations += 1
+
+        if manager.epoch != self._epoch:
+            self._epoch = manager.epoch
+            if self._tune and self._epoch_time > 0:
+                self._step_search(
+                    self._epoch_time / self._epoch_iterations,
+                    self._epoch_wait / self._epoch_time,
+                )
+            self._epoch_wait = 0.0
+            self._epoch_time = 0.0
+            self._epoch_iterations = 0
+            # Excludes the time spent re-creating the DataLoader
+            self._last_time = time.perf_counter()
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            "config": list(self._config),
+            "best_config": list(self._best_config),
+            "best_time": self._best_time,
+            "candidates": [list(c) for c in self._candidates],
+            "tried": [list(c) for c in self._tried],
+        }
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        self._best_config = _to_config(to_load["best_config"])
+        self._best_time = to_load["best_time"]
+        self._candidates = [_to_config(c) for c in to_load["candidates"]]
+        self._tried = {_to_config(c) for c in to_load["tried"]}
+        self._apply(_to_config(to_load["config"]))
@@ -1,8 +1,21 @@
 import collections
 import json
-from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+import os
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
-from pytorch_pfn_extras import reporting
+import numpy
+from pytorch_pfn_extras import reporting, writing
 from pytorch_pfn_extras.training import extension
 from pytorch_pfn_extras.training import trigger as trigger_module
 from pytorch_pfn_extras.training._manager_protocol import (
@@ -57,6 +70,9 @@ class _LogBuffer:
         self._log: List[Observation] = []
         self._offset = 0
 
+    def _end(self) -> int:
+        return len(self._log) + self._offset
+
     def _trim(self) -> None:
         min_looker_index = min(self.lookers.values())
         if min_looker_index > self._offset:
@@ -69,21 +85,330 @@ class _LogBuffer:
     def _get(self, looker_id: int) -> List[Observation]:
         return self._log[self.lookers[looker_id] - self._offset :]
 
+    def _to_dataframe(self, looker_id: int) -> "pandas.DataFrame":
+        return pandas.DataFrame(self._get(looker_id))
+
     def _clear(self, looker_id: int) -> None:
         if looker_id not in self.lookers:
             raise ValueError(f"looker {looker_id} is not registered")
-        self.lookers[looker_id] = len(self._log) + self._offset
+        self.lookers[looker_id] = self._end()
         self._trim()
 
     def emit_new_looker(self) -> "_LogLooker":
         looker_id = len(self.lookers)
         assert looker_id not in self.lookers
-        self.lookers[looker_id] = len(self._log) + self._offset
+        self.lookers[looker_id] = self._end()
         return _LogLooker(self, looker_id)
 
     def size(self) -> int:
         return len(self._log)
 
+    def state_dict(self) -> Dict[str, Any]:
+        return {"_log": json.dumps(self._log)}
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        self._log = json.loads(to_load["_log"])
+
+
+def _column_kind(value: Any) -> Any:
+    if isinstance(value, (bool, numpy.bool_)):
+        return object
+    if isinstance(value, (int, numpy.integer)):
+        return numpy.int64
+    if isinstance(value, (float, numpy.floating)):
+        return numpy.float64
+    return object
+
+
+def _fill_value(dtype: Any) -> Any:
+    if dtype == numpy.float64:
+        return numpy.nan
+    if dtype == numpy.int64:
+        return 0
+    return None
+
+
+def _rows_from_columns(
+    keys: Iterable[str],
+    columns: Mapping[str, numpy.ndarray],
+    masks: Mapping[str, numpy.ndarray],
+    begin: int,
+    end: int,
+) -> List[Observation]:
+    rows: List[Dict[str, Any]] = [{} for _ in range(end - begin)]
+    for key in keys:
+        values = columns[key][begin:end].tolist()
+        present = masks[key][begin:end].tolist()
+        for row, value, exists in zip(rows, values, present):
+            if exists:
+                row[key] = value
+    return rows
+
+
+class _ColumnarLogBuffer(_LogBuffer):
+    """Log buffer that stores observations column by column.
+
+    Every key is interned to a column backed by a numpy array that grows
+    geometrically, which is much more compact than a dict per observation.
+    When ``spill_dir`` is given, the rows are moved to ``.npz`` chunk files
+    in that directory every ``max_rows_in_memory`` rows, and
+    :meth:`state_dict` only records the chunks written so far and the rows
+    still in memory instead of embedding the log. A chunk file is removed
+    once all the lookers have cleared its rows, unless a state dict refers
+    to it.
+    """
+
+    def __init__(
+        self,
+        max_rows_in_memory: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        initial_capacity: int = 64,
+    ) -> None:
+        super().__init__()
+        if max_rows_in_memory is not None:
+            if spill_dir is None:
+                raise ValueError("max_rows_in_memory requires spill_dir")
+            if max_rows_in_memory <= 0:
+                raise ValueError("max_rows_in_memory must be positive")
+        self._max_rows = max_rows_in_memory
+        self._spill_dir = spill_dir
+        self._capacity = max(1, initial_capacity)
+        self._columns: Dict[str, numpy.ndarray] = {}
+        self._masks: Dict[str, numpy.ndarray] = {}
+        # Absolute index of the first row held in memory
+        self._mem_start = 0
+        self._num_rows = 0
+        # (absolute index of the first row, number of rows, file name)
+        self._chunks: List[Tuple[int, int, str]] = []
+        # Chunks referred to by a state dict, which are kept on the disk
+        self._saved_chunks: Set[str] = set()
+
+    def _end(self) -> int:
+        return self._mem_start + self._num_rows
+
+    def _new_column(self, dtype: Any) -> numpy.ndarray:
+        return numpy.full(self._capacity, _fill_value(dtype), dtype=dtype)
+
+    def _set_dtype(self, key: str, dtype: Any) -> numpy.ndarray:
+        column = self._new_column(dtype)
+        old = self._columns.get(key)
+        if old is not None:
+            n = self._num_rows
+            column[:n] = old[:n]
+            column[:n][~self._masks[key][:n]] = _fill_value(dtype)
+        else:
+            self._masks[key] = numpy.zeros(self._capacity, dtype=bool)
+        self._columns[key] = column
+        return column
+
+    def _grow(self) -> None:
+        n = self._num_rows
+        self._capacity *= 2
+        for key, old in self._columns.items():
+            column = self._new_column(old.dtype)
+            column[:n] = old[:n]
+            self._columns[key] = column
+            mask = numpy.zeros(self._capacity, dtype=bool)
+            mask[:n] = self._masks[key][:n]
+            self._masks[key] = mask
+
+    def _reset_rows(self, begin: int) -> None:
+        for key, column in self._columns.items():
+            column[begin:] = _fill_value(column.dtype)
+            self._masks[key][begin:] = False
+
+    def append(self, observation: Observation) -> None:
+        if self._num_rows == self._capacity:
+            self._grow()
+        row = self._num_rows
+        for key, value in observation.items():
+            kind = _column_kind(value)
+            column = self._columns.get(key)
+            if column is None:
+                column = self._set_dtype(key, kind)
+            elif column.dtype != kind and column.dtype != object:
+                if column.dtype == numpy.int64 and kind == numpy.float64:
+                    column = self._set_dtype(key, numpy.float64)
+                elif not (
+                    column.dtype == numpy.float64 and kind == numpy.int64
+                ):
+                    column = self._set_dtype(key, object)
+            column[row] = value
+            self._masks[key][row] = True
+        self._num_rows += 1
+        if self._max_rows is not None and self._num_rows >= self._max_rows:
+            self._spill()
+
+    def _chunk_path(self, name: str) -> str:
+        assert self._spill_dir is not None
+        return os.path.join(self._spill_dir, name)
+
+    def _spill(self) -> None:
+        n = self._num_rows
+        if n == 0:
+            return
+        assert self._spill_dir is not None
+        os.makedirs(self._spill_dir, exist_ok=True)
+        # Unique names, so that a resumed run does not overwrite the chunks
+        # of the snapshots taken after the one it resumes from
+        name = "chunk_{:08d}_{}.npz".format(self._mem_start, uuid.uuid4().hex)
+        arrays: Dict[str, numpy.ndarray] = {
+            "keys": numpy.array(list(self._columns.keys()), dtype=str)
+        }
+        for i, key in enumerate(self._columns):
+            arrays["v{}".format(i)] = self._columns[key][:n]
+            arrays["m{}".format(i)] = self._masks[key][:n]
+        with open(self._chunk_path(name), "wb") as f:
+            numpy.savez(f, **arrays)
+        self._chunks.append((self._mem_start, n, name))
+        self._mem_start += n
+        self._num_rows = 0
+        self._reset_rows(0)
+
+    def _load_chunk(
+        self, name: str
+    ) -> Tuple[List[str], Dict[str, numpy.ndarray], Dict[str, numpy.ndarray]]:
+        with numpy.load(self._chunk_path(name), allow_pickle=True) as data:
+            keys = data["keys"].tolist()
+            columns = {k: data["v{}".format(i)] for i, k in enumerate(keys)}
+            masks = {k: data["m{}".format(i)] for i, k in enumerate(keys)}
+        return keys, columns, masks
+
+    def _trim(self) -> None:
+        min_looker_index = min(self.lookers.values())
+        if min_looker_index <= self._offset:
+            return
+        self._offset = min_looker_index
+        chunks = []
+        for chunk in self._chunks:
+            if chunk[0] + chunk[1] > self._offset:
+                chunks.append(chunk)
+            elif chunk[2] not in self._saved_chunks:
+                try:
+                    os.remove(self._chunk_path(chunk[2]))
+                except FileNotFoundError:
+                    pass
+        self._chunks = chunks
+        drop = min(self._offset - self._mem_start, self._num_rows)
+        if drop > 0:
+            n = self._num_rows
+            for key, column in self._columns.items():
+                column[: n - drop] = column[drop:n]
+                mask = self._masks[key]
+                mask[: n - drop] = mask[drop:n]
+            self._num_rows -= drop
+            self._mem_start += drop
+            self._reset_rows(self._num_rows)
+
+    def _get(self, looker_id: int) -> List[Observation]:
+        begin = self.lookers[looker_id]
+        rows: List[Observation] = []
+        for start, n, name in self._chunks:
+            if start + n <= begin:
+                continue
+            keys, columns, masks = self._load_chunk(name)
+            rows.extend(
+                _rows_from_columns(
+                    keys, columns, masks, max(0, begin - start), n
+                )
+            )
+        rows.extend(
+            _rows_from_columns(
+                list(self._columns.keys()),
+                self._columns,
+                self._masks,
+                max(0, begin - self._mem_start),
+                self._num_rows,
+            )
+        )
+        return rows
+
+    def _to_dataframe(self, looker_id: int) -> "pandas.DataFrame":
+        begin = self.lookers[looker_id]
+        parts = []
+        for start, n, name in self._chunks:
+            if start + n > begin:
+                parts.append(
+                    (self._load_chunk(name), max(0, begin - start), n)
+                )
+        parts.append(
+            (
+                (list(self._columns.keys()), self._columns, self._masks),
+                max(0, begin - self._mem_start),
+                self._num_rows,
+            )
+        )
+        frames = []
+        for (keys, columns, masks), lo, hi in parts:
+            data = {}
+            for key in keys:
+                values = columns[key][lo:hi]
+                mask = masks[key][lo:hi]
+                if values.dtype == numpy.int64 and not mask.all():
+                    # Missing entries must be represented as NaN
+                    values = values.astype(numpy.float64)
+                    values[~mask] = numpy.nan
+                data[key] = values
+            frames.append(pandas.DataFrame(data, copy=False))
+        if len(frames) == 1:
+            return frames[0]
+        return pandas.concat(frames, ignore_index=True)
+
+    def size(self) -> int:
+        return self._num_rows + sum(n for _, n, _ in self._chunks)
+
+    def state_dict(self) -> Dict[str, Any]:
+        if self._spill_dir is None:
+            return {"_log": json.dumps(self._get_all())}
+        # Only the location of the spilled rows is saved; the rows
+        # themselves are persisted as chunk files.
+        self._saved_chunks.update(name for _, _, name in self._chunks)
+        begin = max(self._offset, self._mem_start)
+        rows = _rows_from_columns(
+            list(self._columns.keys()),
+            self._columns,
+            self._masks,
+            begin - self._mem_start,
+            self._num_rows,
+        )
+        return {
+            "_log_chunks": [list(chunk) for chunk in self._chunks],
+            "_log_offset": self._offset,
+            "_log_start": begin,
+            "_log_rows": json.dumps(rows),
+        }
+
+    def _get_all(self) -> List[Observation]:
+        lookers = self.lookers
+        self.lookers = {0: self._offset}
+        try:
+            return self._get(0)
+        finally:
+            self.lookers = lookers
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        self._chunks = []
+        self._num_rows = 0
+        self._reset_rows(0)
+        if "_log" in to_load:
+            self._mem_start = self._offset
+            for observation in json.loads(to_load["_log"]):
+                self.append(observation)
+            return
+        if self._spill_dir is None:
+            raise ValueError(
+                "spill_dir is required to load a log spilled to disk"
+            )
+        self._chunks = [
+            (int(start), int(n), str(name))
+            for start, n, name in to_load["_log_chunks"]
+        ]
+        self._saved_chunks.update(name for _, _, name in self._chunks)
+        self._offset = int(to_load["_log_offset"])
+        self._mem_start = int(to_load["_log_start"])
+        for observation in json.loads(to_load["_log_rows"]):
+            self.append(observation)
+
 
 class _LogLooker:
     def __init__(self, log_buffer: _LogBuffer, looker_id: int) -> None:
@@ -93,6 +418,9 @@ class _LogLooker:
     def get(self) -> List[Observation]:
         return self._log_buffer._get(self._looker_id)
 
+    def to_dataframe(self) -> "pandas.DataFrame":
+        return self._log_buffer._to_dataframe(self._looker_id)
+
     def clear(self) -> None:
         return self._log_buffer._clear(self._looker_id)
 
@@ -143,7 +471,28 @@ class LogReport(extension.Extension):
         writer (writer object, optional): must be callable.
             object to dump the log to. If specified, it needs to have a correct
             `savefun` defined. The writer can override the save location in
-            the :class:`pytorch_pfn_extras.training.ExtensionsManager` object
+            the :class:`pytorch_pfn_extras.training.ExtensionsManager` object.
+            If it is a :class:`pytorch_pfn_extras.writing.JsonLinesWriter`,
+            each entry is streamed to the file only once and the entries
+            already written are not kept in memory; :attr:`log` reads them
+            back from the file when accessed. Snapshots record the end of
+            the files, and the entries written after it are dropped when
+            resuming.
+        columnar (bool, optional): If ``True``, the log is kept in per-key
+            numpy arrays instead of a list of dicts, which greatly reduces
+            the memory used by long runs and lets :meth:`to_dataframe`
+            build the data frame without copying.
+        max_rows_in_memory (int, optional): Maximum number of log entries
+            kept in memory by the columnar log. Older entries are moved to
+            ``spill_dir``. Requires ``spill_dir``.
+        spill_dir (str, optional): Directory where the columnar log spills
+            its entries. When given, ``columnar`` is implied and snapshots
+            only record the files written to this directory instead of
+            embedding the whole log. It requires ``append``, so that the
+            spilled entries are not read back at every output; they are
+            kept until the other readers of the log, such as
+            :class:`PrintReport`, have read them, and the files recorded
+            by a snapshot are never removed.
 
     .. note::
 
@@ -162,21 +511,41 @@ class LogReport(extension.Extension):
         filename: Optional[str] = None,
         append: bool = False,
         format: Optional[str] = None,
+        columnar: bool = False,
+        max_rows_in_memory: Optional[int] = None,
+        spill_dir: Optional[str] = None,
         **kwargs: Any,
     ):
         self._keys = keys
         self._trigger = trigger_module.get_trigger(trigger)
         self._postprocess = postprocess
-        self._log_buffer = _LogBuffer()
+        self._log_buffer: _LogBuffer
+        if columnar or spill_dir is not None:
+            self._log_buffer = _ColumnarLogBuffer(
+                max_rows_in_memory=max_rows_in_memory, spill_dir=spill_dir
+            )
+        elif max_rows_in_memory is not None:
+            raise ValueError("max_rows_in_memory requires spill_dir")
+        else:
+            self._log_buffer = _LogBuffer()
         self._log_looker = self._log_buffer.emit_new_looker()
         # When using a writer, it needs to have a savefun defined
         # to deal with a string.
         self._writer = kwargs.get("writer", None)
+        self._streaming = isinstance(self._writer, writing.JsonLinesWriter)
+        self._log_names: List[str] = []
 
         if filename is None:
             filename = "log"
 
-        if format is None:
+        if self._streaming:
+            if format not in (None, "json-lines"):
+                raise ValueError(
+                    "JsonLinesWriter only supports json-lines format"
+                )
+            format = "json-lines"
+            append = True
+        elif format is None:
             if filename.endswith(".jsonl"):
                 format = "json-lines"
             elif filename.endswith(".yaml"):
@@ -185,6 +554,8 @@ class LogReport(extension.Extension):
                 format = "json"
         elif format not in ("json", "json-lines", "yaml"):
             raise ValueError(f"unsupported log format: {format}")
+        if spill_dir is not None and not append:
+            raise ValueError("spill_dir requires append mode")
 
         self._filename = filename
         self._append = append
@@ -222,6 +593,8 @@ class LogReport(extension.Extension):
 
             # write to the log file
             log_name = self._filename.format(**stats_cpu)
+            if self._streaming and log_name not in self._log_names:
+                self._log_names.append(log_name)
             out = manager.out
             savefun = LogWriterSaveFunc(self._format, self._append)
             writer(
@@ -240,8 +613,16 @@ class LogReport(extension.Extension):
     @property
     def log(self) -> List[Mapping[str, Any]]:
         """The current list of observation dictionaries."""
+        if self._streaming:
+            return self._read_log()
         return self._log_looker.get()
 
+    def _read_log(self) -> List[Mapping[str, Any]]:
+        log: List[Mapping[str, Any]] = []
+        for log_name in self._log_names:
+            log.extend(self._writer.read(log_name))
+        return log
+
     def state_dict(self) -> Dict[str, Any]:
         state: Dict[str, Any] = {}
         if hasattr(self._trigger, "state_dict"):
@@ -251,14 +632,25 @@ class LogReport(extension.Extension):
             state["_summary"] = self._summary.state_dict()
         except KeyError:
             pass
-        state["_log"] = json.dumps(self._log_buffer._log)
+        state.update(self._log_buffer.state_dict())
+        if self._streaming:
+            state["_log_names"] = list(self._log_names)
+            state["_log_positions"] = [
+                self._writer.tell(log_name) for log_name in self._log_names
+            ]
         return state
 
     def load_state_dict(self, to_load: Dict[str, Any]) -> None:
         if hasattr(self._trigger, "load_state_dict"):
             self._trigger.load_state_dict(to_load["_trigger"])
         self._summary.load_state_dict(to_load["_summary"])
-        self._log_buffer._log = json.loads(to_load["_log"])
+        self._log_buffer.load_state_dict(to_load)
+        if self._streaming:
+            self._log_names = list(to_load.get("_log_names", []))
+            positions = to_load.get("_log_positions", [])
+            for log_name, position in zip(self._log_names, positions):
+                # Drop the entries written after the state was saved
+                self._writer.truncate(log_name, position)
 
     def _init_summary(self) -> None:
         self._summary = reporting.DictSummary()
@@ -268,7 +660,9 @@ class LogReport(extension.Extension):
             raise ImportError(
                 "Need to install pandas to use `to_dataframe` method."
             )
-        return pandas.DataFrame(self._log_looker.get())
+        if self._streaming:
+            return pandas.DataFrame(self.log)
+        return self._log_looker.to_dataframe()
 
     def finalize(self, manager: ExtensionsManagerProtocol) -> None:
         if self._writer is not None:
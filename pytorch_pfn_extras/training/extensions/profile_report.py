@@ -1,8 +1,13 @@
 import json
+import warnings
 from collections import OrderedDict
 from typing import Any, Dict, Iterable, List, Optional
 
+import torch
+import torch.distributed
 from pytorch_pfn_extras import reporting
+from pytorch_pfn_extras.profiler import _util
+from pytorch_pfn_extras.profiler._call_tree import get_call_tree
 from pytorch_pfn_extras.profiler._time_summary import get_time_summary
 from pytorch_pfn_extras.training import extension
 from pytorch_pfn_extras.training import trigger as trigger_module
@@ -17,6 +22,18 @@ class ProfileReport(extension.Extension):
 
     Times are reported by using the
     :meth:`pytorch_pfn_extras.profiler.TimeSummary.report` context manager.
+    Besides the mean and the standard deviation (``<tag>.std``), the minimum
+    (``<tag>.min``), the maximum (``<tag>.max``) and the estimated quantiles
+    (``<tag>.p50``, ``<tag>.p90`` and ``<tag>.p99`` by default) of the times
+    of each tag are reported. Counters added with
+    :meth:`pytorch_pfn_extras.profiler.TimeSummary.add_counter`, such as the
+    changes of memory usage, are reported as ``<name>.sum``, ``<name>.min``
+    and ``<name>.max``.
+
+    Once the log has been written to a file, :meth:`state_dict` only records
+    a cursor to the file (file name, size and number of entries) instead of
+    the log itself. After :meth:`load_state_dict`, the log is restored from
+    that file when the extension is called for the first time.
 
     Args:
         store_keys (iterable of strs): Keys of values to write to the profiler
@@ -39,12 +56,25 @@ class ProfileReport(extension.Extension):
             object to dump the log to. If specified, it needs to have a correct
             `savefun` defined. The writer can override the save location in
             the :class:`pytorch_pfn_extras.training.ExtensionsManager` object
-    Args:
-        entries (list): list of str
-
-    Returns:
-        header (str): header string
-        templates (str): template string for print values.
+        distributed (bool, optional): If ``True`` and
+            ``torch.distributed`` is initialized, the mean time of each tag
+            is gathered from all the ranks every time the result is
+            aggregated, and ``<tag>.rank_min``, ``<tag>.rank_median``,
+            ``<tag>.rank_max``, ``<tag>.rank_argmax`` (the rank with the
+            maximum time) and ``<tag>.rank_spread`` (the ratio of the
+            maximum to the median) are added to the result.
+        straggler_factor (float, optional): Used with ``distributed``. Ranks
+            whose mean time of a tag exceeds the median of all the ranks by
+            this factor are reported as stragglers with a warning, and their
+            number is added to the result as ``<tag>.stragglers``.
+        straggler_keys (iterable of strs, optional): Tags checked for
+            stragglers. If ``None``, all the tags are checked.
+        call_tree_filename (str, optional): Name of the file under the
+            output directory to which the collapsed stacks of the enabled
+            :class:`pytorch_pfn_extras.profiler.CallTree` are written every
+            time the result is aggregated. Like ``filename``, it can be a
+            format string. If ``None`` or if no call tree is enabled, they
+            are not written.
     """
 
     def __init__(
@@ -55,8 +85,14 @@ class ProfileReport(extension.Extension):
         filename: Optional[str] = None,
         append: bool = False,
         format: Optional[str] = None,
+        distributed: bool = False,
+        straggler_factor: Optional[float] = None,
+        straggler_keys: Optional[Iterable[str]] = None,
+        call_tree_filename: Optional[str] = None,
         **kwargs: Any,
     ):
+        if straggler_factor is not None and straggler_factor < 1:
+            raise ValueError("straggler_factor must be at least 1")
         self.time_summary = get_time_summary()
         # Initializes global TimeSummary.
         self.time_summary.initialize()
@@ -68,7 +104,13 @@ class ProfileReport(extension.Extension):
                 key + ".std" for key in store_keys
             ]
         self._report_keys = report_keys
+        self._distributed = distributed
+        self._straggler_factor = straggler_factor
+        self._straggler_keys = (
+            None if straggler_keys is None else set(straggler_keys)
+        )
         self._trigger = trigger_module.get_trigger(trigger)
+        self._call_tree_filename = call_tree_filename
         self._log: List[Any] = []
 
         log_name = kwargs.get("log_name", "log")
@@ -88,6 +130,10 @@ class ProfileReport(extension.Extension):
 
         self._append = append
         self._format = format
+        # Location of the log written so far
+        self._log_file: Optional[str] = None
+        self._log_offset = 0
+        self._cursor: Optional[Dict[str, Any]] = None
 
     def __call__(self, manager: ExtensionsManagerProtocol) -> None:
         if manager.is_before_training or self._trigger(manager):
@@ -95,7 +141,12 @@ class ProfileReport(extension.Extension):
                 st, additional = s
                 stats = st.make_statistics()
                 stats.update(additional)
+                means = st.compute_mean()
+            if self._distributed and torch.distributed.is_initialized():
+                stats.update(self._reduce_across_ranks(means))
             writer = manager.writer if self._writer is None else self._writer
+            if self._cursor is not None:
+                self._restore_from_cursor(writer)
             # report
             if self._report_keys is not None:
                 reports = {
@@ -129,28 +180,137 @@ class ProfileReport(extension.Extension):
                 savefun = log_report.LogWriterSaveFunc(
                     self._format, self._append
                 )
+                data = _util.serialize(savefun, self._log)
+                if self._append:
+                    if log_name != self._log_file:
+                        self._log_offset = (
+                            _util.get_file_size(writer, log_name) or 0
+                        )
+                    # Keep track of the file size without querying the
+                    # writer, which may write asynchronously
+                    self._log_offset += len(data)
+                self._log_file = log_name
                 writer(
                     log_name,
                     out,
-                    self._log,  # type: ignore
-                    savefun=savefun,
+                    data,  # type: ignore
+                    savefun=_util.save_bytes,
                     append=self._append,
                 )
                 if self._append:
                     self._log = []
 
+            call_tree = get_call_tree()
+            if self._call_tree_filename is not None and call_tree is not None:
+                call_tree.flush(self._call_tree_filename.format(**out), writer)
+
+    def _reduce_across_ranks(self, means: Dict[str, Any]) -> Dict[str, float]:
+        world_size = torch.distributed.get_world_size()
+        # Ranks may not have reported the same tags
+        all_tags: List[Optional[List[str]]] = [None] * world_size
+        torch.distributed.all_gather_object(  # type: ignore[no-untyped-call]
+            all_tags, sorted(means)
+        )
+        tags = sorted(set().union(*filter(None, all_tags)))
+        if not tags:
+            return {}
+        device = torch.device("cpu")
+        if torch.distributed.get_backend() == "nccl":
+            device = torch.device("cuda", torch.cuda.current_device())
+        local = torch.tensor(
+            [float(means.get(tag, float("nan"))) for tag in tags],
+            dtype=torch.float64,
+            device=device,
+        )
+        gathered = [torch.empty_like(local) for _ in range(world_size)]
+        torch.distributed.all_gather(gathered, local)
+        values = torch.stack(gathered).cpu()  # (ranks, tags)
+
+        nan = torch.isnan(values)
+        median = values.nanmedian(dim=0).values
+        min_value = values.masked_fill(nan, float("inf")).min(dim=0).values
+        max_value, argmax = values.masked_fill(nan, float("-inf")).max(dim=0)
+        stats: Dict[str, float] = {}
+        for i, tag in enumerate(tags):
+            stats[f"{tag}.rank_min"] = float(min_value[i])
+            stats[f"{tag}.rank_median"] = float(median[i])
+            stats[f"{tag}.rank_max"] = float(max_value[i])
+            stats[f"{tag}.rank_argmax"] = float(argmax[i])
+            stats[f"{tag}.rank_spread"] = float(max_value[i] / median[i])
+            if self._straggler_factor is None:
+                continue
+            if (
+                self._straggler_keys is not None
+                and tag not in self._straggler_keys
+            ):
+                continue
+            threshold = median[i] * self._straggler_factor
+            stragglers = (values[:, i] > threshold).nonzero().flatten()
+            stats[f"{tag}.stragglers"] = float(len(stragglers))
+            if len(stragglers) > 0:
+                warnings.warn(
+                    f"Straggler ranks detected for {tag}: "
+                    f"{stragglers.tolist()} (median {float(median[i]):.6f}, "
+                    f"max {float(max_value[i]):.6f})"
+                )
+        return stats
+
     def state_dict(self) -> Dict[str, Any]:
         state: Dict[str, Any] = {}
         if hasattr(self._trigger, "state_dict"):
             state["_trigger"] = self._trigger.state_dict()
-        state["_log"] = json.dumps(self._log)
+        if self._cursor is not None:
+            # Not resumed yet, keep the loaded cursor as is
+            state["_log_cursor"] = self._cursor
+        elif self._log_file is None:
+            state["_log"] = json.dumps(self._log)
+        else:
+            state["_log_cursor"] = {
+                "filename": self._log_file,
+                "offset": self._log_offset,
+                "count": len(self._log),
+            }
         return state
 
     def load_state_dict(self, to_load: Dict[str, Any]) -> None:
         if hasattr(self._trigger, "load_state_dict"):
             self._trigger.load_state_dict(to_load["_trigger"])
-        self._log = json.loads(to_load["_log"])
+        if "_log_cursor" in to_load:
+            self._cursor = to_load["_log_cursor"]
+            self._log = []
+        else:
+            self._cursor = None
+            self._log = json.loads(to_load["_log"])
+
+    def _restore_from_cursor(self, writer: Any) -> None:
+        cursor = self._cursor
+        assert cursor is not None
+        self._cursor = None
+        filename = cursor["filename"]
+        self._log_file = filename
+        if self._append:
+            # Drop the entries written after the state was saved
+            _util.truncate_file(writer, filename, cursor["offset"])
+            self._log_offset = cursor["offset"]
+            return
+        data = _util.read_file(writer, filename)
+        if data is None:
+            return
+        self._log = _load_log(self._format, data)[: cursor["count"]]
 
     def finalize(self, manager: ExtensionsManagerProtocol) -> None:
         if self._writer is not None:
             self._writer.finalize()
+
+
+def _load_log(format: Optional[str], data: bytes) -> List[Any]:
+    text = data.decode("ascii")
+    if format == "json":
+        return json.loads(text)  # type: ignore[no-any-return]
+    elif format == "json-lines":
+        return [json.loads(x) for x in text.splitlines() if x.strip()]
+    elif format == "yaml":
+        import yaml
+
+        return yaml.safe_load(text) or []  # type: ignore[no-any-return]
+    raise ValueError("Unknown format: {}".format(format))
@@ -0,0 +1,242 @@
+import json
+import sys
+import threading
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+from pytorch_pfn_extras.profiler._call_tree import _save_collapsed
+from pytorch_pfn_extras.training import extension
+from pytorch_pfn_extras.training import trigger as trigger_module
+from pytorch_pfn_extras.training._manager_protocol import (
+    ExtensionsManagerProtocol,
+)
+
+_Stack = Tuple[str, ...]
+
+
+def _frame_name(code: types.CodeType) -> str:
+    # Semicolons separate the frames in the collapsed stack format
+    name = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+def _save_json(target: Any, file_o: Any) -> None:
+    file_o.write(json.dumps(target, indent=4).encode("utf-8"))
+
+
+class StackSampler(extension.Extension):
+    """Samples the Python stack of the training loop in a background thread.
+
+    While sampling is enabled, a background thread captures the stack of
+    the thread running the training loop (the thread where the manager is
+    initialized) every ``interval`` seconds with
+    :func:`sys._current_frames`, and counts the number of times each stack
+    is seen. Unlike :func:`pytorch_pfn_extras.profiler.record`, this finds
+    the Python overhead anywhere in the training loop, including in code
+    without profiled scopes. As the sampling thread needs the GIL, the
+    actual interval may be as long as :func:`sys.getswitchinterval` while
+    the training loop runs Python code.
+
+    The counts are written with the writer of the manager when ``trigger``
+    fires: the stacks are written to ``filename`` in the collapsed stack
+    format understood by flame graph tools, and the ``n_top`` functions in
+    which most samples were taken are written to ``top_filename`` in JSON
+    format. For each function, ``self`` is the number of samples taken in
+    the function itself and ``total`` the number of samples taken in the
+    function or in the functions it called.
+
+    Args:
+        trigger: Trigger that decides when to output the stacks.
+            This is distinct from the trigger of this extension
+            itself. If it is a tuple in the form ``<int>, 'epoch'`` or
+            ``<int>, 'iteration'``, it is passed to :class:`IntervalTrigger`.
+        interval (float): Interval in seconds between two samples.
+        enable: Trigger that enables the sampling. If ``None``, the
+            sampling is enabled from the beginning of the training.
+            Note that since the extensions are executed at the end of an
+            iteration the sampling will be enabled from the iteration after
+            the trigger is fired. If it is a tuple in the form
+            ``<int>, 'epoch'`` or ``<int>, 'iteration'``, it is passed to
+            :class:`IntervalTrigger`.
+        disable: Trigger that disables the sampling. The same notes as
+            ``enable`` apply.
+        filename (str): Name of the collapsed stacks file under the output
+            directory.
+        top_filename (str): Name of the file listing the functions with the
+            most samples under the output directory. If ``None``, the file
+            is not written.
+        n_top (int): Number of functions listed in ``top_filename``.
+        writer (writer object, optional): must be callable.
+            object to dump the stacks to. If specified, it needs to have a
+            correct `savefun` defined. The writer can override the save
+            location in the
+            :class:`pytorch_pfn_extras.training.ExtensionsManager` object
+    """
+
+    def __init__(
+        self,
+        trigger: trigger_module.TriggerLike = (1, "epoch"),
+        interval: float = 0.005,
+        enable: Optional[trigger_module.TriggerLike] = None,
+        disable: Optional[trigger_module.TriggerLike] = None,
+        filename: str = "python_stacks.txt",
+        top_filename: Optional[str] = "python_top.json",
+        n_top: int = 20,
+        **kwargs: Any,
+    ):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self._trigger = trigger_module.get_trigger(trigger)
+        self._interval = interval
+        self._enable = None
+        if enable is not None:
+            self._enable = trigger_module.get_trigger(enable)
+        self._disable = None
+        if disable is not None:
+            self._disable = trigger_module.get_trigger(disable)
+        self._filename = filename
+        self._top_filename = top_filename
+        self._n_top = n_top
+        self._writer = kwargs.get("writer", None)
+
+        self._active = enable is None
+        self._counts: Dict[_Stack, int] = {}
+        self._lock = threading.Lock()
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            if self._active:
+                self._sample()
+
+    def _sample(self) -> None:
+        assert self._target is not None
+        frame = sys._current_frames().get(self._target)
+        stack: List[str] = []
+        while frame is not None:
+            stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        del frame
+        if not stack:
+            return
+        key = tuple(reversed(stack))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def stack_counts(self) -> Dict[str, int]:
+        """Returns the number of samples of each stack.
+
+        Returns:
+            A dictionary mapping each stack, with its frames from the
+            outermost one joined by ``;``, to its number of samples.
+        """
+        with self._lock:
+            counts = self._counts.copy()
+        return {";".join(stack): n for stack, n in counts.items()}
+
+    def top_functions(self, n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns the functions in which most samples were taken.
+
+        Args:
+            n (int): Number of functions to return. Defaults to ``n_top``.
+
+        Returns:
+            A list of dictionaries holding the ``function``, its ``self``
+            and ``total`` number of samples, and the fraction of all the
+            samples taken in the function itself (``self_ratio``), sorted
+            by decreasing number of ``self`` samples.
+        """
+        if n is None:
+            n = self._n_top
+        with self._lock:
+            counts = self._counts.copy()
+        self_counts: Dict[str, int] = {}
+        total_counts: Dict[str, int] = {}
+        n_samples = 0
+        for stack, count in counts.items():
+            n_samples += count
+            leaf = stack[-1]
+            self_counts[leaf] = self_counts.get(leaf, 0) + count
+            # Recursive functions are counted once per sample
+            for name in set(stack):
+                total_counts[name] = total_counts.get(name, 0) + count
+        functions = sorted(
+            total_counts,
+            key=lambda name: (self_counts.get(name, 0), total_counts[name]),
+            reverse=True,
+        )
+        return [
+            {
+                "function": name,
+                "self": self_counts.get(name, 0),
+                "total": total_counts[name],
+                "self_ratio": self_counts.get(name, 0) / n_samples,
+            }
+            for name in functions[:n]
+        ]
+
+    def _flush(self, manager: ExtensionsManagerProtocol) -> None:
+        writer = manager.writer if self._writer is None else self._writer
+        lines = [
+            f"{stack} {n}" for stack, n in sorted(self.stack_counts().items())
+        ]
+        writer(
+            self._filename,
+            manager.out,
+            lines,  # type: ignore[arg-type]
+            savefun=_save_collapsed,
+            append=False,
+        )
+        if self._top_filename is not None:
+            writer(
+                self._top_filename,
+                manager.out,
+                self.top_functions(),  # type: ignore[arg-type]
+                savefun=_save_json,
+                append=False,
+            )
+
+    def initialize(self, manager: ExtensionsManagerProtocol) -> None:
+        self._target = threading.get_ident()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def __call__(self, manager: ExtensionsManagerProtocol) -> None:
+        if self._enable is not None and self._enable(manager):
+            self._active = True
+        if self._disable is not None and self._disable(manager):
+            self._active = False
+
+        if not manager.is_before_training and self._trigger(manager):
+            self._flush(manager)
+
+    def state_dict(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        if hasattr(self._trigger, "state_dict"):
+            state["_trigger"] = self._trigger.state_dict()
+        state["_active"] = self._active
+        with self._lock:
+            state["_counts"] = list(self._counts.items())
+        return state
+
+    def load_state_dict(self, to_load: Dict[str, Any]) -> None:
+        if hasattr(self._trigger, "load_state_dict"):
+            self._trigger.load_state_dict(to_load["_trigger"])
+        self._active = to_load["_active"]
+        with self._lock:
+            self._counts = {
+                tuple(stack): n for stack, n in to_load["_counts"]
+            }
+
+    def finalize(self, manager: ExtensionsManagerProtocol) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._flush(manager)
+        if self._writer is not None:
+            self._writer.finalize()
@@ -0,0 +1,231 @@
+import time
+import types
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import torch
+from pytorch_pfn_extras import reporting
+from pytorch_pfn_extras._torch_version import requires
+from pytorch_pfn_extras.training import extension
+from pytorch_pfn_extras.training._manager_protocol import (
+    ExtensionsManagerProtocol,
+)
+
+# Positional and keyword arguments of a forward call
+_Inputs = Tuple[Tuple[Any, ...], Dict[str, Any]]
+
+
+def _first_tensor(obj: Any) -> Optional[torch.Tensor]:
+    if isinstance(obj, torch.Tensor):
+        return obj
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        for value in obj:
+            tensor = _first_tensor(value)
+            if tensor is not None:
+                return tensor
+    return None
+
+
+def _default_batch_size(inputs: _Inputs) -> int:
+    tensor = _first_tensor(inputs)
+    if tensor is None or tensor.dim() == 0:
+        raise ValueError(
+            "Cannot infer the batch size from the inputs of the model, "
+            "please specify batch_size_fn"
+        )
+    return tensor.shape[0]
+
+
+def _signature(obj: Any) -> Hashable:
+    if isinstance(obj, torch.Tensor):
+        return (tuple(obj.shape), obj.dtype, obj.device.type)
+    if isinstance(obj, (list, tuple)):
+        return tuple(_signature(value) for value in obj)
+    if isinstance(obj, dict):
+        return tuple((key, _signature(obj[key])) for key in sorted(obj))
+    if isinstance(obj, (bool, int, float, str)) or obj is None:
+        return obj
+    return type(obj).__name__
+
+
+class ThroughputReport(extension.Extension):
+    """An extension to report the throughput and the FLOP utilization.
+
+    The inputs of the forward calls of ``model`` in training mode are
+    observed to count the samples (and optionally the tokens) processed in
+    each iteration. The number of floating point operations of the forward
+    calls is counted with :class:`torch.utils.flop_counter.FlopCounterMode`
+    during the first iteration with a given input signature (the shapes
+    and dtypes of the inputs of the first forward call of the iteration),
+    and is reused for later iterations with the same signature. The
+    counter is only active during each forward call, and the FLOPs of all
+    the forward calls of the iteration are summed. The FLOPs of the
+    backward pass, which runs outside of the forward calls, are estimated
+    as ``backward_flops_ratio`` times the forward FLOPs.
+
+    The following values are reported at every iteration:
+
+    * ``throughput/samples_per_second``
+    * ``throughput/tokens_per_second``, if ``tokens_fn`` is given.
+    * ``throughput/flops``: FLOPs of the iteration.
+    * ``throughput/flops_per_second``
+    * ``throughput/mfu``: Model FLOP utilization, the ratio of the
+      achieved FLOP/s to ``peak_flops``, if given.
+
+    The time of an iteration is measured between two calls of this
+    extension, so that it includes the data loading time. As the
+    iterations whose FLOPs are counted are slowed down by the counter,
+    only ``throughput/flops`` is reported for them.
+
+    Args:
+        model (torch.nn.Module): Model to observe.
+        batch_size_fn (callable): Function returning the number of samples
+            from the inputs of a forward call, given as a tuple of the
+            positional and keyword arguments. Defaults to the size of the
+            first dimension of the first tensor of the inputs.
+        tokens_fn (callable): Function returning the number of tokens from
+            the inputs of a forward call, optional.
+        count_flops (bool): If ``True``, the FLOPs are counted. This
+            requires PyTorch 2.1 or later, while the other values only
+            require PyTorch 2.0.
+        peak_flops (float): Peak FLOP/s of the device running the model,
+            used to compute the utilization, optional.
+        backward_flops_ratio (float): Ratio of the FLOPs of the backward
+            pass to those of the forward pass. The default of ``2`` holds
+            for matrix multiplications whose inputs and weights both need
+            gradients.
+    """
+
+    trigger = 1, "iteration"
+    priority = extension.PRIORITY_WRITER
+    default_name = "throughput_report"
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        batch_size_fn: Optional[Callable[[_Inputs], int]] = None,
+        tokens_fn: Optional[Callable[[_Inputs], int]] = None,
+        count_flops: bool = True,
+        peak_flops: Optional[float] = None,
+        backward_flops_ratio: float = 2.0,
+    ):
+        if not requires("2.0.0"):
+            raise RuntimeError("ThroughputReport requires PyTorch 2.0 or later")
+        if count_flops and not requires("2.1.0"):
+            raise RuntimeError("count_flops requires PyTorch 2.1 or later")
+        if peak_flops is not None and not count_flops:
+            raise ValueError("peak_flops requires count_flops")
+        self._batch_size_fn = batch_size_fn or _default_batch_size
+        self._tokens_fn = tokens_fn
+        self._count_flops = count_flops
+        self._peak_flops = peak_flops
+        self._backward_flops_ratio = backward_flops_ratio
+
+        self._samples = 0
+        self._tokens = 0
+        self._last_time: Optional[float] = None
+        self._signature: Optional[Hashable] = None
+        self._flops: Dict[Hashable, int] = {}
+        # Whether the FLOPs of the forward calls of the iteration are
+        # counted, and their sum so far
+        self._counting = False
+        self._forward_flops = 0
+        self._counter: Any = None
+        self._handles = [
+            model.register_forward_pre_hook(self._pre_forward, with_kwargs=True)
+        ]
+        if count_flops:
+            self._handles.append(
+                model.register_forward_hook(
+                    self._post_forward, always_call=True
+                )
+            )
+
+    def _pre_forward(
+        self,
+        module: torch.nn.Module,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+    ) -> None:
+        # Forward calls of the evaluation are ignored
+        if not module.training:
+            return
+        inputs = (args, kwargs)
+        self._samples += self._batch_size_fn(inputs)
+        if self._tokens_fn is not None:
+            self._tokens += self._tokens_fn(inputs)
+        if self._count_flops and self._signature is None:
+            self._signature = _signature(inputs)
+            self._counting = self._signature not in self._flops
+        if self._counting and self._counter is None:
+            from torch.utils.flop_counter import FlopCounterMode
+
+            # Exited by ``_post_forward`` so that user code is not counted
+            self._counter = FlopCounterMode(display=False)
+            self._counter.__enter__()
+
+    def _post_forward(
+        self, module: torch.nn.Module, args: Tuple[Any, ...], output: Any
+    ) -> None:
+        self._stop_counter()
+
+    def _stop_counter(self) -> None:
+        if self._counter is None:
+            return
+        counter, self._counter = self._counter, None
+        counter.__exit__(None, None, None)
+        self._forward_flops += counter.get_total_flops()
+
+    def _reset(self) -> None:
+        self._samples = 0
+        self._tokens = 0
+        self._signature = None
+        self._counting = False
+        self._forward_flops = 0
+
+    def initialize(self, manager: ExtensionsManagerProtocol) -> None:
+        self._last_time = time.perf_counter()
+
+    def __call__(self, manager: ExtensionsManagerProtocol) -> None:
+        counted = self._counting
+        if counted:
+            self._flops[self._signature] = int(
+                self._forward_flops * (1 + self._backward_flops_ratio)
+            )
+        now = time.perf_counter()
+        assert self._last_time is not None
+        elapsed = now - self._last_time
+        self._last_time = now
+
+        values: Dict[str, float] = {}
+        if self._signature is not None:
+            values["throughput/flops"] = self._flops[self._signature]
+        # The rates of an iteration run under the FLOP counter are not
+        # representative of the training
+        if not counted:
+            values["throughput/samples_per_second"] = self._samples / elapsed
+            if self._tokens_fn is not None:
+                values["throughput/tokens_per_second"] = self._tokens / elapsed
+            if self._signature is not None:
+                flops_per_second = values["throughput/flops"] / elapsed
+                values["throughput/flops_per_second"] = flops_per_second
+                if self._peak_flops is not None:
+                    values["throughput/mfu"] = (
+                        flops_per_second / self._peak_flops
+                    )
+        reporting.report(values)
+        self._reset()
+
+    def on_error(
+        self,
+        manager: ExtensionsManagerProtocol,
+        exc: Exception,
+        tb: types.TracebackType,
+    ) -> None:
+        self._stop_counter()
+        self._reset()
+
+    def finalize(self, manager: ExtensionsManagerProtocol) -> None:
+        for handle in self._handles:
+            handle.remove()
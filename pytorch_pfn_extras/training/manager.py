@@ -17,7 +17,7 @@ from typing import (
 import pytorch_pfn_extras
 import torch
 from pytorch_pfn_extras import reporting, writing
-from pytorch_pfn_extras.profiler import record
+from pytorch_pfn_extras.profiler import record, sampling_step
 from pytorch_pfn_extras.training import StateObjectProtocol
 from pytorch_pfn_extras.training import _util as util_module
 from pytorch_pfn_extras.training import extension as extension_module
@@ -642,6 +642,7 @@ class ExtensionsManager(_BaseExtensionsManager):
         if self._start_time is None:
             self._start_time = _get_time()
             self.start_extensions()
+            sampling_step(self.iteration)
 
         step_optimizers_names: Sequence[str] = []
         if step_optimizers is not None:
@@ -662,6 +663,8 @@ class ExtensionsManager(_BaseExtensionsManager):
             except Exception as e:
                 self._run_on_error(e)
                 raise
+        # Decide whether the next iteration is profiled
+        sampling_step(self.iteration)
 
         if self._internal_stop_trigger(self):
             self.finalize()
@@ -748,6 +751,8 @@ class IgniteExtensionsManager(_BaseExtensionsManager):
             self.observation = {}
             self.cm = self.reporter.scope(self.observation)
             self.cm.__enter__()
+            # The iteration count of the engine is already increased
+            sampling_step(engine.state.iteration - 1)
 
         @self.engine.on(Events.STARTED)
         def set_training_started(engine: Engine) -> None:
@@ -1,3 +1,4 @@
+from pytorch_pfn_extras.writing._jsonl_writer import JsonLinesWriter  # NOQA
 from pytorch_pfn_extras.writing._parallel_writer import ProcessWriter  # NOQA
 from pytorch_pfn_extras.writing._parallel_writer import ThreadWriter  # NOQA
 from pytorch_pfn_extras.writing._queue_writer import ProcessQueueWriter  # NOQA
@@ -0,0 +1,260 @@
+import io
+import json
+import os
+import time
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional
+
+from pytorch_pfn_extras.writing._writer_base import (
+    Writer,
+    _FileSystem,
+    _SaveFun,
+    _TargetType,
+)
+
+
+def _list_segments(fs: _FileSystem, path: str) -> List[int]:
+    dirname, basename = os.path.split(path)
+    if not fs.isdir(dirname or "."):
+        return []
+    prefix = basename + "."
+    segments = []
+    for name in fs.list(dirname or "."):
+        suffix = name[len(prefix) :]
+        if name.startswith(prefix) and suffix.isdigit():
+            segments.append(int(suffix))
+    return sorted(segments)
+
+
+class _Stream:
+    def __init__(
+        self,
+        fs: _FileSystem,
+        path: str,
+        buffer_size: int,
+    ) -> None:
+        self._fs = fs
+        self.path = path
+        self._buffer_size = buffer_size
+        segments = _list_segments(fs, path)
+        self.segment = segments[-1] if segments else 0
+        self.size = 0
+        self.last_sync = time.time()
+        self._file: Optional[IO[Any]] = None
+        self.open()
+
+    def segment_path(self, segment: int) -> str:
+        return "{}.{}".format(self.path, segment)
+
+    @property
+    def file(self) -> IO[Any]:
+        assert self._file is not None
+        return self._file
+
+    def open(self) -> None:
+        self._file = self._fs.open(self.path, "ab", self._buffer_size)
+        self.size = self._fs.stat(self.path).size
+
+    def flush(self, fsync: bool = False) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        if fsync:
+            try:
+                os.fsync(self._file.fileno())
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                # File objects of non-POSIX filesystems may not expose
+                # a file descriptor.
+                pass
+            self.last_sync = time.time()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush(fsync=True)
+            self._file.close()
+            self._file = None
+
+
+class JsonLinesWriter(Writer):
+    """Writer that streams log entries to JSON Lines files.
+
+    Unlike the other writers, which serialize and rewrite the whole ``target``
+    on every call, this writer keeps the destination file open and only
+    appends the entries given to it. Writes are buffered and the file is
+    flushed and ``fsync``-ed at most once every ``fsync_interval`` seconds.
+
+    When ``max_bytes`` is given, the file is rotated once it grows beyond
+    that size: the current file is renamed to ``<filename>.<n>`` (``n`` is
+    increasing from ``1``) and a new file is started. The entries written
+    so far can be read back in order with :meth:`read`. The entries written
+    after a position returned by :meth:`tell` can be dropped with
+    :meth:`truncate`, e.g. when resuming from a snapshot.
+
+    This writer is meant to be passed to
+    :class:`~pytorch_pfn_extras.training.extensions.LogReport` via its
+    ``writer`` argument, which makes the log report stream each entry
+    instead of keeping the whole log in memory.
+
+    Args:
+        fs: FileSystem abstracting interface to implement all the operations.
+            optional, defaults to None
+        out_dir: str. Specifies the directory this writer will use.
+            It takes precedence over the one specified in `__call__`
+            optional, defaults to ``''``
+        buffer_size (int): Size of the write buffer in bytes.
+        fsync_interval (float): Minimum interval in seconds between two
+            ``fsync`` calls. If ``0``, the file is synced on every call.
+        max_bytes (int, optional): File size in bytes that triggers the
+            rotation. If ``None``, files are never rotated.
+        backup_count (int, optional): Number of rotated files to keep.
+            Older ones are removed. If ``None``, all the files are kept.
+    """
+
+    def __init__(
+        self,
+        fs: _FileSystem = None,
+        out_dir: str = "",
+        *,
+        buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+        fsync_interval: float = 60.0,
+        max_bytes: Optional[int] = None,
+        backup_count: Optional[int] = None,
+    ) -> None:
+        super().__init__(fs=fs, out_dir=out_dir)
+        self._streams: Dict[str, _Stream] = {}
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        if backup_count is not None and backup_count < 0:
+            raise ValueError("backup_count must not be negative")
+        self._buffer_size = buffer_size
+        self._fsync_interval = fsync_interval
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+
+    def __call__(
+        self,
+        filename: str,
+        out_dir: str,
+        target: _TargetType,
+        *,
+        savefun: Optional[_SaveFun] = None,
+        append: bool = False,
+    ) -> None:
+        """Appends the entries to the file.
+
+        Args:
+            filename (str): Name of the file to append the entries to.
+            out_dir: Ignored.
+            target (dict or list): An entry or a list of entries to append.
+                Every entry is written as a single line.
+            savefun: Ignored.
+            append: Ignored. Entries are always appended.
+        """
+        if isinstance(target, Mapping):
+            entries: List[Any] = [target]
+        else:
+            entries = list(target)
+        stream = self._get_stream(filename)
+        data = "".join([json.dumps(entry) + "\n" for entry in entries])
+        encoded = data.encode("ascii")
+        stream.file.write(encoded)
+        stream.size += len(encoded)
+        if self._max_bytes is not None and stream.size >= self._max_bytes:
+            self._rotate(stream)
+        elif time.time() - stream.last_sync >= self._fsync_interval:
+            stream.flush(fsync=True)
+        self._post_save()
+
+    def _get_stream(self, filename: str) -> _Stream:
+        stream = self._streams.get(filename)
+        if stream is None:
+            if not self._initialized:
+                self.initialize(self.out_dir)
+            path = os.path.join(self.out_dir, filename)
+            self.fs.makedirs(os.path.dirname(path), exist_ok=True)
+            stream = _Stream(self.fs, path, self._buffer_size)
+            self._streams[filename] = stream
+        return stream
+
+    def _rotate(self, stream: _Stream) -> None:
+        stream.close()
+        stream.segment += 1
+        self.fs.rename(stream.path, stream.segment_path(stream.segment))
+        if self._backup_count is not None:
+            for segment in _list_segments(self.fs, stream.path):
+                if segment <= stream.segment - self._backup_count:
+                    self.fs.remove(stream.segment_path(segment))
+        stream.open()
+
+    def files(self, filename: str) -> List[str]:
+        """Returns the paths holding the entries of ``filename``.
+
+        The paths are ordered from the oldest to the newest one.
+        """
+        path = os.path.join(self.out_dir, filename)
+        paths = [
+            "{}.{}".format(path, segment)
+            for segment in _list_segments(self.fs, path)
+        ]
+        if self.fs.exists(path):
+            paths.append(path)
+        return paths
+
+    def read(self, filename: str) -> Iterator[Dict[str, Any]]:
+        """Iterates over the entries written to ``filename`` so far.
+
+        Pending buffered writes are flushed before reading. Entries of
+        rotated files that have not been removed are included.
+        """
+        stream = self._streams.get(filename)
+        if stream is not None:
+            stream.flush()
+        for path in self.files(filename):
+            with self.fs.open(path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def tell(self, filename: str) -> Dict[str, int]:
+        """Returns the position of the end of ``filename``.
+
+        The position is made of the number of rotated files and the size of
+        the current file, including the entries not flushed yet.
+        """
+        stream = self._streams.get(filename)
+        if stream is not None:
+            return {"segment": stream.segment, "size": stream.size}
+        path = os.path.join(self.out_dir, filename)
+        segments = _list_segments(self.fs, path)
+        size = self.fs.stat(path).size if self.fs.exists(path) else 0
+        return {"segment": segments[-1] if segments else 0, "size": size}
+
+    def truncate(self, filename: str, position: Mapping[str, int]) -> None:
+        """Drops the entries written to ``filename`` after ``position``.
+
+        Args:
+            filename (str): Name of the file.
+            position (dict): Position returned by :meth:`tell`.
+        """
+        stream = self._streams.pop(filename, None)
+        if stream is not None:
+            stream.close()
+        path = os.path.join(self.out_dir, filename)
+        for segment in _list_segments(self.fs, path):
+            if segment == position["segment"] + 1:
+                # The file was rotated after the position was taken
+                self.fs.rename("{}.{}".format(path, segment), path)
+            elif segment > position["segment"]:
+                self.fs.remove("{}.{}".format(path, segment))
+        if self.fs.exists(path) and self.fs.stat(path).size > position["size"]:
+            with self.fs.open(path, "rb+") as f:
+                f.truncate(position["size"])
+
+    def flush(self) -> None:
+        """Flushes and syncs all the open files."""
+        for stream in self._streams.values():
+            stream.flush(fsync=True)
+
+    def finalize(self) -> None:
+        for stream in self._streams.values():
+            stream.close()
+        self._streams.clear()
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import torch
+from pytorch_pfn_extras.dataset import tabular
+from pytorch_pfn_extras_tests.dataset_tests.tabular_tests import (  # NOQA
+    dummy_dataset,
+)
+
+
+@pytest.mark.parametrize("mode", [tuple, dict, None])
+def test_batched_dataset(mode):
+    calls = []
+
+    def callback(indices, key_indices):
+        calls.append(indices)
+
+    dataset = dummy_dataset.DummyDataset(mode=mode, callback=callback)
+    batched = tabular.BatchedDataset(dataset)
+    assert len(batched) == len(dataset)
+
+    batch = batched[[4, 0, 7]]
+    assert calls == [[4, 0, 7]]
+    expected = dataset.data[:, [4, 0, 7]]
+    if mode is tuple:
+        outputs = batch
+    elif mode is dict:
+        assert list(batch.keys()) == ["a", "b", "c"]
+        outputs = tuple(batch.values())
+    elif mode is None:
+        outputs = (batch,)
+    for out, exp in zip(outputs, expected):
+        assert isinstance(out, np.ndarray)
+        np.testing.assert_equal(out, exp)
+
+
+def test_batched_dataset_convert():
+    dataset = dummy_dataset.DummyDataset(convert=True)
+    assert tabular.BatchedDataset(dataset)[[1, 2]] == "converted"
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+@pytest.mark.parametrize("drop_last", [False, True])
+def test_create_batched_loader(num_workers, drop_last):
+    calls = []
+
+    def callback(indices, key_indices):
+        calls.append(indices)
+
+    dataset = dummy_dataset.DummyDataset(mode=dict, callback=callback)
+    loader = tabular.create_batched_loader(
+        dataset, batch_size=4, drop_last=drop_last, num_workers=num_workers
+    )
+    batches = list(loader)
+    assert len(batches) == len(loader) == (2 if drop_last else 3)
+    expected = torch.tensor(dataset.data)
+    for i, batch in enumerate(batches):
+        for j, key in enumerate(("a", "b", "c")):
+            assert isinstance(batch[key], torch.Tensor)
+            assert torch.allclose(batch[key], expected[j, i * 4 : i * 4 + 4])
+    if num_workers == 0:
+        # A single fetch per batch
+        assert len(calls) == len(batches)
+
+
+def test_create_batched_loader_shuffle():
+    dataset = tabular.from_data(np.arange(20))
+    loader = tabular.create_batched_loader(dataset, batch_size=8, shuffle=True)
+    indices = torch.cat(list(loader))
+    assert sorted(indices.tolist()) == list(range(20))
+
+    with pytest.raises(ValueError):
+        tabular.create_batched_loader(
+            dataset,
+            batch_size=8,
+            shuffle=True,
+            sampler=torch.utils.data.SequentialSampler(dataset),
+        )
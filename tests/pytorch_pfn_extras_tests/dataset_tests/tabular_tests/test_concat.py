@@ -1,5 +1,4 @@
 import itertools
-import operator
 
 import numpy as np
 import pytest
@@ -73,9 +72,10 @@ def test_concat(mode_a, mode_b, return_array, parameter_set):
 
     for out, d in itertools.zip_longest(output, data):
         np.testing.assert_equal(out, d)
-        if return_array and operator.xor(
-            ("expected_indices_a" in parameter_set),
-            ("expected_indices_b" in parameter_set),
+        # Arrays are concatenated as arrays
+        if return_array and (
+            ("expected_indices_a" in parameter_set)
+            or ("expected_indices_b" in parameter_set)
         ):
             assert isinstance(out, np.ndarray)
         else:
@@ -98,3 +98,29 @@ def test_concat_key_order():
 
     with pytest.raises(ValueError):
         dataset_a.concat(dataset_b)
+
+
+def test_concat_many_datasets():
+    datasets = [
+        ppe.dataset.tabular.from_data(
+            ("a", np.arange(i * 10, (i + 1) * 10))
+        )
+        for i in range(5)
+    ]
+    view = datasets[0].concat(*datasets[1:])
+    indices = [42, 3, 17, 49, 3, 25, 0]
+
+    output = view.get_examples(indices, None)
+    assert isinstance(output[0], np.ndarray)
+    np.testing.assert_equal(output[0], indices)
+    np.testing.assert_equal(view.slice[indices].fetch(), indices)
+    output = view.get_examples(slice(45, 5, -7), None)
+    np.testing.assert_equal(output[0], [45, 38, 31, 24, 17, 10])
+
+def test_concat_out_of_bounds():
+    dataset_a = dummy_dataset.DummyDataset()
+    dataset_b = dummy_dataset.DummyDataset(size=5)
+    view = dataset_a.concat(dataset_b)
+
+    with pytest.raises(IndexError):
+        view.get_examples([3, 15], None)
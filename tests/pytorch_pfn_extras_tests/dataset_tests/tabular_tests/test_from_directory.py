@@ -0,0 +1,145 @@
+import importlib
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pytest
+import pytorch_pfn_extras as ppe
+from pytorch_pfn_extras.dataset import tabular
+from pytorch_pfn_extras_tests.dataset_tests.tabular_tests import (  # NOQA
+    dummy_dataset,
+)
+
+_from_directory = importlib.import_module(
+    "pytorch_pfn_extras.dataset.tabular.from_directory"
+)
+
+
+@pytest.mark.parametrize("mode", [tuple, dict, None])
+@pytest.mark.parametrize("return_array", [True, False])
+def test_save_and_load(mode, return_array):
+    dataset = dummy_dataset.DummyDataset(mode=mode, return_array=return_array)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.save(tmpdir)
+        loaded = tabular.from_directory(tmpdir)
+
+        assert isinstance(loaded, ppe.dataset.TabularDataset)
+        assert len(loaded) == len(dataset)
+        assert loaded.keys == dataset.keys
+        assert loaded.mode == dataset.mode
+        for indices in [None, [3, 1, 3], slice(8, 1, -2), []]:
+            for key_indices in [None, (0,), ()]:
+                output = loaded.get_examples(indices, key_indices)
+                expected = dataset.get_examples(indices, key_indices)
+                assert len(output) == len(expected)
+                for out, exp in zip(output, expected):
+                    assert isinstance(out, np.ndarray)
+                    np.testing.assert_equal(out, exp)
+        assert isinstance(loaded.get_examples(None, None)[0], np.memmap)
+
+
+def test_save_ragged():
+    dataset = tabular.from_data(
+        {
+            "scalar": np.arange(4),
+            "sequence": [[1, 2], [], [3], [4, 5, 6]],
+            "image": [np.full((n, 2), n, np.float32) for n in (1, 3, 0, 2)],
+            "text": ["a", "bc", "", "def"],
+        }
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.save(tmpdir)
+        loaded = tabular.from_directory(tmpdir)
+
+        output = loaded.get_examples([3, 1], None)
+        np.testing.assert_equal(output[0], [3, 1])
+        assert isinstance(output[1], list)
+        np.testing.assert_equal(output[1], [[4, 5, 6], []])
+        assert output[1][0].dtype == np.int64
+        assert [out.shape for out in output[2]] == [(2, 2), (3, 2)]
+        assert output[2][1].dtype == np.float32
+        np.testing.assert_equal(output[3], ["def", "bc"])
+
+        examples = loaded.slice[1:3].fetch()["sequence"]
+        np.testing.assert_equal(examples, [[], [3]])
+
+
+def test_save_by_chunks(monkeypatch):
+    monkeypatch.setattr(_from_directory, "_CHUNK_SIZE", 2)
+    image = np.arange(20, dtype=np.float32).reshape(5, 2, 2)
+    dataset = tabular.from_data(
+        {
+            "promoted": [1, 2, 3.5, 4, 5],
+            "ragged": [[1, 2], [3, 4], [5], [6, 7, 8], []],
+            "ragged_promoted": [[1], [2, 3], [4.5], [], [6, 7]],
+            "image": image,
+        }
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.save(tmpdir)
+        # No temporary file is left
+        for name in os.listdir(tmpdir):
+            assert name.endswith((".npy", ".json"))
+        loaded = tabular.from_directory(tmpdir)
+        output = loaded.get_examples(None, None)
+        assert output[0].dtype == np.float64
+        np.testing.assert_equal(output[0], [1, 2, 3.5, 4, 5])
+        assert isinstance(output[1], list)
+        np.testing.assert_equal(
+            output[1], [[1, 2], [3, 4], [5], [6, 7, 8], []]
+        )
+        assert output[2][2].dtype == np.float64
+        np.testing.assert_equal(output[2], [[1], [2, 3], [4.5], [], [6, 7]])
+        assert isinstance(output[3], np.memmap)
+        np.testing.assert_equal(output[3], image)
+
+
+def test_save_empty():
+    dataset = tabular.from_data({"a": np.zeros((0, 3), dtype=np.float32)})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.save(tmpdir)
+        loaded = tabular.from_directory(tmpdir)
+        assert len(loaded) == 0
+        assert loaded.get_examples(None, None)[0].shape == (0, 3)
+
+
+def test_slice_join_concat():
+    dataset = dummy_dataset.DummyDataset(return_array=True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.slice[:, ("a", "b")].save(tmpdir + "/ab")
+        dataset.slice[:, ("c",)].save(tmpdir + "/c")
+        ab = tabular.from_directory(tmpdir + "/ab")
+        c = tabular.from_directory(tmpdir + "/c")
+
+        joined = ab.join(c)
+        np.testing.assert_equal(
+            joined.get_examples([2, 7], None),
+            dataset.get_examples([2, 7], None),
+        )
+        concatenated = ab.concat(ab)
+        np.testing.assert_equal(
+            concatenated.slice[8:12].fetch(),
+            tuple(
+                np.concatenate((col[8:], col[:2]))
+                for col in dataset.data[:2]
+            ),
+        )
+
+
+def test_pickle():
+    dataset = dummy_dataset.DummyDataset(return_array=True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dataset.save(tmpdir)
+        loaded = tabular.from_directory(tmpdir)
+        data = pickle.dumps(loaded)
+        # The data is not copied
+        assert len(data) < dataset.data.nbytes
+        unpickled = pickle.loads(data)
+        np.testing.assert_equal(unpickled.fetch(), loaded.fetch())
+
+
+def test_from_directory_missing():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(FileNotFoundError):
+            tabular.from_directory(tmpdir)
@@ -0,0 +1,135 @@
+import importlib
+import os
+import tempfile
+
+import numpy as np
+import pytest
+from pytorch_pfn_extras_tests.dataset_tests.tabular_tests import (  # NOQA
+    dummy_dataset,
+)
+
+
+def _transformed(dataset, calls):
+    def transform(a, b, c):
+        calls.append(a)
+        return a + b, [c, c]
+
+    return dataset.transform(
+        ("ab", "cc"), [((("a", "b", "c"), ("ab", "cc")), transform)]
+    )
+
+
+@pytest.mark.parametrize("mode", [tuple, dict, None])
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_materialize(mode, on_disk):
+    dataset = dummy_dataset.DummyDataset(
+        mode=mode, return_array=True, convert=True
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = tmpdir if on_disk else None
+        view = dataset.materialize(path)
+        assert view.keys == dataset.keys
+        assert view.mode == dataset.mode
+        assert len(view) == len(dataset)
+        for indices in [None, [3, 1], slice(2, 8, 3)]:
+            for out, expected in zip(
+                view.get_examples(indices, None),
+                dataset.get_examples(indices, None),
+            ):
+                np.testing.assert_equal(out, expected)
+        assert view[4] == dataset[4]
+        assert view.convert(view.fetch()) == "converted"
+        if on_disk:
+            assert os.path.exists(os.path.join(tmpdir, "meta.json"))
+
+
+def test_materialize_transform_once():
+    calls = []
+    view = _transformed(dummy_dataset.DummyDataset(), calls)
+    cached = view.materialize()
+    assert len(calls) == 10
+
+    expected = view.get_examples(None, None)
+    calls.clear()
+    for _ in range(2):
+        output = cached.get_examples(None, None)
+        np.testing.assert_equal(output, expected)
+        cached.get_examples([2, 5], (1,))
+    assert len(calls) == 0
+
+
+def test_materialize_keys():
+    calls = []
+    view = _transformed(dummy_dataset.DummyDataset(), calls)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cached = view.materialize(tmpdir, keys="ab")
+        expected = view.get_examples([1, 3], None)
+        calls.clear()
+        output = cached.get_examples([1, 3], (0,))
+        assert len(calls) == 0
+        np.testing.assert_equal(output, expected[:1])
+        # The other columns are still computed
+        output = cached.get_examples([1, 3], None)
+        assert len(calls) == 2
+        np.testing.assert_equal(output, expected)
+
+
+def test_materialize_version():
+    calls = []
+    dataset = dummy_dataset.DummyDataset()
+    view = _transformed(dataset, calls)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        view.materialize(tmpdir, version="v1")
+        assert len(calls) == 10
+
+        # The stored columns are reused with the same version
+        cached = view.materialize(tmpdir, version="v1")
+        assert len(calls) == 10
+        assert isinstance(cached.get_examples(None, (1,))[0], np.memmap)
+
+        dataset.data[0] += 1
+        cached = view.materialize(tmpdir, version="v2")
+        assert len(calls) == 20
+        np.testing.assert_equal(
+            cached.get_examples(None, None), view.get_examples(None, None)
+        )
+
+
+def test_materialize_by_chunks(monkeypatch):
+    _from_directory = importlib.import_module(
+        "pytorch_pfn_extras.dataset.tabular.from_directory"
+    )
+    monkeypatch.setattr(_from_directory, "_CHUNK_SIZE", 3)
+    fetched = []
+    calls = []
+    dataset = dummy_dataset.DummyDataset(
+        callback=lambda indices, key_indices: fetched.append(indices)
+    )
+    view = _transformed(dataset, calls)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cached = view.materialize(tmpdir)
+        # The columns are computed together, by chunks of examples
+        assert fetched == [
+            slice(start, start + 3) for start in range(0, 10, 3)
+        ]
+        assert len(calls) == 10
+        np.testing.assert_equal(
+            cached.get_examples(None, None), view.get_examples(None, None)
+        )
+
+
+def test_materialize_invalid_column():
+    dataset = dummy_dataset.DummyDataset()
+
+    def transform(a, b, c):
+        return [a, [b]]
+
+    view = dataset.transform(
+        ("nested",), [((("a", "b", "c"), ("nested",)), transform)]
+    )
+    # Stored in memory as is
+    assert len(view.materialize()) == len(dataset)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            view.materialize(tmpdir)
+        assert not os.path.exists(os.path.join(tmpdir, "meta.json"))
@@ -95,3 +95,30 @@ class TestTabularDataset:
 
         with pytest.raises(StopIteration):
             next(it)
+
+
+@pytest.mark.parametrize("mode", [tuple, dict, None])
+@pytest.mark.parametrize("return_array", [True, False])
+@pytest.mark.parametrize(
+    "index, expected_indices",
+    [
+        (slice(1, 8, 3), [1, 4, 7]),
+        ([5, 0, 5], [5, 0, 5]),
+        (np.array([2, 9]), [2, 9]),
+        ([], []),
+    ],
+)
+def test_getitem_sequence(mode, return_array, index, expected_indices):
+    calls = []
+
+    def callback(indices, key_indices):
+        calls.append(indices)
+
+    dataset = dummy_dataset.DummyDataset(
+        mode=mode, return_array=return_array, callback=callback
+    )
+    output = dataset[index]
+
+    # The examples are fetched by a single call
+    assert len(calls) == 1
+    assert output == [dataset.get_example(i) for i in expected_indices]
@@ -1,4 +1,6 @@
 import itertools
+import multiprocessing
+import sys
 
 import numpy as np
 import pytest
@@ -248,3 +250,131 @@ class TestTransformInvalid:
         )
         with pytest.raises(ValueError):
             view.get_examples(None, None)
+
+
+@pytest.mark.parametrize("with_batch", [False, True])
+class TestTransformPlan:
+    def _view(self, dataset, with_batch):
+        def transform_alpha(c, a):
+            return {"alpha": c - a}
+
+        def transform_beta_gamma(b):
+            return {"beta": b * 2, "gamma": b * 3}
+
+        transforms = [
+            ((("c", "a"), ("alpha",)), transform_alpha),
+            ((("b",), ("beta", "gamma")), transform_beta_gamma),
+        ]
+        keys = ("alpha", "beta", "gamma")
+        if with_batch:
+            return dataset.transform_batch(keys, transforms)
+        else:
+            return dataset.transform(keys, transforms)
+
+    def test_inputs_and_outputs(self, with_batch):
+        dataset = dummy_dataset.DummyDataset(mode=dict, return_array=True)
+        view = self._view(dataset, with_batch)
+        a, b, c = dataset.data
+
+        output = view.get_examples(None, (2, 0, 2))
+        np.testing.assert_allclose(output[0], b * 3)
+        np.testing.assert_allclose(output[1], c - a)
+        np.testing.assert_allclose(output[2], b * 3)
+
+    def test_plan_cache(self, with_batch):
+        fetched = []
+
+        def callback(indices, key_indices):
+            fetched.append(key_indices)
+
+        dataset = dummy_dataset.DummyDataset(
+            mode=dict, return_array=True, callback=callback
+        )
+        view = self._view(dataset, with_batch)
+
+        view.get_examples([0, 1], (1,))
+        view.get_examples([2], (1,))
+        view.get_examples([2], (0, 1))
+        # Only the operands of the required transformations are fetched
+        assert fetched == [(1,), (1,), (0, 1, 2)]
+        assert len(view._plans) == 2
+        assert view._get_plan((1,)) is view._get_plan([1])
+
+
+def _transform_parallel(a, b, c):
+    return {"alpha": a + b, "beta": c * 2}
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+@pytest.mark.parametrize(
+    "indices", [None, [7, 1, 3, 1, 9, 0, 4], slice(8, None, -3), [2]]
+)
+def test_transform_num_workers(executor, indices):
+    dataset = dummy_dataset.DummyDataset(size=50)
+    d_transform = [((("a", "b", "c"), ("alpha", "beta")), _transform_parallel)]
+    expected = dataset.transform(("alpha", "beta"), d_transform)
+    view = dataset.transform(
+        ("alpha", "beta"), d_transform, num_workers=2, executor=executor
+    )
+
+    assert view.mode is dict
+    for key_indices in [None, (1,), (1, 0)]:
+        assert view.get_examples(indices, key_indices) == (
+            expected.get_examples(indices, key_indices)
+        )
+    assert view[3] == expected[3]
+
+
+def _get_examples_in_child(view, queue):
+    queue.put(view.get_examples(None, None))
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="fork is not available on Windows"
+)
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_transform_num_workers_fork(executor):
+    dataset = dummy_dataset.DummyDataset(size=50)
+    d_transform = [((("a", "b", "c"), ("alpha", "beta")), _transform_parallel)]
+    expected = dataset.transform(("alpha", "beta"), d_transform)
+    view = dataset.transform(
+        ("alpha", "beta"), d_transform, num_workers=2, executor=executor
+    )
+    # The pool is created in the parent before forking
+    assert view.get_examples(None, None) == expected.get_examples(None, None)
+
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_get_examples_in_child, args=(view, queue))
+    process.start()
+    try:
+        result = queue.get(timeout=30)
+    finally:
+        process.join(timeout=30)
+        if process.is_alive():
+            process.kill()
+    assert result == expected.get_examples(None, None)
+
+
+def test_transform_num_workers_inconsistent_mode():
+    def transform(a, b, c):
+        if a > 0.5:
+            return (a,)
+        return a
+
+    dataset = dummy_dataset.DummyDataset(size=50)
+    dataset.data[0, :] = np.arange(50) / 50
+    view = dataset.transform(
+        ("a",), [((("a", "b", "c"), ("a",)), transform)], num_workers=2
+    )
+    with pytest.raises(ValueError):
+        view.get_examples(None, None)
+
+
+def test_transform_num_workers_invalid():
+    dataset = dummy_dataset.DummyDataset()
+    d_transform = [((("a", "b", "c"), ("a",)), _transform_parallel)]
+    with pytest.raises(ValueError):
+        dataset.transform(("a",), d_transform, num_workers=-1)
+    with pytest.raises(ValueError):
+        dataset.transform(("a",), d_transform, executor="fiber")
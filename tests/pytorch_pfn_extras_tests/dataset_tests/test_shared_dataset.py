@@ -1,3 +1,8 @@
+import pickle
+import threading
+
+import numpy
+import pytest
 import pytorch_pfn_extras as ppe
 import torch
 
@@ -32,3 +37,465 @@ def test_shared_dataset():
         pass
     for i in range(100):
         assert dataset.is_cached(i)
+
+
+class DummyBoundedDataset(ppe.dataset.SharedDataset):
+    def __init__(self, n_slots, policy):
+        self.data = torch.arange(100, dtype=torch.float32).reshape(100, 1)
+        super().__init__(
+            self.data.shape,
+            cache_type=ppe.dataset.BoundedCache,
+            n_slots=n_slots,
+            policy=policy,
+        )
+
+    def __getitem__(self, idx):
+        try:
+            x = super().__getitem__(idx)
+        except ppe.dataset.ItemNotFoundException:
+            x = self.data[idx]
+            self.cache_item(idx, x)
+        return torch.as_tensor(x)
+
+    def __len__(self):
+        return len(self.data)
+
+
+@pytest.mark.parametrize("policy", ["clock", "lru"])
+def test_bounded_cache(policy):
+    dataset = DummyBoundedDataset(10, policy)
+    for i in range(100):
+        assert dataset[i].item() == i
+    assert sum(dataset.is_cached(i) for i in range(100)) == 10
+    assert all(dataset.is_cached(i) for i in range(90, 100))
+    assert dataset.cache.stats() == {
+        "hits": 0,
+        "misses": 100,
+        "evictions": 90,
+    }
+    for i in range(90, 100):
+        assert dataset[i].item() == i
+    assert dataset.cache.stats()["hits"] == 10
+
+
+def test_bounded_cache_lru():
+    dataset = DummyBoundedDataset(3, "lru")
+    for i in [0, 1, 2, 0, 3]:
+        dataset[i]
+    # 1 is the least recently used sample
+    assert [dataset.is_cached(i) for i in range(4)] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+
+
+def test_bounded_cache_clock():
+    dataset = DummyBoundedDataset(3, "clock")
+    for i in [0, 1, 2, 3, 1, 4]:
+        dataset[i]
+    # 3 evicts 0 after clearing all the reference bits, then 4 skips the
+    # referenced 1 and evicts 2
+    assert [dataset.is_cached(i) for i in range(5)] == [
+        False,
+        True,
+        False,
+        True,
+        True,
+    ]
+
+
+@pytest.mark.parametrize("policy", ["clock", "lru"])
+def test_bounded_cache_workers(policy):
+    dataset = DummyBoundedDataset(20, policy)
+    dataloader = torch.utils.data.DataLoader(
+        dataset, batch_size=5, num_workers=4, multiprocessing_context="fork"
+    )
+    for _ in range(2):
+        values = torch.cat(list(dataloader))
+        assert values.flatten().tolist() == list(range(100))
+    stats = dataset.cache.stats()
+    assert stats["hits"] + stats["misses"] == 200
+    assert stats["misses"] - stats["evictions"] == 20
+    assert sum(dataset.is_cached(i) for i in range(100)) == 20
+
+
+
+class CacheThenIndexDataset(ppe.dataset.SharedDataset):
+    def __init__(self, data, sm_size, **kwargs):
+        self.data = data
+        super().__init__(sm_size, **kwargs)
+
+    def __getitem__(self, idx):
+        if not self.is_cached(idx):
+            self.cache_item(idx, self.data[idx])
+        return super().__getitem__(idx)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def test_bounded_cache_rejected():
+    data = numpy.arange(10, dtype=numpy.float32).reshape(10, 1)
+    dataset = CacheThenIndexDataset(
+        data, data.shape, cache_type=ppe.dataset.BoundedCache, n_slots=2
+    )
+    dataset[0]
+    dataset[1]
+    # All the slots are being written by other processes
+    dataset.cache.versions[:] = 1
+    assert dataset[2].item() == 2
+    assert not dataset.is_cached(2)
+    with pytest.raises(ppe.dataset.ItemNotFoundException):
+        super(CacheThenIndexDataset, dataset).__getitem__(3)
+
+
+def test_bounded_cache_evicted_before_read():
+    data = numpy.arange(10, dtype=numpy.float32).reshape(10, 1)
+    dataset = CacheThenIndexDataset(
+        data, data.shape, cache_type=ppe.dataset.BoundedCache, n_slots=1
+    )
+    dataset.cache_item(4, data[4])
+    # Another worker evicts the sample before it is read
+    dataset.cache.add_to_cache(5, data[5])
+    assert not dataset.is_cached(4)
+    assert super(CacheThenIndexDataset, dataset).__getitem__(4).item() == 4
+
+def test_report_cache_stats():
+    dataset = DummyBoundedDataset(10, "clock")
+    dataset[0]
+    dataset[0]
+    reporter = ppe.reporting.Reporter()
+    observation = {}
+    with reporter.scope(observation):
+        dataset.report_cache_stats()
+    assert observation == {
+        "shared_dataset/hits": 1,
+        "shared_dataset/misses": 1,
+        "shared_dataset/evictions": 0,
+    }
+
+
+class DummyArenaDataset(ppe.dataset.SharedDataset):
+    def __init__(self, arena_size):
+        # Token sequences of variable length
+        self.data = [numpy.arange(i % 7, dtype=numpy.int32) for i in range(50)]
+        super().__init__(
+            len(self.data),
+            cache_type=ppe.dataset.ArenaCache,
+            arena_size=arena_size,
+        )
+
+    def __getitem__(self, idx):
+        try:
+            x = super().__getitem__(idx)
+        except ppe.dataset.ItemNotFoundException:
+            x = self.data[idx]
+            self.cache_item(idx, x)
+        return x
+
+    def __len__(self):
+        return len(self.data)
+
+
+def test_arena_cache():
+    dataset = DummyArenaDataset(1 << 16)
+    for i in range(50):
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+    assert all(dataset.is_cached(i) for i in range(50))
+    for i in range(50):
+        x = dataset[i]
+        assert x.dtype == numpy.int32
+        numpy.testing.assert_array_equal(x, dataset.data[i])
+        # Cached samples are views of the arena
+        assert x.size == 0 or numpy.shares_memory(x, dataset.cache.arena)
+
+
+def test_arena_cache_dtypes():
+    cache = ppe.dataset.ArenaCache(4, arena_size=1 << 12)
+    values = [
+        numpy.random.randint(0, 255, (3, 5, 2), dtype=numpy.uint8),
+        numpy.array(1.5, dtype=numpy.float16),
+        torch.tensor([[True, False]]),
+        numpy.array(["ab", "cde"]),
+    ]
+    for i, x in enumerate(values):
+        cache.add_to_cache(i, x)
+    for i, x in enumerate(values):
+        y = cache.get_value(i)
+        x = numpy.asarray(x)
+        assert y.dtype == x.dtype
+        assert y.shape == x.shape
+        numpy.testing.assert_array_equal(y, x)
+    with pytest.raises(ValueError):
+        cache.add_to_cache(0, numpy.array([object()]))
+
+
+def test_arena_cache_full():
+    dataset = DummyArenaDataset(256)
+    for i in range(50):
+        dataset[i]
+    cached = [i for i in range(50) if dataset.is_cached(i)]
+    assert 0 < len(cached) < 50
+    stats = dataset.cache.stats()
+    assert stats["used_bytes"] <= 256
+    assert stats["dropped"] == 50 - len(cached)
+    for i in cached:
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+
+
+def test_arena_cache_full_returns_dropped():
+    data = [numpy.full(i, i, dtype=numpy.int64) for i in range(20)]
+    dataset = CacheThenIndexDataset(
+        data, len(data), cache_type=ppe.dataset.ArenaCache, arena_size=256
+    )
+    for i in range(20):
+        numpy.testing.assert_array_equal(dataset[i], data[i])
+    assert not dataset.is_cached(19)
+    assert dataset.cache.stats()["dropped"] > 0
+
+
+def test_arena_cache_views():
+    cache = ppe.dataset.ArenaCache(2, arena_size=1 << 10)
+    cache.add_to_cache(0, numpy.arange(6, dtype=numpy.int16).reshape(2, 3))
+    # The header of a sample is parsed once by each process
+    assert cache.get_value(0) is cache.get_value(0)
+    assert cache.get_value(1) is None
+    cache.add_to_cache(1, numpy.ones(3))
+    numpy.testing.assert_array_equal(cache.get_value(1), numpy.ones(3))
+    assert cache.__getstate__()["_views"] == {}
+
+
+def test_arena_cache_workers():
+    dataset = DummyArenaDataset(1 << 16)
+    dataloader = torch.utils.data.DataLoader(
+        dataset,
+        batch_size=None,
+        num_workers=4,
+        multiprocessing_context="fork",
+    )
+    for i, x in enumerate(dataloader):
+        numpy.testing.assert_array_equal(x.numpy(), dataset.data[i])
+    assert all(dataset.is_cached(i) for i in range(50))
+    for i in range(50):
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+
+
+class DummyMemmapDataset(ppe.dataset.SharedDataset):
+    def __init__(self, path):
+        self.data = numpy.arange(200, dtype=numpy.uint8).reshape(100, 2)
+        self.loaded = 0
+        super().__init__(
+            self.data.shape,
+            cache_type=ppe.dataset.MemmapCache,
+            path=path,
+            dtype=numpy.uint8,
+        )
+
+    def __getitem__(self, idx):
+        try:
+            x = super().__getitem__(idx)
+        except ppe.dataset.ItemNotFoundException:
+            self.loaded += 1
+            x = self.data[idx]
+            self.cache_item(idx, x)
+        return x
+
+    def __len__(self):
+        return len(self.data)
+
+
+def test_memmap_cache(tmp_path):
+    path = str(tmp_path / "cache")
+    dataset = DummyMemmapDataset(path)
+    for i in range(50):
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+    assert dataset.loaded == 50
+    dataset.cache.flush()
+
+    # A new run starts with the samples cached by the previous one
+    dataset = DummyMemmapDataset(path)
+    cached = [dataset.is_cached(i) for i in range(100)]
+    assert cached == [True] * 50 + [False] * 50
+    for i in range(100):
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+    assert dataset.loaded == 50
+    assert dataset[0].dtype == numpy.uint8
+
+
+def test_memmap_cache_verify(tmp_path):
+    path = str(tmp_path / "cache")
+    dataset = DummyMemmapDataset(path)
+    for i in range(10):
+        dataset[i]
+    # Simulates a sample that was not written completely
+    dataset.cache.storage[3] = 0
+    dataset.cache.flush()
+    dataset = DummyMemmapDataset(path)
+    # The checksums are verified when the samples are read
+    assert all(dataset.is_cached(i) for i in range(10))
+    for i in range(10):
+        numpy.testing.assert_array_equal(dataset[i], dataset.data[i])
+    assert dataset.loaded == 1
+    assert all(dataset.is_cached(i) for i in range(10))
+
+    dataset.cache.storage[5] = 0
+    dataset.cache.flush()
+    cache = ppe.dataset.MemmapCache((100, 2), path, dtype=numpy.uint8)
+    cache.verify()
+    cached = [i for i in range(10) if cache.is_cached(i)]
+    assert cached == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+
+
+def test_memmap_cache_rewrite(tmp_path):
+    cache = ppe.dataset.MemmapCache(
+        (10, 2), str(tmp_path / "cache"), dtype=numpy.uint8
+    )
+    cache.add_to_cache(0, numpy.array([1, 2], dtype=numpy.uint8))
+    filled = []
+    storage = cache.storage
+
+    class Storage:
+        def __getitem__(self, idx):
+            return storage[idx]
+
+        def __setitem__(self, idx, x):
+            filled.append(int(cache.filled[idx]))
+            storage[idx] = x
+
+    cache.storage = Storage()
+    cache.add_to_cache(0, numpy.array([3, 4], dtype=numpy.uint8))
+    # The sample is not exposed while it is written again
+    assert filled == [0]
+    assert cache.is_cached(0)
+    cache.storage = storage
+    numpy.testing.assert_array_equal(cache.get_value(0), [3, 4])
+
+
+def test_memmap_cache_mismatch(tmp_path):
+    path = str(tmp_path / "cache")
+    ppe.dataset.MemmapCache((10, 2), path)
+    with pytest.raises(ValueError):
+        ppe.dataset.MemmapCache((10, 3), path)
+
+
+@pytest.mark.parametrize("context", ["fork", "spawn"])
+def test_memmap_cache_workers(tmp_path, context):
+    dataset = DummyMemmapDataset(str(tmp_path / "cache"))
+    dataloader = torch.utils.data.DataLoader(
+        dataset,
+        batch_size=10,
+        num_workers=2,
+        multiprocessing_context=context,
+    )
+    for i, x in enumerate(dataloader):
+        numpy.testing.assert_array_equal(
+            x.numpy(), dataset.data[i * 10 : (i + 1) * 10]
+        )
+    # The samples cached by the workers are visible to the main process
+    assert all(dataset.is_cached(i) for i in range(100))
+    assert dataset.loaded == 0
+
+
+def test_warmup():
+    dataset = DummySharedDataset()
+    dataset.warmup(lambda idx: dataset.data[idx], num_workers=2)
+    assert all(dataset.is_cached(i) for i in range(100))
+    for i in range(100):
+        assert dataset[i].item() == i
+
+
+def test_warmup_background():
+    dataset = DummySharedDataset()
+    result = dataset.warmup(
+        lambda idx: dataset.data[idx],
+        range(50),
+        num_workers=2,
+        background=True,
+    )
+    result.wait()
+    assert all(dataset.is_cached(i) for i in range(50))
+    assert not any(dataset.is_cached(i) for i in range(50, 100))
+    # The dataset can still be sent to the workers of a DataLoader
+    pickle.dumps(dataset)
+
+
+def test_warmup_without_len():
+    data = torch.arange(10).reshape(10, 1)
+    dataset = ppe.dataset.SharedDataset(data.shape)
+    dataset.warmup(lambda idx: data[idx], num_workers=0)
+    assert all(dataset.is_cached(i) for i in range(10))
+    assert dataset[3].item() == 3
+
+
+def test_warmup_local_ranks(tmp_path):
+    path = str(tmp_path / "cache")
+    datasets = [DummyMemmapDataset(path) for _ in range(2)]
+    result = datasets[1].warmup(
+        lambda idx: datasets[1].data[idx],
+        num_workers=2,
+        background=True,
+        local_rank=1,
+        local_world_size=2,
+    )
+    result.wait()
+    assert [datasets[0].is_cached(i) for i in range(4)] == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    datasets[0].warmup(
+        lambda idx: datasets[0].data[idx],
+        num_workers=2,
+        local_rank=0,
+        local_world_size=2,
+    )
+    # Each rank filled its part of the cache shared by the node
+    assert all(datasets[1].is_cached(i) for i in range(100))
+    for i in range(100):
+        numpy.testing.assert_array_equal(datasets[1][i], datasets[1].data[i])
+    assert datasets[1].loaded == 0
+
+
+def test_warmup_waits_for_local_ranks(tmp_path):
+    path = str(tmp_path / "cache")
+    dataset = DummyMemmapDataset(path)
+    with pytest.raises(TimeoutError):
+        dataset.warmup(
+            lambda idx: dataset.data[idx],
+            num_workers=0,
+            local_rank=1,
+            local_world_size=2,
+            timeout=0.2,
+        )
+    assert [dataset.is_cached(i) for i in range(100)] == [False, True] * 50
+
+    # Rank 0 completes the cache while rank 1 waits
+    other = DummyMemmapDataset(path)
+    thread = threading.Thread(
+        target=other.warmup,
+        args=(lambda idx: other.data[idx],),
+        kwargs={"num_workers": 0, "local_rank": 0, "local_world_size": 2},
+    )
+    thread.start()
+    dataset.wait_cached(timeout=10)
+    thread.join()
+    assert all(dataset.is_cached(i) for i in range(100))
+
+
+def test_warmup_process_cache_ignores_local_ranks(monkeypatch):
+    monkeypatch.setenv("LOCAL_RANK", "1")
+    monkeypatch.setenv("LOCAL_WORLD_SIZE", "2")
+    dataset = DummySharedDataset()
+    dataset.warmup(lambda idx: dataset.data[idx], num_workers=0)
+    # The cache is not shared with the other ranks
+    assert all(dataset.is_cached(i) for i in range(100))
+    with pytest.raises(ValueError):
+        dataset.warmup(
+            lambda idx: dataset.data[idx],
+            num_workers=0,
+            local_rank=1,
+            local_world_size=2,
+        )
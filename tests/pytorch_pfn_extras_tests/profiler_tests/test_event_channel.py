@@ -0,0 +1,155 @@
+import gc
+import json
+import multiprocessing as mp
+import pickle
+import sys
+import warnings
+from multiprocessing import resource_tracker
+
+import pytest
+import pytorch_pfn_extras as ppe
+import torch
+from pytorch_pfn_extras.profiler._event_channel import SharedMemoryEventChannel
+
+_fork_available = sys.platform != "win32"
+
+
+def _put_events(channel, worker_id, name_id, count):
+    for i in range(count):
+        channel.put(worker_id, name_id, i * 1000, 500)
+
+
+@pytest.mark.skipif(not _fork_available, reason="fork is not available")
+def test_channel_from_processes():
+    channel = SharedMemoryEventChannel(max_workers=2, capacity=16)
+    a = channel.register_name("a")
+    b = channel.register_name("b")
+    assert channel.register_name("a") == a
+    context = mp.get_context("fork")
+    procs = [
+        context.Process(target=_put_events, args=(channel, i, name_id, 10))
+        for i, name_id in enumerate([a, b])
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    events = channel.drain()
+    assert len(events) == 20
+    assert sorted(e["name"] for e in events) == ["a"] * 10 + ["b"] * 10
+    assert {e["pid"] for e in events} == {p.pid for p in procs}
+    assert all(e["dur"] == 0.5 for e in events)
+    assert channel.drain() == []
+    assert channel.dropped_count == 0
+    channel.close()
+
+
+def test_channel_overflow():
+    channel = SharedMemoryEventChannel(max_workers=1, capacity=4)
+    name_id = channel.register_name("a")
+    _put_events(channel, 0, name_id, 6)
+    with pytest.warns(UserWarning, match="2 trace events were dropped"):
+        events = channel.drain()
+    assert [e["ts"] for e in events] == [0, 1, 2, 3]
+    assert channel.dropped_count == 2
+    # The ring wraps around once drained
+    _put_events(channel, 0, name_id, 3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert len(channel.drain()) == 3
+    channel.close()
+
+
+def test_channel_attach_untracked(monkeypatch):
+    channel = SharedMemoryEventChannel(max_workers=1, capacity=4)
+    registered = []
+    monkeypatch.setattr(
+        resource_tracker, "register", lambda *args: registered.append(args)
+    )
+    # As done by workers started with spawn
+    attached = pickle.loads(pickle.dumps(channel))
+    assert registered == []
+    attached.put(0, channel.register_name("a"), 0, 500)
+    attached.close()
+    assert len(channel.drain()) == 1
+    channel.close()
+
+
+class _Dataset(torch.utils.data.Dataset):
+    def __len__(self):
+        return 100
+
+    def __getitem__(self, idx):
+        return idx
+
+
+@pytest.mark.skipif(not _fork_available, reason="fork is not available")
+def test_traceable_dataset_shared_memory():
+    tracer = ppe.profiler.ChromeTracer()
+    dataset = ppe.profiler.TraceableDataset(
+        _Dataset(), "getitem", tracer, max_workers=4
+    )
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=10, num_workers=4, multiprocessing_context="fork"
+    )
+    assert sum(int(x.sum()) for x in loader) == sum(range(100))
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert len(events) == 100
+    assert all(e["name"] == "getitem" for e in events)
+    tracer.finalize()
+
+
+@pytest.mark.skipif(not _fork_available, reason="fork is not available")
+@pytest.mark.parametrize(
+    "kwargs,n_events", [({"enable": False}, 0), ({"max_event_count": 30}, 30)]
+)
+def test_traceable_dataset_shared_memory_limits(kwargs, n_events):
+    tracer = ppe.profiler.ChromeTracer(**kwargs)
+    dataset = ppe.profiler.TraceableDataset(
+        _Dataset(), "getitem", tracer, max_workers=4
+    )
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=10, num_workers=1, multiprocessing_context="fork"
+    )
+    assert sum(int(x.sum()) for x in loader) == sum(range(100))
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert len(events) == n_events
+    tracer.finalize()
+
+
+def test_traceable_dataset_shared_memory_requires_chrome_tracer():
+    with pytest.raises(ValueError):
+        ppe.profiler.TraceableDataset(
+            _Dataset(),
+            "getitem",
+            ppe.profiler.RingBufferTracer(),
+            max_workers=4,
+        )
+
+
+def test_traceable_dataset_close():
+    tracer = ppe.profiler.ChromeTracer()
+    dataset = ppe.profiler.TraceableDataset(
+        _Dataset(), "getitem", tracer, max_workers=1
+    )
+    dataset._channel.put(0, 0, 0, 500)
+    dataset.close()
+    dataset.close()
+    assert len(tracer._event_channels) == 0
+    # The events not flushed yet are kept
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert [e["name"] for e in events] == ["getitem"]
+    assert dataset[3] == 3
+    tracer.finalize()
+
+
+def test_traceable_dataset_garbage_collected():
+    tracer = ppe.profiler.ChromeTracer()
+    dataset = ppe.profiler.TraceableDataset(
+        _Dataset(), "getitem", tracer, max_workers=1
+    )
+    assert len(tracer._event_channels) == 1
+    del dataset
+    gc.collect()
+    assert len(tracer._event_channels) == 0
+    tracer.finalize()
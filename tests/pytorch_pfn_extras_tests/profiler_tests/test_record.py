@@ -1,4 +1,6 @@
+import json
 import os
+import sys
 import tempfile
 import threading
 import time
@@ -292,3 +294,185 @@ def test_record_iterable_with_multiprocessing(device):
         # Check that the values were written by a dataloader worker
         for v in values:
             assert v["pid"] != pid
+
+
+def test_record_sampling_every():
+    tracer = ppe.profiler.ChromeTracer()
+    manager = ppe.training.ExtensionsManager(
+        {}, {}, max_epochs=1, iters_per_epoch=9
+    )
+    ppe.profiler.enable_sampling(3)
+    try:
+        while not manager.stop_trigger:
+            with manager.run_iteration():
+                with ppe.profiler.record("outer", trace=tracer):
+                    with ppe.profiler.record("inner", trace=tracer):
+                        pass
+    finally:
+        ppe.profiler.disable_sampling()
+    # Iterations 0, 3 and 6 are sampled, with both of their scopes
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert [e["name"] for e in events] == ["inner", "outer"] * 3
+    tracer.finalize()
+    assert ppe.profiler.is_sampled()
+
+
+def test_record_sampling_every_ignite():
+    try:
+        from ignite.engine import Engine
+    except ImportError:
+        pytest.skip("pytorch-ignite not found")
+
+    tracer = ppe.profiler.ChromeTracer()
+
+    def step(engine, batch):
+        with ppe.profiler.record("outer", trace=tracer):
+            with ppe.profiler.record("inner", trace=tracer):
+                pass
+
+    engine = Engine(step)
+    ppe.training.IgniteExtensionsManager(engine, {}, {}, max_epochs=1)
+    ppe.profiler.enable_sampling(3)
+    try:
+        engine.run(list(range(9)), max_epochs=1)
+    finally:
+        ppe.profiler.disable_sampling()
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert [e["name"] for e in events] == ["inner", "outer"] * 3
+    tracer.finalize()
+
+
+def test_record_sampling_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    ppe.profiler.enable_sampling(window=2, interval=10)
+    sampled = []
+    try:
+        for i in range(1, 30):
+            sampled.append(ppe.profiler.is_sampled())
+            now[0] += 1
+            ppe.profiler.sampling_step(i)
+    finally:
+        ppe.profiler.disable_sampling()
+    expected = [t % 10 < 2 for t in range(29)]
+    assert sampled == expected
+
+
+def test_record_sampling_invalid():
+    with pytest.raises(ValueError):
+        ppe.profiler.enable_sampling()
+    with pytest.raises(ValueError):
+        ppe.profiler.enable_sampling(0)
+    with pytest.raises(ValueError):
+        ppe.profiler.enable_sampling(2, window=1, interval=2)
+    with pytest.raises(ValueError):
+        ppe.profiler.enable_sampling(window=3, interval=2)
+
+
+def test_record_call_tree():
+    call_tree = ppe.profiler.enable_call_tree()
+    try:
+        for _ in range(2):
+            with ppe.profiler.record("outer", enable=False):
+                time.sleep(0.01)
+                with ppe.profiler.record("inner", enable=False):
+                    time.sleep(0.02)
+        with ppe.profiler.record("inner", enable=False):
+            pass
+    finally:
+        ppe.profiler.disable_call_tree()
+    with ppe.profiler.record("outer", enable=False):
+        pass
+
+    summary = call_tree.summary()
+    assert summary.keys() == {"outer", "outer/inner", "inner"}
+    outer = summary["outer"]
+    inner = summary["outer/inner"]
+    assert outer["count"] == 2
+    assert inner["count"] == 2
+    assert summary["inner"]["count"] == 1
+    assert inner["self"] == inner["total"]
+    assert outer["self"] == pytest.approx(outer["total"] - inner["total"])
+    assert inner["total"] >= 0.04
+    assert outer["self"] >= 0.02
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        call_tree.flush("profile.collapsed", writer)
+        with open(os.path.join(tmpdir, "profile.collapsed")) as f:
+            lines = f.read().splitlines()
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert set(stacks) <= {"outer", "outer;inner", "inner"}
+    assert int(stacks["outer;inner"]) >= 40000
+
+    call_tree.clear()
+    assert call_tree.summary() == {}
+
+
+def test_record_call_tree_threads():
+    call_tree = ppe.profiler.enable_call_tree()
+
+    def _worker():
+        with ppe.profiler.record("thread", enable=False):
+            with ppe.profiler.record("work", enable=False):
+                pass
+
+    try:
+        with ppe.profiler.record("main", enable=False):
+            threads = [threading.Thread(target=_worker) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+    finally:
+        ppe.profiler.disable_call_tree()
+    summary = call_tree.summary()
+    # Each thread has its own stack of scopes
+    assert summary.keys() == {"main", "thread", "thread/work"}
+    assert summary["thread/work"]["count"] == 4
+
+
+def test_record_memory():
+    tracer = ppe.profiler.ChromeTracer()
+    time_summary = ppe.profiler.get_time_summary()
+    time_summary.initialize()
+    with time_summary.summary(clear=True):
+        pass
+    ppe.profiler.enable_memory_profiling(trace_python=True)
+    try:
+        with ppe.profiler.record("alloc", enable=False, trace=tracer):
+            data = [0] * 1000000
+    finally:
+        ppe.profiler.disable_memory_profiling()
+    del data
+    with time_summary.summary(clear=True) as s:
+        means = s[0].compute_mean()
+        stats = dict(s[1])
+    # Memory changes are counters, not times
+    assert "alloc.mem.python" not in means
+    assert stats["alloc.mem.python.sum"] >= 8000000
+    assert stats["alloc.mem.python.min"] == stats["alloc.mem.python.sum"]
+    if sys.platform == "linux":
+        assert "alloc.mem.rss.sum" in stats
+
+    events = json.loads(tracer.state_dict()["_event_list"])
+    counters = [e for e in events if e["ph"] == "C"]
+    assert len(counters) == 1
+    assert counters[0]["name"] == "memory"
+    assert counters[0]["args"]["python"] >= 8000000
+    tracer.finalize()
+
+
+def test_record_memory_sampling():
+    tracer = ppe.profiler.ChromeTracer()
+    ppe.profiler.enable_memory_profiling(sample_every=4)
+    try:
+        for _ in range(8):
+            with ppe.profiler.record("tag", trace=tracer):
+                pass
+    finally:
+        ppe.profiler.disable_memory_profiling()
+    events = json.loads(tracer.state_dict()["_event_list"])
+    assert len([e for e in events if e["ph"] == "C"]) == 2
+    assert len([e for e in events if e["ph"] == "X"]) == 8
+    tracer.finalize()
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+
+import pytest
+import pytorch_pfn_extras as ppe
+
+
+def _trace(tracer, name):
+    with tracer.add_event(name):
+        pass
+
+
+def test_ring_buffer_tracer_in_memory():
+    tracer = ppe.profiler.RingBufferTracer(buffer_size=4)
+    for i in range(10):
+        _trace(tracer, f"event-{i}")
+    events = tracer.get_events()
+    assert [e["name"] for e in events] == [f"event-{i}" for i in range(6, 10)]
+    assert tracer.dropped_count == 6
+    for e in events:
+        assert e["ph"] == "X"
+        assert e["pid"] == os.getpid()
+        assert e["dur"] >= 0
+
+
+def test_ring_buffer_tracer_stream():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer = ppe.profiler.RingBufferTracer(buffer_size=3)
+        for i in range(5):
+            _trace(tracer, "before")
+        tracer.initialize_writer("trace.bin", writer)
+        for i in range(10):
+            _trace(tracer, f"event-{i % 4}")
+        tracer.flush("trace.bin", writer)
+        _trace(tracer, "last")
+        tracer.finalize()
+
+        events = ppe.profiler.load_binary_trace_as_json(
+            os.path.join(tmpdir, "trace.bin")
+        )
+        expected = ["before"] * 3 + [f"event-{i % 4}" for i in range(10)]
+        expected.append("last")
+        assert [e["name"] for e in events] == expected
+
+
+def test_ring_buffer_tracer_threads():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer = ppe.profiler.RingBufferTracer(buffer_size=16)
+        tracer.initialize_writer("trace.bin", writer)
+
+        def _body():
+            for _ in range(100):
+                _trace(tracer, "thread")
+
+        threads = [threading.Thread(target=_body) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        tracer.finalize()
+        events = ppe.profiler.load_binary_trace_as_json(
+            os.path.join(tmpdir, "trace.bin")
+        )
+        assert len(events) == 400
+        assert len({e["tid"] for e in events}) == 4
+
+
+def test_ring_buffer_tracer_resume():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer = ppe.profiler.RingBufferTracer(buffer_size=4)
+        tracer.initialize_writer("trace.bin", writer)
+        for i in range(6):
+            _trace(tracer, f"saved-{i % 2}")
+        state = tracer.state_dict()
+        for _ in range(3):
+            _trace(tracer, "lost")
+        tracer.finalize()
+
+        tracer = ppe.profiler.RingBufferTracer(buffer_size=4)
+        _trace(tracer, "dropped")
+        tracer.load_state_dict(state)
+        _trace(tracer, "saved-1")
+        _trace(tracer, "resumed")
+        tracer.flush("trace.bin", writer)
+        tracer.finalize()
+
+        events = ppe.profiler.load_binary_trace_as_json(
+            os.path.join(tmpdir, "trace.bin")
+        )
+        expected = [f"saved-{i % 2}" for i in range(6)]
+        expected += ["saved-1", "resumed"]
+        assert [e["name"] for e in events] == expected
+
+
+def test_ring_buffer_tracer_resume_missing_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer = ppe.profiler.RingBufferTracer()
+        tracer.initialize_writer("trace.bin", writer)
+        _trace(tracer, "saved")
+        state = tracer.state_dict()
+        tracer.finalize()
+        os.remove(os.path.join(tmpdir, "trace.bin"))
+
+        tracer = ppe.profiler.RingBufferTracer()
+        tracer.load_state_dict(state)
+        _trace(tracer, "resumed")
+        tracer.flush("trace.bin", writer)
+        tracer.finalize()
+
+        events = ppe.profiler.load_binary_trace_as_json(
+            os.path.join(tmpdir, "trace.bin")
+        )
+        assert [e["name"] for e in events] == ["resumed"]
+
+
+def test_ring_buffer_tracer_max_event_count_and_enable():
+    tracer = ppe.profiler.RingBufferTracer(max_event_count=3)
+    tracer.enable(False)
+    _trace(tracer, "disabled")
+    tracer.enable(True)
+    for _ in range(5):
+        _trace(tracer, "enabled")
+    assert [e["name"] for e in tracer.get_events()] == ["enabled"] * 3
+    tracer.clear()
+    assert tracer.get_events() == []
+
+
+def test_ring_buffer_tracer_invalid_args():
+    with pytest.raises(ValueError):
+        ppe.profiler.RingBufferTracer(buffer_size=0)
+    with pytest.raises(ValueError):
+        ppe.profiler.RingBufferTracer(num_buffers=0)
+
+
+def test_load_binary_trace_invalid_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "trace.json")
+        with open(path, "w") as f:
+            f.write("[]")
+        with pytest.raises(ValueError):
+            ppe.profiler.load_binary_trace_as_json(path)
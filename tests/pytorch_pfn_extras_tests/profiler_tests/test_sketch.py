@@ -0,0 +1,80 @@
+import math
+import random
+
+import pytest
+from pytorch_pfn_extras.profiler import QuantileSketch
+
+
+def _exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_quantile(relative_accuracy):
+    rng = random.Random(0)
+    values = [rng.lognormvariate(0, 2) for _ in range(10000)]
+    sketch = QuantileSketch(relative_accuracy)
+    for v in values:
+        sketch.add(v)
+    assert sketch.count == len(values)
+    for q in [0, 0.1, 0.5, 0.9, 0.99, 1]:
+        expected = _exact_quantile(values, q)
+        assert sketch.quantile(q) == pytest.approx(
+            expected, rel=relative_accuracy
+        )
+
+
+def test_quantile_empty():
+    sketch = QuantileSketch()
+    assert math.isnan(sketch.quantile(0.5))
+    with pytest.raises(ValueError):
+        sketch.quantile(1.5)
+
+
+def test_zero_values():
+    sketch = QuantileSketch()
+    for v in [0, 0, -1, 1, 2]:
+        sketch.add(v)
+    assert sketch.quantile(0.5) == 0
+    assert sketch.quantile(1) == pytest.approx(2, rel=0.01)
+
+
+def test_merge():
+    rng = random.Random(0)
+    values = [rng.expovariate(1) for _ in range(4000)]
+    sketches = [QuantileSketch() for _ in range(4)]
+    for i, v in enumerate(values):
+        sketches[i % 4].add(v)
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    assert merged.count == len(values)
+    for q in [0.5, 0.9, 0.99]:
+        assert merged.quantile(q) == pytest.approx(
+            _exact_quantile(values, q), rel=0.01
+        )
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(0.05))
+
+
+def test_max_bins():
+    sketch = QuantileSketch(max_bins=16)
+    for i in range(1, 10001):
+        sketch.add(i)
+    assert len(sketch._bins) == 16
+    assert sketch.count == 10000
+    # High quantiles keep their accuracy
+    assert sketch.quantile(0.99) == pytest.approx(9900, rel=0.01)
+
+
+def test_state_dict():
+    sketch = QuantileSketch(0.02)
+    for i in range(100):
+        sketch.add(i)
+    state = sketch.state_dict()
+    new_sketch = QuantileSketch()
+    new_sketch.load_state_dict(state)
+    assert new_sketch.count == sketch.count
+    for q in [0, 0.5, 0.99]:
+        assert new_sketch.quantile(q) == sketch.quantile(q)
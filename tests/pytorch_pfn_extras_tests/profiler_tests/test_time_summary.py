@@ -1,6 +1,7 @@
 import multiprocessing as mp
 import subprocess
 import sys
+import threading
 import time
 
 import pytest
@@ -81,21 +82,112 @@ def test_global_summary():
         assert "foo.max" in s[1]
 
 
-def test_clear():
-    summary = TimeSummary()
+@pytest.mark.parametrize("thread_local", [True, False])
+def test_clear(thread_local):
+    summary = TimeSummary(thread_local=thread_local)
     summary.add("foo", 10)
     summary.add("foo", 5)
     summary.add("foo", 15)
     summary.synchronize()
     with summary.summary(clear=True) as s:
         assert s[0].compute_mean() == {"foo": 10}
-        assert s[1] == {"foo.min": 5, "foo.max": 15}
+        assert s[1] == {
+            "foo.min": 5,
+            "foo.max": 15,
+            "foo.p50": pytest.approx(10, rel=0.01),
+            "foo.p90": pytest.approx(10, rel=0.01),
+            "foo.p99": pytest.approx(10, rel=0.01),
+        }
     with summary.summary(clear=True) as s:
         assert s[0].compute_mean() == {}
         assert s[1] == {}
     summary.finalize()
 
 
+def test_report_from_threads():
+    summary = TimeSummary()
+
+    def _worker(offset):
+        for i in range(100):
+            summary.add("foo", offset + i)
+            with summary.report("bar"):
+                pass
+
+    threads = [
+        threading.Thread(target=_worker, args=(i * 100,)) for i in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    summary.synchronize()
+    with summary.summary(clear=True) as s:
+        stats = s[0].make_statistics()
+        assert stats["foo"] == 199.5
+        assert s[1]["foo.min"] == 0
+        assert s[1]["foo.max"] == 399
+        assert s[0]._summaries["bar"]._n == 400
+        assert s[1]["foo.p50"] == pytest.approx(199.5, rel=0.01)
+        assert s[1]["foo.p99"] == pytest.approx(395, rel=0.01)
+    # Statistics of the finished threads are released once merged
+    assert len(summary._thread_stats) == 0
+    summary.finalize()
+
+
+def test_summary_while_reporting_from_threads():
+    summary = TimeSummary()
+    n_threads = 4
+    n_records = 20000
+
+    def _worker():
+        for i in range(n_records):
+            summary.add(f"foo{i % 10}", 1.0)
+
+    threads = [threading.Thread(target=_worker) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    n = 0
+    while any(t.is_alive() for t in threads):
+        # Merges the statistics while the threads keep updating them
+        with summary.summary(clear=True) as s:
+            n += sum(x._n for x in s[0]._summaries.values())
+    for t in threads:
+        t.join()
+    with summary.summary(clear=True) as s:
+        n += sum(x._n for x in s[0]._summaries.values())
+    assert n == n_threads * n_records
+    summary.finalize()
+
+
+def test_quantiles():
+    summary = TimeSummary(quantiles=(0.25, 0.999), relative_accuracy=0.001)
+    for i in range(1, 1001):
+        summary.add("foo", i / 1000)
+    with summary.summary() as s:
+        assert s[1]["foo.p25"] == pytest.approx(0.25, rel=0.001)
+        assert s[1]["foo.p99.9"] == pytest.approx(0.999, rel=0.001)
+        assert "foo.p50" not in s[1]
+    summary.finalize()
+
+    summary = TimeSummary(quantiles=())
+    summary.add("foo", 1)
+    with summary.summary() as s:
+        assert s[1] == {"foo.min": 1, "foo.max": 1}
+    summary.finalize()
+
+
+def test_counters():
+    summary = TimeSummary()
+    for value in (3, -5, 1):
+        summary.add_counter("mem", value)
+    with summary.summary(clear=True) as s:
+        assert "mem" not in s[0].compute_mean()
+        assert s[1] == {"mem.sum": -1, "mem.min": -5, "mem.max": 3}
+    with summary.summary() as s:
+        assert s[1] == {}
+    summary.finalize()
+
+
 def test_multiprocessing_start_method():
     # Ensure that importing PPE does not initialize multiprocessing context.
     # See #238 for the context.
@@ -3,6 +3,7 @@ import tempfile
 
 import pytest
 import pytorch_pfn_extras as ppe
+from pytorch_pfn_extras.writing._writer_base import _PosixFileSystem
 
 
 @pytest.mark.filterwarnings(
@@ -20,3 +21,62 @@ def test_tensorboard_writing():
         for snap in os.listdir(tempd):
             assert "_test" in snap
         writer.finalize()
+
+
+def test_json_lines_writer():
+    with tempfile.TemporaryDirectory() as tempd:
+        writer = ppe.writing.JsonLinesWriter(out_dir=tempd, fsync_interval=0)
+        writer("log", tempd, [{"a": 1}, {"a": 2}])
+        writer("log", tempd, {"a": 3})
+        assert [x["a"] for x in writer.read("log")] == [1, 2, 3]
+        writer.finalize()
+        with open(os.path.join(tempd, "log")) as f:
+            assert len(f.read().splitlines()) == 3
+
+
+def test_json_lines_writer_rotation():
+    with tempfile.TemporaryDirectory() as tempd:
+        writer = ppe.writing.JsonLinesWriter(
+            out_dir=tempd, max_bytes=18, backup_count=2
+        )
+        for i in range(10):
+            # Each entry is 9 bytes, so the file rotates every 2 calls
+            writer("log", tempd, {"a": i})
+        writer.finalize()
+        assert sorted(os.listdir(tempd)) == ["log", "log.4", "log.5"]
+        writer = ppe.writing.JsonLinesWriter(out_dir=tempd)
+        assert [x["a"] for x in writer.read("log")] == [6, 7, 8, 9]
+        writer.finalize()
+
+
+@pytest.mark.parametrize("rotate", [False, True])
+def test_json_lines_writer_truncate(rotate):
+    with tempfile.TemporaryDirectory() as tempd:
+        writer = ppe.writing.JsonLinesWriter(
+            out_dir=tempd, max_bytes=18 if rotate else None
+        )
+        for i in range(3):
+            writer("log", tempd, {"a": i})
+        position = writer.tell("log")
+        for i in range(3, 6):
+            writer("log", tempd, {"a": i})
+        writer.truncate("log", position)
+        writer("log", tempd, {"a": 6})
+        assert [x["a"] for x in writer.read("log")] == [0, 1, 2, 6]
+        writer.finalize()
+
+
+def test_json_lines_writer_fs_root():
+    with tempfile.TemporaryDirectory() as tempd:
+        with open(os.path.join(tempd, "log.1"), "w") as f:
+            f.write('{"a": 0}\n')
+        writer = ppe.writing.JsonLinesWriter(fs=_PosixFileSystem(root=tempd))
+        # The rotated files are looked up under the root of the filesystem
+        assert writer.tell("log")["segment"] == 1
+
+
+def test_json_lines_writer_invalid_args():
+    with pytest.raises(ValueError):
+        ppe.writing.JsonLinesWriter(max_bytes=0)
+    with pytest.raises(ValueError):
+        ppe.writing.JsonLinesWriter(backup_count=-1)
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+import pytorch_pfn_extras as ppe
+import torch
+
+
+class _SlowDataset(torch.utils.data.Dataset):
+    def __init__(self, n_items, delay):
+        self._n_items = n_items
+        self._delay = delay
+
+    def __len__(self):
+        return self._n_items
+
+    def __getitem__(self, idx):
+        time.sleep(self._delay)
+        return torch.tensor([idx])
+
+
+def _train(ext, max_epochs):
+    manager = ppe.training.ExtensionsManager(
+        {},
+        {},
+        max_epochs=max_epochs,
+        iters_per_epoch=len(ext.loader),
+    )
+    manager.extend(ext)
+    ratios = []
+    configs = []
+    for _epoch_idx in range(max_epochs):
+        for _ in ext.loader:
+            with manager.run_iteration():
+                pass
+            ratios.append(manager.observation["dataloader/input_bound_ratio"])
+        configs.append(ext.config)
+    return ratios, configs
+
+
+def test_dataloader_tuner_report():
+    loader = torch.utils.data.DataLoader(_SlowDataset(8, 0.01), batch_size=2)
+    ext = ppe.training.extensions.DataLoaderTuner(loader)
+    assert len(ext.loader) == 4
+    assert ext.loader.batch_size == 2
+    ratios, configs = _train(ext, 2)
+    assert len(ratios) == 8
+    assert all(0.5 < r <= 1 for r in ratios)
+    # Without tuning, the DataLoader is kept
+    assert ext.dataloader is loader
+    assert configs[-1]["num_workers"] == 0
+
+
+def test_dataloader_tuner_time_summary():
+    loader = torch.utils.data.DataLoader(_SlowDataset(8, 0.01), batch_size=2)
+    ext = ppe.training.extensions.DataLoaderTuner(loader, wait_tag="get_data")
+    time_summary = ppe.profiler.get_time_summary()
+    time_summary.initialize()
+    with time_summary.summary(clear=True):
+        pass
+    manager = ppe.training.ExtensionsManager(
+        {}, {}, max_epochs=1, iters_per_epoch=4
+    )
+    manager.extend(ext)
+    ratios = []
+    # Iterates the DataLoader itself, as the waits are reported by the loop
+    loader_iter = iter(loader)
+    for i in range(4):
+        with time_summary.report("get_data"):
+            next(loader_iter)
+        if i == 2:
+            # Cleared, e.g., by ProfileReport
+            with time_summary.summary(clear=True):
+                pass
+            with time_summary.report("get_data"):
+                time.sleep(0.02)
+        with manager.run_iteration():
+            time.sleep(0.01)
+        ratios.append(manager.observation["dataloader/input_bound_ratio"])
+    assert all(0.3 < r <= 1 for r in ratios[1:])
+
+
+def test_dataloader_tuner_tune():
+    loader = torch.utils.data.DataLoader(
+        _SlowDataset(8, 0.01), batch_size=2, shuffle=True
+    )
+    ext = ppe.training.extensions.DataLoaderTuner(
+        loader, tune=True, max_num_workers=2
+    )
+    _, configs = _train(ext, 2)
+    # The first neighbour explored adds workers
+    assert configs[0]["num_workers"] == 1
+    assert ext.dataloader is not loader
+    assert ext.dataloader.sampler is loader.sampler
+    assert len(ext.loader) == 4
+    assert sorted(torch.cat(list(ext.loader)).tolist()) == list(range(8))
+
+
+def test_dataloader_tuner_state_dict():
+    loader = torch.utils.data.DataLoader(_SlowDataset(8, 0.01), batch_size=2)
+    ext = ppe.training.extensions.DataLoaderTuner(
+        loader, tune=True, max_num_workers=2
+    )
+    _train(ext, 1)
+    state = ext.state_dict()
+
+    new_ext = ppe.training.extensions.DataLoaderTuner(
+        torch.utils.data.DataLoader(_SlowDataset(8, 0.01), batch_size=2),
+        tune=True,
+        max_num_workers=2,
+    )
+    new_ext.load_state_dict(state)
+    assert new_ext.config == ext.config
+    assert new_ext.dataloader.num_workers == ext.config["num_workers"]
+
+
+def test_dataloader_tuner_invalid_loader():
+    with pytest.raises(TypeError):
+        ppe.training.extensions.DataLoaderTuner([1, 2, 3])
@@ -1,7 +1,9 @@
 import io
+import json
 import os
 import tempfile
 
+import pytest
 import pytorch_pfn_extras as ppe
 import yaml
 from pytorch_pfn_extras.training import extensions
@@ -51,6 +53,178 @@ def test_log_buffer_multiple_lookers():
     assert buf.size() == 0
 
 
+def test_columnar_log_buffer():
+    buf = log_report_module._ColumnarLogBuffer(initial_capacity=2)
+    looker1 = buf.emit_new_looker()
+    looker2 = buf.emit_new_looker()
+    for i in range(5):
+        obs = {"iteration": i, "loss": i * 0.5}
+        if i % 2 == 0:
+            obs["acc"] = 0.25
+        buf.append(obs)
+    assert buf.size() == 5
+    assert looker1.get() == [
+        {"iteration": 0, "loss": 0.0, "acc": 0.25},
+        {"iteration": 1, "loss": 0.5},
+        {"iteration": 2, "loss": 1.0, "acc": 0.25},
+        {"iteration": 3, "loss": 1.5},
+        {"iteration": 4, "loss": 2.0, "acc": 0.25},
+    ]
+    looker2.clear()
+    assert buf.size() == 5
+    looker1.clear()
+    assert buf.size() == 0
+    buf.append({"iteration": 5, "loss": 2.5, "name": "x"})
+    assert looker1.get() == [{"iteration": 5, "loss": 2.5, "name": "x"}]
+    assert looker2.get() == [{"iteration": 5, "loss": 2.5, "name": "x"}]
+
+
+def test_columnar_log_buffer_upcast():
+    buf = log_report_module._ColumnarLogBuffer()
+    looker = buf.emit_new_looker()
+    buf.append({"a": 1})
+    buf.append({"a": 1.5})
+    buf.append({"a": "x"})
+    assert looker.get() == [{"a": 1.0}, {"a": 1.5}, {"a": "x"}]
+
+
+def test_columnar_log_buffer_to_dataframe():
+    pandas = pytest.importorskip("pandas")
+    buf = log_report_module._ColumnarLogBuffer()
+    looker = buf.emit_new_looker()
+    buf.append({"iteration": 1, "loss": 0.5})
+    buf.append({"iteration": 2})
+    df = looker.to_dataframe()
+    expected = pandas.DataFrame(
+        [{"iteration": 1, "loss": 0.5}, {"iteration": 2}]
+    )
+    pandas.testing.assert_frame_equal(df, expected)
+
+
+def test_columnar_log_buffer_spill():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        buf = log_report_module._ColumnarLogBuffer(
+            max_rows_in_memory=3, spill_dir=tmpdir
+        )
+        looker = buf.emit_new_looker()
+        for i in range(8):
+            buf.append({"iteration": i})
+        assert len(os.listdir(tmpdir)) == 2
+        assert [x["iteration"] for x in looker.get()] == list(range(8))
+
+        state = buf.state_dict()
+        assert "_log" not in state
+        assert len(state["_log_chunks"]) == 2
+        # Taking a snapshot does not write a chunk
+        assert len(os.listdir(tmpdir)) == 2
+        assert buf.state_dict() == state
+
+        new_buf = log_report_module._ColumnarLogBuffer(
+            max_rows_in_memory=3, spill_dir=tmpdir
+        )
+        new_looker = new_buf.emit_new_looker()
+        new_buf.load_state_dict(state)
+        new_buf.append({"iteration": 8})
+        assert len(os.listdir(tmpdir)) == 3
+        assert [x["iteration"] for x in new_looker.get()] == list(range(9))
+        new_looker.clear()
+        assert new_buf.size() == 0
+        # The chunks are removed once all the lookers have cleared them,
+        # except the ones recorded by the snapshot
+        saved = sorted(name for _, _, name in state["_log_chunks"])
+        assert sorted(os.listdir(tmpdir)) == saved
+
+        # The snapshot can still be resumed after its rows were cleared
+        other_buf = log_report_module._ColumnarLogBuffer(
+            max_rows_in_memory=3, spill_dir=tmpdir
+        )
+        other_looker = other_buf.emit_new_looker()
+        other_buf.load_state_dict(state)
+        assert [x["iteration"] for x in other_looker.get()] == list(range(8))
+
+
+def test_columnar_log_buffer_invalid_args():
+    with pytest.raises(ValueError):
+        log_report_module._ColumnarLogBuffer(max_rows_in_memory=3)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            log_report_module._ColumnarLogBuffer(
+                max_rows_in_memory=0, spill_dir=tmpdir
+            )
+
+
+def test_columnar_log_report():
+    max_epochs = 3
+    iters_per_epoch = 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ppe.training.ExtensionsManager(
+            {}, {}, max_epochs, iters_per_epoch=iters_per_epoch, out_dir=tmpdir
+        )
+        log_report = extensions.LogReport(
+            filename="out",
+            trigger=(1, "iteration"),
+            columnar=True,
+        )
+        manager.extend(log_report)
+        for _ in range(max_epochs):
+            for _ in range(iters_per_epoch):
+                with manager.run_iteration():
+                    pass
+        log = log_report.log
+        assert [x["iteration"] for x in log] == list(range(1, 16))
+        state = log_report.state_dict()
+
+        new_log_report = extensions.LogReport(
+            filename="out",
+            trigger=(1, "iteration"),
+            columnar=True,
+        )
+        new_log_report.load_state_dict(state)
+        assert new_log_report.log == log
+
+
+def test_columnar_log_report_spill():
+    max_epochs = 3
+    iters_per_epoch = 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        spill_dir = os.path.join(tmpdir, "spill")
+        manager = ppe.training.ExtensionsManager(
+            {}, {}, max_epochs, iters_per_epoch=iters_per_epoch, out_dir=tmpdir
+        )
+        log_report = extensions.LogReport(
+            filename="out.jsonl",
+            trigger=(1, "iteration"),
+            append=True,
+            max_rows_in_memory=4,
+            spill_dir=spill_dir,
+        )
+        manager.extend(log_report)
+        # Keeps the entries until they are read, as PrintReport does
+        looker = log_report._log_buffer.emit_new_looker()
+        for _ in range(max_epochs):
+            for _ in range(iters_per_epoch):
+                with manager.run_iteration():
+                    pass
+        assert len(os.listdir(spill_dir)) == 3
+        assert [x["iteration"] for x in looker.get()] == list(range(1, 16))
+        looker.clear()
+        assert os.listdir(spill_dir) == []
+
+        with open(os.path.join(tmpdir, "out.jsonl")) as f:
+            log = [json.loads(line) for line in f]
+        assert [x["iteration"] for x in log] == list(range(1, 16))
+
+
+def test_columnar_log_report_spill_requires_append():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            extensions.LogReport(
+                filename="out.jsonl", max_rows_in_memory=4, spill_dir=tmpdir
+            )
+
+
 def test_buffer_size_log_report():
     max_epochs = 10
     iters_per_epoch = 5
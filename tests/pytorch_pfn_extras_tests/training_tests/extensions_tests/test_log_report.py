@@ -134,3 +134,83 @@ def test_deferred_values():
                 assert len(values) == epoch_idx + 1
                 this_epoch = values.pop()
                 assert this_epoch["x"] == epoch_idx
+
+
+def test_json_lines_writer():
+    max_epochs = 3
+    iters_per_epoch = 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.JsonLinesWriter(out_dir=tmpdir)
+        manager = ppe.training.ExtensionsManager(
+            {},
+            {},
+            max_epochs=max_epochs,
+            iters_per_epoch=iters_per_epoch,
+            out_dir=tmpdir,
+        )
+        log_report = extensions.LogReport(
+            writer=writer, filename="out", trigger=(1, "iteration")
+        )
+        manager.extend(log_report)
+        for _ in range(max_epochs):
+            for _ in range(iters_per_epoch):
+                with manager.run_iteration():
+                    pass
+            # Entries already written are not kept in memory
+            assert log_report._log_buffer.size() == 0
+        log = log_report.log
+        assert len(log) == max_epochs * iters_per_epoch
+        assert [x["iteration"] for x in log] == list(
+            range(1, max_epochs * iters_per_epoch + 1)
+        )
+        state = log_report.state_dict()
+        assert state["_log_names"] == ["out"]
+        writer.finalize()
+
+        with open(os.path.join(tmpdir, "out")) as f:
+            values = [json.loads(x) for x in f.read().splitlines()]
+        assert values == log
+
+
+def test_json_lines_writer_resume():
+    max_epochs = 3
+    iters_per_epoch = 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.JsonLinesWriter(out_dir=tmpdir)
+        manager = ppe.training.ExtensionsManager(
+            {},
+            {},
+            max_epochs=max_epochs,
+            iters_per_epoch=iters_per_epoch,
+            out_dir=tmpdir,
+        )
+        log_report = extensions.LogReport(
+            writer=writer, filename="out", trigger=(1, "iteration")
+        )
+        manager.extend(log_report)
+        for _ in range(max_epochs):
+            for _ in range(iters_per_epoch):
+                with manager.run_iteration():
+                    pass
+            if manager.epoch == 1:
+                state = log_report.state_dict()
+        writer.finalize()
+
+        new_writer = ppe.writing.JsonLinesWriter(out_dir=tmpdir)
+        new_log_report = extensions.LogReport(
+            writer=new_writer, filename="out", trigger=(1, "iteration")
+        )
+        new_log_report.load_state_dict(state)
+        # The entries written after the snapshot are dropped
+        assert [x["iteration"] for x in new_log_report.log] == list(
+            range(1, iters_per_epoch + 1)
+        )
+        new_writer.finalize()
+
+
+def test_json_lines_writer_invalid_format():
+    writer = ppe.writing.JsonLinesWriter()
+    with pytest.raises(ValueError):
+        extensions.LogReport(writer=writer, format="yaml")
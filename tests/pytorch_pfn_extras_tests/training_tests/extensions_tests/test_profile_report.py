@@ -1,11 +1,17 @@
 import json
 import os
+import sys
 import tempfile
 import time
+import urllib.request
+import warnings
+from unittest import mock
 
 import pytest
 import pytorch_pfn_extras as ppe
+import torch
 import yaml
+from torch import multiprocessing as mp
 
 
 def _body():
@@ -53,3 +59,155 @@ def test_profile_report(format, append):
 
             for value in values:
                 assert abs(value["iter-time"] - 0.1) < 2e-2
+                assert abs(value["iter-time.p99"] - 0.1) < 2e-2
+
+
+def _load_log(path, format):
+    with open(path) as f:
+        data = f.read()
+    if format == "json":
+        return json.loads(data)
+    elif format == "json-lines":
+        return [json.loads(x) for x in data.splitlines()]
+    elif format == "yaml":
+        return yaml.load(data, Loader=yaml.SafeLoader)
+
+
+@pytest.mark.parametrize(
+    "format,append",
+    [
+        ("json", False),
+        ("json-lines", True),
+        ("json-lines", False),
+        ("yaml", True),
+    ],
+)
+def test_profile_report_resume(format, append):
+    iters_per_epoch = 2
+
+    def _run(ext, tmpdir, epochs):
+        manager = ppe.training.ExtensionsManager(
+            {},
+            {},
+            max_epochs=epochs,
+            iters_per_epoch=iters_per_epoch,
+            out_dir=tmpdir,
+        )
+        manager.extend(ext)
+        for _ in range(epochs * iters_per_epoch):
+            with manager.run_iteration():
+                pass
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ext = ppe.training.extensions.ProfileReport(
+            format=format, append=append
+        )
+        _run(ext, tmpdir, 2)
+        state = ext.state_dict()
+        assert "_log" not in state
+        assert state["_log_cursor"]["filename"] == "log"
+
+        # The entry written after taking the state must be dropped
+        _run(ext, tmpdir, 1)
+        assert len(_load_log(os.path.join(tmpdir, "log"), format)) == 3
+
+        new_ext = ppe.training.extensions.ProfileReport(
+            format=format, append=append
+        )
+        new_ext.load_state_dict(state)
+        _run(new_ext, tmpdir, 2)
+        values = _load_log(os.path.join(tmpdir, "log"), format)
+        assert [v["epoch"] for v in values] == [1, 2, 1, 2]
+
+
+def test_profile_report_finalize():
+    writer = ppe.writing.SimpleWriter()
+    writer.finalize = mock.MagicMock()
+    ext = ppe.training.extensions.ProfileReport(writer=writer)
+    manager = ppe.training.ExtensionsManager(
+        {}, {}, max_epochs=1, iters_per_epoch=1
+    )
+    manager.extend(ext)
+    ext.finalize(manager)
+    writer.finalize.assert_called_once_with()
+
+
+def test_profile_report_call_tree():
+    ext = ppe.training.extensions.ProfileReport(
+        call_tree_filename="stacks-{epoch}"
+    )
+    call_tree = ppe.profiler.enable_call_tree()
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = ppe.training.ExtensionsManager(
+                {}, {}, max_epochs=2, iters_per_epoch=2, out_dir=tmpdir
+            )
+            manager.extend(ext)
+            for _ in range(4):
+                with manager.run_iteration():
+                    with ppe.profiler.record("outer"):
+                        with ppe.profiler.record("inner"):
+                            time.sleep(0.01)
+            for epoch in (1, 2):
+                with open(os.path.join(tmpdir, f"stacks-{epoch}")) as f:
+                    lines = f.read().splitlines()
+                stacks = [line.rsplit(" ", 1)[0] for line in lines]
+                assert "outer;inner" in stacks
+    finally:
+        ppe.profiler.disable_call_tree()
+    call_tree.clear()
+    assert call_tree.summary() == {}
+
+
+def _run_distributed_profile_report(init_file, out_dir, rank, step_time):
+    init_method = "file://{}".format(urllib.request.pathname2url(init_file))
+    torch.distributed.init_process_group(
+        backend="gloo", init_method=init_method, world_size=4, rank=rank
+    )
+    ext = ppe.training.extensions.ProfileReport(
+        distributed=True, straggler_factor=1.5, straggler_keys=["step"]
+    )
+    manager = ppe.training.ExtensionsManager(
+        {}, {}, max_epochs=1, iters_per_epoch=1, out_dir=out_dir
+    )
+    time_summary = ppe.profiler.get_time_summary()
+    time_summary.add("step", step_time)
+    if rank == 0:
+        time_summary.add("only-rank0", 1.0)
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        ext(manager)
+    torch.distributed.destroy_process_group()
+    return dict(ext._log[0]), [str(x.message) for x in w]
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32",
+    reason="torch.distributed is not fully supported on Windows",
+)
+def test_profile_report_distributed():
+    step_times = [0.1, 0.1, 0.1, 0.3]
+    context = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmpdir, context.Pool(4) as pool:
+        init_file = os.path.join(tmpdir, "init")
+        procs = [
+            pool.apply_async(
+                _run_distributed_profile_report,
+                args=(init_file, os.path.join(tmpdir, str(rank)), rank, t),
+            )
+            for rank, t in enumerate(step_times)
+        ]
+        results = [p.get() for p in procs]
+
+    for rank, (log, messages) in enumerate(results):
+        assert log["step"] == pytest.approx(step_times[rank])
+        assert log["step.rank_min"] == pytest.approx(0.1)
+        assert log["step.rank_median"] == pytest.approx(0.1)
+        assert log["step.rank_max"] == pytest.approx(0.3)
+        assert log["step.rank_argmax"] == 3
+        assert log["step.rank_spread"] == pytest.approx(3.0)
+        assert log["step.stragglers"] == 1
+        assert any("[3]" in m for m in messages)
+        # Tags reported by some of the ranks only
+        assert log["only-rank0.rank_max"] == 1.0
+        assert "only-rank0.stragglers" not in log
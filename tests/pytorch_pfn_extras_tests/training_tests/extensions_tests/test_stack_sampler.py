@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import time
+
+import pytest
+import pytorch_pfn_extras as ppe
+
+
+def _busy_function(duration):
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+
+def _run(ext, tmpdir, max_epochs=2, iters_per_epoch=5):
+    manager = ppe.training.ExtensionsManager(
+        {},
+        {},
+        max_epochs=max_epochs,
+        iters_per_epoch=iters_per_epoch,
+        out_dir=tmpdir,
+    )
+    manager.extend(ext)
+    for _epoch_idx in range(max_epochs):
+        for _ in range(iters_per_epoch):
+            with manager.run_iteration():
+                _busy_function(0.02)
+    return manager
+
+
+def test_stack_sampler():
+    ext = ppe.training.extensions.StackSampler(interval=0.001, n_top=3)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _run(ext, tmpdir)
+        with open(os.path.join(tmpdir, "python_stacks.txt")) as f:
+            lines = f.read().splitlines()
+        with open(os.path.join(tmpdir, "python_top.json")) as f:
+            top = json.load(f)
+
+    assert len(lines) > 0
+    stacks = {}
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        stacks[stack] = int(count)
+    busy = [
+        s for s in stacks if s.split(";")[-1].startswith("_busy_function")
+    ]
+    assert len(busy) > 0
+    assert sum(stacks[s] for s in busy) > sum(stacks.values()) / 2
+
+    assert len(top) == 3
+    assert top[0]["function"].startswith("_busy_function (")
+    assert top[0]["self"] <= top[0]["total"]
+    assert 0.5 < top[0]["self_ratio"] <= 1
+
+
+def test_stack_sampler_enable():
+    enable = ppe.training.triggers.ManualScheduleTrigger([5], unit="iteration")
+    disable = ppe.training.triggers.ManualScheduleTrigger(
+        [8], unit="iteration"
+    )
+    ext = ppe.training.extensions.StackSampler(
+        interval=0.001, enable=enable, disable=disable
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ppe.training.ExtensionsManager(
+            {}, {}, max_epochs=1, iters_per_epoch=10, out_dir=tmpdir
+        )
+        manager.extend(ext)
+        n_samples = []
+        for _ in range(10):
+            with manager.run_iteration():
+                _busy_function(0.02)
+            n_samples.append(sum(ext.stack_counts().values()))
+    # Sampling runs from the 6th iteration to the 8th iteration
+    assert n_samples[3] == 0
+    assert n_samples[6] > 0
+    assert n_samples[-1] == n_samples[8]
+
+
+def test_stack_sampler_state_dict():
+    ext = ppe.training.extensions.StackSampler(interval=0.001)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        _run(ext, tmpdir)
+    state = ext.state_dict()
+    counts = ext.stack_counts()
+    assert len(counts) > 0
+
+    new_ext = ppe.training.extensions.StackSampler(
+        interval=0.001, enable=(100, "iteration")
+    )
+    new_ext.load_state_dict(state)
+    assert new_ext.stack_counts() == counts
+    assert new_ext.top_functions() == ext.top_functions()
+
+
+def test_stack_sampler_invalid_interval():
+    with pytest.raises(ValueError):
+        ppe.training.extensions.StackSampler(interval=0)
@@ -0,0 +1,109 @@
+import pytest
+import pytorch_pfn_extras as ppe
+import torch
+
+pytestmark = pytest.mark.skipif(
+    not ppe.requires("2.1.0"), reason="FlopCounterMode is not available"
+)
+
+
+def _train(ext, model, batches):
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    manager = ppe.training.ExtensionsManager(
+        model,
+        optimizer,
+        max_epochs=1,
+        iters_per_epoch=len(batches),
+    )
+    manager.extend(ext)
+    observations = []
+    for x in batches:
+        with manager.run_iteration(step_optimizers=["main"]):
+            model(x).sum().backward()
+        observations.append(manager.observation)
+    return observations
+
+
+def test_throughput_report():
+    model = torch.nn.Linear(4, 8)
+    ext = ppe.training.extensions.ThroughputReport(model, peak_flops=1e12)
+    batches = [torch.rand(16, 4)] * 2 + [torch.rand(8, 4)] * 2
+    observations = _train(ext, model, batches)
+
+    # Forward matmul and the backward estimated as twice the forward
+    assert [o["throughput/flops"] for o in observations] == [
+        3072,
+        3072,
+        1536,
+        1536,
+    ]
+    # The FLOPs are counted once per input signature
+    assert len(ext._flops) == 2
+    for i, (o, x) in enumerate(zip(observations, batches)):
+        if i % 2 == 0:
+            # Not reported while the FLOPs are counted
+            assert "throughput/samples_per_second" not in o
+            assert "throughput/flops_per_second" not in o
+            assert "throughput/mfu" not in o
+            continue
+        assert o["throughput/samples_per_second"] > 0
+        assert o["throughput/flops_per_second"] == pytest.approx(
+            o["throughput/flops"]
+            / (len(x) / o["throughput/samples_per_second"])
+        )
+        assert o["throughput/mfu"] == pytest.approx(
+            o["throughput/flops_per_second"] / 1e12
+        )
+        assert "throughput/tokens_per_second" not in o
+
+
+def test_throughput_report_multiple_forwards():
+    model = torch.nn.Linear(4, 8)
+    ext = ppe.training.extensions.ThroughputReport(
+        model, backward_flops_ratio=1.0
+    )
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    manager = ppe.training.ExtensionsManager(
+        model, optimizer, max_epochs=1, iters_per_epoch=2
+    )
+    manager.extend(ext)
+    observations = []
+    for _ in range(2):
+        with manager.run_iteration(step_optimizers=["main"]):
+            y = model(torch.rand(16, 4)) + model(torch.rand(16, 4))
+            # The counter is not active outside of the forward calls
+            mode = torch.utils._python_dispatch._get_current_dispatch_mode()
+            assert mode is None
+            y.sum().backward()
+        observations.append(manager.observation)
+
+    # The FLOPs of both forward calls are summed
+    assert [o["throughput/flops"] for o in observations] == [4096, 4096]
+
+
+def test_throughput_report_extractors():
+    model = torch.nn.Linear(4, 8)
+    ext = ppe.training.extensions.ThroughputReport(
+        model,
+        batch_size_fn=lambda inputs: 2,
+        tokens_fn=lambda inputs: inputs[0][0].numel(),
+        count_flops=False,
+    )
+    observations = _train(ext, model, [torch.rand(16, 4)])
+    o = observations[0]
+    assert o["throughput/tokens_per_second"] == pytest.approx(
+        o["throughput/samples_per_second"] * 32
+    )
+    assert "throughput/flops" not in o
+
+
+def test_throughput_report_ignores_eval():
+    model = torch.nn.Linear(4, 8)
+    ext = ppe.training.extensions.ThroughputReport(model, count_flops=False)
+    model.eval()
+    with torch.no_grad():
+        model(torch.rand(16, 4))
+    assert ext._samples == 0
+    model.train()
+    model(torch.rand(16, 4))
+    assert ext._samples == 16
@@ -1,7 +1,10 @@
+import json
 import os
 import tempfile
+import threading
 import time
 
+import pytest
 import pytorch_pfn_extras as ppe
 
 
@@ -137,3 +140,124 @@ def test_tracer_enable():
             os.path.join(tmpdir, "trace.json")
         )
         assert len(values) == (max_epochs * iters_per_epoch - 10 + 5)
+
+
+@pytest.mark.parametrize("append", [True, False])
+def test_tracer_state_dict_cursor(append):
+    def _trace(tracer, name):
+        with tracer.add_event(name):
+            pass
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer = ppe.profiler.ChromeTracer(append=append)
+        tracer.initialize_writer("trace.json", writer)
+        for _ in range(3):
+            _trace(tracer, "a")
+        tracer.flush("trace.json", writer)
+        _trace(tracer, "b")
+        state = tracer.state_dict()
+        assert state["_cursor"]["filename"] == "trace.json"
+        assert state["_cursor"]["flushed_count"] == 3
+        # The pending event is kept in the state instead of being flushed
+        assert [e["name"] for e in json.loads(state["_event_list"])] == ["b"]
+        if append:
+            size = os.path.getsize(os.path.join(tmpdir, "trace.json"))
+            assert state["_cursor"]["offset"] == size
+
+        # The event written after taking the state must be dropped
+        _trace(tracer, "c")
+        tracer.flush("trace.json", writer)
+        tracer.finalize()
+
+        new_tracer = ppe.profiler.ChromeTracer(append=append)
+        new_tracer.load_state_dict(state)
+        new_tracer.initialize_writer("trace.json", writer)
+        _trace(new_tracer, "d")
+        new_tracer.flush("trace.json", writer)
+        new_tracer.finalize()
+        values = ppe.profiler.load_chrome_trace_as_json(
+            os.path.join(tmpdir, "trace.json")
+        )
+        assert [v["name"] for v in values] == ["a", "a", "a", "b", "d"]
+
+
+def test_tracer_state_dict_without_writer():
+    tracer = ppe.profiler.ChromeTracer()
+    with tracer.add_event("a"):
+        pass
+    state = tracer.state_dict()
+    assert "_cursor" not in state
+    assert len(json.loads(state["_event_list"])) == 1
+    tracer.finalize()
+
+
+class _GatedEventBackend(ppe.profiler.DeviceEventBackend):
+    # Each event is a fake device timestamp; resolving waits for the gate
+    def __init__(self):
+        self.gate = threading.Event()
+        self.clock = 0
+        self.released = []
+
+    def record(self):
+        self.clock += 1000
+        return self.clock
+
+    def elapsed_ns(self, begin, end):
+        self.gate.wait()
+        return end - begin
+
+    def release(self, event):
+        self.released.append(event)
+
+
+def test_tracer_device_event_backend():
+    backend = _GatedEventBackend()
+    tracer = ppe.profiler.ChromeTracer(event_backend=backend)
+    with tracer.add_event("a"):
+        pass
+    with tracer.add_event("b"):
+        pass
+    # Recording does not wait for the device
+    assert tracer._event_list == []
+    backend.gate.set()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = ppe.writing.SimpleWriter(out_dir=tmpdir)
+        tracer.initialize_writer("trace.json", writer)
+        tracer.flush("trace.json", writer)
+        tracer.finalize()
+        values = ppe.profiler.load_chrome_trace_as_json(
+            os.path.join(tmpdir, "trace.json")
+        )
+    assert sorted(v["name"] for v in values) == ["a", "b"]
+    for v in values:
+        assert v["dur"] == 1.0
+        assert "host_dur" in v["args"]
+    assert sorted(backend.released) == [1000, 2000, 3000, 4000]
+
+
+class _FailingEventBackend(_GatedEventBackend):
+    def elapsed_ns(self, begin, end):
+        if begin == 1000:
+            self.gate.wait()
+            raise RuntimeError("invalid event")
+        return end - begin
+
+
+def test_tracer_device_event_backend_error():
+    backend = _FailingEventBackend()
+    tracer = ppe.profiler.ChromeTracer(event_backend=backend)
+    for name in ["a", "b"]:
+        with tracer.add_event(name):
+            pass
+    with pytest.warns(UserWarning, match="invalid event"):
+        backend.gate.set()
+        tracer._synchronize()
+    # The events after the failing one are still resolved
+    assert [e["name"] for e in tracer._event_list] == ["b"]
+    with tracer.add_event("c"):
+        pass
+    tracer._synchronize()
+    assert [e["name"] for e in tracer._event_list] == ["b", "c"]
+    tracer.finalize()
+    assert 1000 not in backend.released